@@ -2,4 +2,9 @@
 
 python manage.py migrate --no-input
 python manage.py collectstatic --no-input
-exec python manage.py runserver 0.0.0.0:8081
\ No newline at end of file
+
+if [ "${SERVER_MODE:-development}" = "production" ]; then
+    exec gunicorn --config gunicorn.conf.py
+fi
+
+exec python manage.py runserver 0.0.0.0:8081
@@ -1,6 +1,9 @@
 from django.contrib import admin
 from typing import Any
 from django.contrib.contenttypes.admin import GenericTabularInline
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import QuerySet
 from django.http import HttpRequest
 from django.utils.translation import gettext_lazy as _
 
@@ -11,14 +14,17 @@ from .models import ContentView
 class ContentViewAdmin(admin.ModelAdmin):
     list_display = [
         'content_object',
-        'content_type',
+        'content_type_name',
         'user',
         'viewer_ip',
         'last_viewed',
+        'views',
         'created_at',
         'updated_at',
     ]
     list_filter = ['content_type', 'user', 'created_at']
+    # __str__ (usado no checkbox de ações) lê content_type e user
+    list_select_related = ['content_type', 'user']
     date_hierarchy = 'last_viewed'
     readonly_fields = [
         'content_type',
@@ -31,13 +37,49 @@ class ContentViewAdmin(admin.ModelAdmin):
     ]
     fieldsets = (
         (None, {'fields': ('content_type', 'object_id', 'content_object')}),
-        (_('Viewer'), {'fields': ('user', 'viewer_ip', 'last_viewed')}),
+        (
+            _('Viewer'),
+            {'fields': ('user', 'viewer_ip', 'last_viewed', 'views')},
+        ),
         (
             _('Timestamps'),
             {'fields': ('created_at', 'updated_at'), 'classes': ('collapse',)},
         )
     )
 
+    def get_queryset(self, request: HttpRequest) -> QuerySet:
+        """
+        Busca os objetos visualizados da página com uma consulta por tipo de
+        conteúdo, em vez de uma por linha.
+        """
+        return super().get_queryset(request).prefetch_related(
+            GenericPrefetch(
+                'content_object', self.get_content_object_querysets()
+            )
+        )
+
+    def get_content_object_querysets(self) -> list[QuerySet]:
+        """
+        Reaproveita o `list_select_related` do admin de cada modelo ao buscar
+        os objetos visualizados, para que o __str__ deles não dispare uma
+        consulta por linha.
+        """
+        querysets = []
+        for model, model_admin in self.admin_site._registry.items():
+            related = model_admin.list_select_related
+            if related is True:
+                querysets.append(model._default_manager.select_related())
+            elif related:
+                querysets.append(
+                    model._default_manager.select_related(*related)
+                )
+        return querysets
+
+    @admin.display(description=_('Content Type'), ordering='content_type')
+    def content_type_name(self, obj: ContentView) -> ContentType:
+        # resolvido pelo cache de ContentTypes do processo, sem consulta
+        return ContentType.objects.get_for_id(obj.content_type_id)
+
     def has_add_permission(self, request: HttpRequest) -> bool:
         """
         Previne a adição de novas visualizações através do painel de administração.
@@ -66,10 +108,14 @@ class ContentViewInline(GenericTabularInline):
         'user',
         'viewer_ip',
         'last_viewed',
+        'views',
         'created_at',
     ]
     can_delete = False
 
+    def get_queryset(self, request: HttpRequest) -> QuerySet:
+        return super().get_queryset(request).select_related('user')
+
     def has_add_permission(self, request: HttpRequest) -> bool:
         """
         Previne a adição de novas visualizações através do painel de administração.
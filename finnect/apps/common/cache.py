@@ -0,0 +1,132 @@
+import functools
+import uuid
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+
+from finnect.apps.common.metrics import record_cache_lookup
+
+
+def _version_key(user_id: Any) -> str:
+    return f'user:{user_id}:version'
+
+
+def _snapshot_key(user_id: Any, version: str) -> str:
+    return f'user:{user_id}:{version}'
+
+
+def get_user_version(user_id: Any) -> str:
+    """
+    Retorna o carimbo de versão atual do usuário, criando um se necessário.
+
+    O carimbo faz parte da chave dos snapshots, então trocá-lo invalida de uma
+    vez as cópias guardadas no cache local de todos os processos e no Redis.
+    """
+    shared = caches[settings.USER_CACHE_ALIAS]
+    key = _version_key(user_id)
+    version = shared.get(key)
+    record_cache_lookup('user_version', version is not None)
+    if version is None:
+        shared.add(key, uuid.uuid4().hex, timeout=settings.USER_CACHE_TIMEOUT)
+        version = shared.get(key)
+    return version
+
+
+def _user_snapshots():
+    # o hash da senha não vai para o cache; quem precisar dele (troca de
+    # senha) o carrega do banco ao acessá-lo, e save() não o sobrescreve
+    return get_user_model().objects.defer('password')
+
+
+def get_cached_user(user_id: Any) -> Optional[Any]:
+    """
+    Busca o usuário primeiro no cache local do processo, depois no cache
+    compartilhado (Redis) e só então no banco de dados.
+    """
+    key = _snapshot_key(user_id, get_user_version(user_id))
+    local = caches[settings.USER_CACHE_LOCAL_ALIAS]
+    user = local.get(key)
+    record_cache_lookup('user_local', user is not None)
+    if user is not None:
+        return user
+
+    shared = caches[settings.USER_CACHE_ALIAS]
+    user = shared.get(key)
+    record_cache_lookup('user_shared', user is not None)
+    if user is None:
+        User = get_user_model()
+        try:
+            user = _user_snapshots().get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        shared.set(key, user, timeout=settings.USER_CACHE_TIMEOUT)
+
+    local.set(key, user, timeout=settings.USER_CACHE_LOCAL_TIMEOUT)
+    return user
+
+
+async def aget_user_version(user_id: Any) -> str:
+    """
+    Versão assíncrona de get_user_version.
+    """
+    shared = caches[settings.USER_CACHE_ALIAS]
+    key = _version_key(user_id)
+    version = await shared.aget(key)
+    record_cache_lookup('user_version', version is not None)
+    if version is None:
+        await shared.aadd(
+            key, uuid.uuid4().hex, timeout=settings.USER_CACHE_TIMEOUT
+        )
+        version = await shared.aget(key)
+    return version
+
+
+async def aget_cached_user(user_id: Any) -> Optional[Any]:
+    """
+    Versão assíncrona de get_cached_user, usando a API assíncrona do cache e
+    o ORM assíncrono na ida ao banco.
+    """
+    key = _snapshot_key(user_id, await aget_user_version(user_id))
+    local = caches[settings.USER_CACHE_LOCAL_ALIAS]
+    user = local.get(key)
+    record_cache_lookup('user_local', user is not None)
+    if user is not None:
+        return user
+
+    shared = caches[settings.USER_CACHE_ALIAS]
+    user = await shared.aget(key)
+    record_cache_lookup('user_shared', user is not None)
+    if user is None:
+        User = get_user_model()
+        try:
+            user = await _user_snapshots().aget(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        await shared.aset(key, user, timeout=settings.USER_CACHE_TIMEOUT)
+
+    local.set(key, user, timeout=settings.USER_CACHE_LOCAL_TIMEOUT)
+    return user
+
+
+def invalidate_cached_user(user_id: Any, using: Optional[str] = None) -> None:
+    """
+    Troca o carimbo de versão do usuário, descartando os snapshots antigos.
+
+    Dentro de uma transação, a troca espera o commit: antes dele, outra
+    requisição ainda lê a linha antiga e a guardaria sob o carimbo novo
+    por USER_CACHE_TIMEOUT.
+    """
+    transaction.on_commit(
+        functools.partial(_replace_user_version, user_id), using=using
+    )
+
+
+def _replace_user_version(user_id: Any) -> None:
+    caches[settings.USER_CACHE_ALIAS].set(
+        _version_key(user_id),
+        uuid.uuid4().hex,
+        timeout=settings.USER_CACHE_TIMEOUT,
+    )
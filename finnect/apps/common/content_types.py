@@ -0,0 +1,24 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from loguru import logger
+
+
+def warm_content_type_cache(using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Carrega todos os ContentTypes em uma consulta para o cache do processo
+    usado por `get_for_model`/`get_for_id`, que de outra forma é preenchido
+    com uma consulta por modelo na primeira vez que cada um aparece.
+    """
+    manager = ContentType.objects.db_manager(using)
+    try:
+        content_types = list(manager.all())
+    except DatabaseError as exc:
+        # banco fora do ar ou ainda sem migrações; o cache se preenche sob
+        # demanda
+        logger.warning(
+            'Could not warm the content type cache: {error}', error=str(exc)
+        )
+        return 0
+    for content_type in content_types:
+        manager._add_to_cache(using, content_type)
+    return len(content_types)
@@ -1,37 +1,127 @@
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.http import HttpRequest
 from loguru import logger
 from rest_framework.request import Request
 from rest_framework_simplejwt.authentication import AuthUser, JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import Token
 
+from finnect.apps.common.cache import aget_cached_user, get_cached_user
+from finnect.apps.common.tokens import verified_tokens
+
 
 class CookieAuthentication(JWTAuthentication):
     """
     Autenticação baseada em cookies para APIs REST.
     """
 
+    def get_request_token(
+        self, request: Union[Request, HttpRequest]
+    ) -> Optional[bytes]:
+        """
+        Extrai o token do cabeçalho Authorization ou, na falta dele, do cookie.
+        """
+        header = self.get_header(request)
+        if header is not None:
+            return self.get_raw_token(header)
+        return request.COOKIES.get(settings.COOKIE_NAME)
+
     def authenticate(self, request: Request) -> Optional[Tuple[AuthUser, Token]]:
         """
         Autentica o usuário com base no token JWT presente nos cookies da requisição.
         """
-        header = self.get_header(request)
-        raw_token = None
+        raw_token = self.get_request_token(request)
 
-        if header is not None:
-            raw_token = self.get_raw_token(header)
-        elif settings.COOKIE_NAME in request.COOKIES:
-            raw_token = request.COOKIES.get(settings.COOKIE_NAME)
-        
         if raw_token is not None:
+            # Memoiza o resultado na requisição do Django para que novas
+            # autenticações na mesma requisição não repitam o trabalho.
+            django_request = getattr(request, '_request', request)
+            memoized = getattr(django_request, '_cookie_auth', None)
+            if memoized is not None and memoized[0] == raw_token:
+                return memoized[1]
+
             try:
                 validated_token = self.get_validated_token(raw_token)
-                return self.get_user(validated_token), validated_token
+                result = self.get_user(validated_token), validated_token
             except TokenError as e:
-                logger.error(f"Token error: {e}")
+                logger.error("Token error: {error}", error=str(e))
                 raise InvalidToken(e.args[0])
+
+            django_request._cookie_auth = (raw_token, result)
+            return result
         
         return None
 
+    def get_validated_token(self, raw_token: bytes) -> Token:
+        """
+        Reaproveita tokens já verificados nesta instância, pulando a checagem
+        de assinatura enquanto o token não expirar.
+        """
+        validated_token = verified_tokens.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            verified_tokens.add(raw_token, validated_token)
+        return validated_token
+
+    def get_user(self, validated_token: Token) -> AuthUser:
+        """
+        Resolve o usuário do token pelo cache de usuários, evitando um SELECT
+        por requisição. Casos de erro (usuário inexistente ou inativo) e a
+        verificação de revogação ficam com a implementação do simplejwt.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = get_cached_user(user_id) if user_id is not None else None
+        if (
+            user is None
+            or not user.is_active
+            or api_settings.CHECK_REVOKE_TOKEN
+        ):
+            return super().get_user(validated_token)
+        return user
+
+    async def aauthenticate(
+        self, request: HttpRequest
+    ) -> Optional[Tuple[AuthUser, Token]]:
+        """
+        Versão assíncrona de authenticate para views ASGI nativas, que recebem
+        o HttpRequest do Django em vez do Request do DRF.
+        """
+        raw_token = self.get_request_token(request)
+        if raw_token is None:
+            return None
+
+        memoized = getattr(request, '_cookie_auth', None)
+        if memoized is not None and memoized[0] == raw_token:
+            return memoized[1]
+
+        try:
+            # A verificação da assinatura só usa CPU e não bloqueia em I/O.
+            validated_token = self.get_validated_token(raw_token)
+            result = await self.aget_user(validated_token), validated_token
+        except TokenError as e:
+            logger.error("Token error: {error}", error=str(e))
+            raise InvalidToken(e.args[0])
+
+        request._cookie_auth = (raw_token, result)
+        return result
+
+    async def aget_user(self, validated_token: Token) -> AuthUser:
+        """
+        Versão assíncrona de get_user; os casos de erro continuam com o
+        simplejwt, executado em thread.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = (
+            await aget_cached_user(user_id) if user_id is not None else None
+        )
+        if (
+            user is None
+            or not user.is_active
+            or api_settings.CHECK_REVOKE_TOKEN
+        ):
+            return await sync_to_async(super().get_user)(validated_token)
+        return user
@@ -0,0 +1,175 @@
+import json
+import time
+import uuid
+
+import djcelery_email.conf  # noqa: F401 (registra os defaults CELERY_EMAIL_*)
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.serializers.json import DjangoJSONEncoder
+from django_redis import get_redis_connection
+from djcelery_email.tasks import send_emails
+from djcelery_email.utils import dict_to_email, email_to_dict
+from loguru import logger
+
+
+def get_email_batch_client():
+    return get_redis_connection(settings.EMAIL_BATCH_CACHE_ALIAS)
+
+
+class BatchingEmailBackend(BaseEmailBackend):
+    """
+    Backend de email que apenas enfileira as mensagens em uma lista no Redis.
+
+    As mensagens são enviadas em lotes pela task `flush_email_batch`, que roda
+    periodicamente pelo celery beat ou assim que a fila atinge
+    `EMAIL_BATCH_SIZE` mensagens. Cada lote usa uma única conexão SMTP, em vez
+    de uma task e uma conexão por email.
+    """
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+
+        payloads = [
+            json.dumps(email_to_dict(message), cls=DjangoJSONEncoder)
+            for message in email_messages
+        ]
+        try:
+            queued = get_email_batch_client().rpush(
+                settings.EMAIL_BATCH_QUEUE_KEY, *payloads
+            )
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+
+        if queued >= settings.EMAIL_BATCH_SIZE:
+            from finnect.apps.common.tasks import flush_email_batch
+
+            flush_email_batch.delay()
+        return len(payloads)
+
+
+# move um lote do início da fila para a lista de processamento de uma
+# descarga, registrada com o horário para ser devolvida se ela morrer
+CLAIM_BATCH_SCRIPT = """
+local payloads = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #payloads > 0 then
+    redis.call('LTRIM', KEYS[1], #payloads, -1)
+    redis.call('RPUSH', KEYS[2], unpack(payloads))
+    redis.call('ZADD', KEYS[3], ARGV[2], KEYS[2])
+end
+return payloads
+"""
+
+# devolve ao início da fila, na ordem original, o que restou nas listas de
+# processamento KEYS[3..] e as tira do registro
+REQUEUE_SCRIPT = """
+local requeued = 0
+for index = 3, #KEYS do
+    local payloads = redis.call('LRANGE', KEYS[index], 0, -1)
+    for position = #payloads, 1, -1 do
+        redis.call('LPUSH', KEYS[1], payloads[position])
+    end
+    requeued = requeued + #payloads
+    redis.call('DEL', KEYS[index])
+    redis.call('ZREM', KEYS[2], KEYS[index])
+end
+return requeued
+"""
+
+
+def _processing_key() -> str:
+    return f'{settings.EMAIL_BATCH_QUEUE_KEY}:processing'
+
+
+def _requeue(client, processing_keys) -> int:
+    if not processing_keys:
+        return 0
+    return client.eval(
+        REQUEUE_SCRIPT,
+        len(processing_keys) + 2,
+        settings.EMAIL_BATCH_QUEUE_KEY,
+        _processing_key(),
+        *processing_keys,
+    )
+
+
+def requeue_stale_emails(client=None) -> int:
+    """
+    Devolve à fila as mensagens de descargas que não terminaram (worker
+    morto no meio de um lote) há mais de EMAIL_BATCH_PROCESSING_TIMEOUT.
+    """
+    client = client or get_email_batch_client()
+    cutoff = time.time() - (
+        settings.EMAIL_BATCH_PROCESSING_TIMEOUT.total_seconds()
+    )
+    stale = client.zrangebyscore(_processing_key(), '-inf', cutoff)
+    requeued = _requeue(client, stale)
+    if requeued:
+        logger.warning(
+            'Requeued {count} emails left by an interrupted flush',
+            count=requeued,
+        )
+    return requeued
+
+
+def flush_queued_emails() -> int:
+    """
+    Esvazia a fila de emails, enviando lotes de `EMAIL_BATCH_SIZE` mensagens
+    pela mesma conexão com o `CELERY_EMAIL_BACKEND`.
+
+    Cada lote passa para uma lista de processamento desta descarga, e cada
+    mensagem só sai dela depois de enviada ou repassada à task do
+    djcelery_email, que cuida das novas tentativas. Se a conexão falhar, o
+    que sobrou volta para o início da fila; se o worker morrer, a próxima
+    descarga devolve a lista depois de EMAIL_BATCH_PROCESSING_TIMEOUT.
+    """
+    client = get_email_batch_client()
+    requeue_stale_emails(client)
+
+    processing = f'{_processing_key()}:{uuid.uuid4().hex}'
+    claim_batch = client.register_script(CLAIM_BATCH_SCRIPT)
+    connection = None
+    sent = 0
+    try:
+        while True:
+            payloads = claim_batch(
+                keys=[
+                    settings.EMAIL_BATCH_QUEUE_KEY,
+                    processing,
+                    _processing_key(),
+                ],
+                args=[settings.EMAIL_BATCH_SIZE, time.time()],
+            )
+            if not payloads:
+                break
+
+            if connection is None:
+                connection = get_connection(settings.CELERY_EMAIL_BACKEND)
+                connection.open()
+
+            for payload in payloads:
+                message = json.loads(payload)
+                try:
+                    sent += (
+                        connection.send_messages([dict_to_email(message)]) or 0
+                    )
+                except Exception as exc:
+                    logger.error(
+                        'Error sending batched email to {to}: {error}',
+                        to=message['to'],
+                        error=str(exc),
+                    )
+                    send_emails.delay([message])
+                client.lpop(processing)
+    finally:
+        if connection is not None:
+            connection.close()
+        # vazia depois de um lote completo; sobra algo só após uma falha
+        _requeue(client, [processing])
+
+    if sent:
+        logger.info('Sent {count} batched emails', count=sent)
+    return sent
@@ -0,0 +1,167 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from finnect.apps.userprofile.models import Profile
+
+User = get_user_model()
+
+FIRST_NAMES = [
+    'Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor',
+    'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula',
+    'Rafael', 'Sofia', 'Thiago', 'Vitória', 'Wagner',
+]  # fmt: skip
+LAST_NAMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves',
+    'Pereira', 'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho',
+    'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa',
+]  # fmt: skip
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a busca do admin de usuários e perfis sobre uma base semeada: '
+        'com os índices trigram (pg_trgm) e a busca do admin, e com a busca '
+        'padrão do Django sem os índices. Tudo roda em uma transação '
+        'desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--term',
+            action='append',
+            dest='terms',
+            help='Termo buscado (pode repetir). Padrão: alguns termos '
+            'com poucos e com muitos resultados.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Este benchmark precisa do Postgres.')
+
+        terms = options['terms'] or [
+            'silva',
+            'ana@',
+            'bench-00042',
+            'carvalho vitória',
+            '5512345',
+        ]
+        try:
+            with transaction.atomic():
+                self.run(options['users'], terms, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, users, terms, repeat):
+        self.seed(users)
+        request = RequestFactory().get('/')
+        results = {}
+        for label in ('trigram', 'padrão'):
+            if label == 'padrão':
+                self.drop_trigram_indexes()
+            for model in (User, Profile):
+                for term in terms:
+                    results[label, model, term] = self.measure(
+                        model,
+                        request,
+                        term,
+                        repeat,
+                        baseline=label == 'padrão',
+                    )
+        self.report(results, terms)
+
+    def seed(self, total):
+        self.stdout.write(f'Semeando {total:,} usuários e perfis...')
+        started = time.perf_counter()
+        random.seed(0)
+        for offset in range(0, total, BATCH_SIZE):
+            users = []
+            for index in range(offset, min(offset + BATCH_SIZE, total)):
+                first = random.choice(FIRST_NAMES)
+                last = random.choice(LAST_NAMES)
+                users.append(
+                    User(
+                        id=uuid.uuid4(),
+                        username=f'B-{index:010d}',
+                        email=f'{first}.{last}.{index}@bench-{index:05d}.com'.lower(),
+                        first_name=first,
+                        last_name=last,
+                        id_number=900_000_000 + index,
+                        security_question='maiden_name',
+                        security_answer='bench',
+                        password='!',
+                    )
+                )
+            User.objects.bulk_create(users)
+            Profile.objects.bulk_create(
+                Profile(
+                    user=user,
+                    phone_number=f'+55{random.randrange(10**10, 10**11)}',
+                )
+                for user in users
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ANALYZE {User._meta.db_table}, {Profile._meta.db_table}'
+            )
+        self.stdout.write(f'  {time.perf_counter() - started:.1f} s')
+
+    def drop_trigram_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (User, Profile):
+                for index in model._meta.indexes:
+                    if index.name.endswith('_trgm_idx'):
+                        cursor.execute(f'DROP INDEX {index.name}')
+
+    def measure(self, model, request, term, repeat, baseline=False):
+        """
+        Mediana (ms) da página de resultados do changelist: a busca, a
+        contagem filtrada e as primeiras `list_per_page` linhas. Com
+        `baseline`, usa a busca padrão do Django em vez da do admin.
+        """
+        model_admin = admin.site._registry[model]
+        search = (
+            admin.ModelAdmin.get_search_results.__get__(model_admin)
+            if baseline
+            else model_admin.get_search_results
+        )
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset, may_have_duplicates = search(
+                request, model_admin.get_queryset(request), term
+            )
+            if may_have_duplicates:
+                queryset = queryset.distinct()
+            queryset.count()
+            list(queryset[: model_admin.list_per_page])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, results, terms):
+        self.stdout.write(
+            f'{"modelo":<8} {"termo":<18} {"trigram":>10} {"padrão":>12}'
+        )
+        for model in (User, Profile):
+            for term in terms:
+                indexed = results['trigram', model, term]
+                plain = results['padrão', model, term]
+                self.stdout.write(
+                    f'{model.__name__:<8} {term:<18} {indexed:>8.1f}ms '
+                    f'{plain:>10.1f}ms  ({plain / indexed:.1f}x)'
+                )
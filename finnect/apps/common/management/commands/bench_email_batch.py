@@ -0,0 +1,125 @@
+import socket
+import time
+from unittest import mock
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from finnect.apps.common import tasks
+from finnect.apps.common.mail import flush_queued_emails
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+QUEUE_KEY = 'email:batch:bench'
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        self.sessions.add(session)
+        return '250 Message accepted for delivery'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão de envio de emails com uma conexão SMTP por mensagem '
+        'e pela fila do BatchingEmailBackend esvaziada por '
+        'flush_queued_emails, contra um servidor SMTP local (aiosmtpd). '
+        'Usa o Redis de EMAIL_BATCH_CACHE_ALIAS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            raise CommandError(
+                'Instale o aiosmtpd para rodar este benchmark: '
+                'pip install aiosmtpd'
+            )
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        total = options['messages']
+        messages = [self.build_message(i) for i in range(total)]
+        results = []
+        with override_settings(
+            CELERY_EMAIL_BACKEND=SMTP_BACKEND,
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=port,
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_BATCH_QUEUE_KEY=QUEUE_KEY,
+            EMAIL_BATCH_SIZE=options['batch_size'],
+        ):
+            # a descarga manda todos os lotes pela mesma conexão
+            for label, run, expected_connections in [
+                ('uma conexão por email', self.run_single, total),
+                (
+                    f'fila, lotes de {options["batch_size"]}',
+                    self.run_batched,
+                    1,
+                ),
+            ]:
+                handler = CountingHandler()
+                controller = Controller(
+                    handler, hostname='127.0.0.1', port=port
+                )
+                controller.start()
+                try:
+                    rate = run(messages)
+                finally:
+                    controller.stop()
+                if handler.received != total:
+                    raise CommandError(
+                        f'{label}: {handler.received} de {total} '
+                        'mensagens recebidas.'
+                    )
+                if len(handler.sessions) != expected_connections:
+                    raise CommandError(
+                        f'{label}: {len(handler.sessions)} conexões, '
+                        f'esperadas {expected_connections}.'
+                    )
+                results.append((label, rate, len(handler.sessions)))
+
+        for label, rate, connections in results:
+            self.stdout.write(
+                f'{label:<24} {rate:>10,.0f} emails/s '
+                f'{connections:>6} conexões'
+            )
+
+    def build_message(self, index):
+        message = EmailMultiAlternatives(
+            f'Benchmark {index}',
+            'Corpo em texto',
+            'bench@example.com',
+            [f'user{index}@example.com'],
+        )
+        message.attach_alternative('<p>Corpo em HTML</p>', 'text/html')
+        return message
+
+    def run_single(self, messages):
+        started = time.perf_counter()
+        for message in messages:
+            get_connection(SMTP_BACKEND).send_messages([message])
+        return len(messages) / (time.perf_counter() - started)
+
+    def run_batched(self, messages):
+        connection = get_connection(
+            'finnect.apps.common.mail.BatchingEmailBackend'
+        )
+        started = time.perf_counter()
+        # sem o gatilho por tamanho, que mandaria a descarga para o celery
+        with mock.patch.object(tasks, 'flush_email_batch'):
+            connection.send_messages(messages)
+        flush_queued_emails()
+        return len(messages) / (time.perf_counter() - started)
@@ -0,0 +1,121 @@
+import http.client
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+PERCENTILES = [50, 95, 99]
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispara requisições HTTP concorrentes contra um servidor já no ar, '
+        'com conexões keep-alive, e mede latência (p50/p95/p99) e vazão. '
+        'Serve para comparar o runserver com o gunicorn.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://nginx/api/v1/auth/users/me/',
+            help='URL requisitada (GET).',
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=50,
+            help='Requisições descartadas antes da medição.',
+        )
+        parser.add_argument(
+            '--as-user',
+            metavar='EMAIL',
+            help='Envia um token de acesso desse usuário no cookie access.',
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme not in {'http', 'https'}:
+            raise CommandError('Use uma URL http:// ou https://.')
+
+        headers = {}
+        if options['as_user']:
+            user = (
+                get_user_model()
+                .objects.filter(email=options['as_user'])
+                .first()
+            )
+            if user is None:
+                raise CommandError(f'Usuário {options["as_user"]} não existe.')
+            access = RefreshToken.for_user(user).access_token
+            headers['Cookie'] = f'access={access}'
+
+        path = url.path or '/'
+        if url.query:
+            path = f'{path}?{url.query}'
+        connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        local = threading.local()
+
+        def send():
+            connection = getattr(local, 'connection', None)
+            if connection is None:
+                connection = local.connection = connection_class(
+                    url.hostname, url.port, timeout=30
+                )
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                local.connection = None
+                raise
+
+        def request(_):
+            started = time.perf_counter()
+            try:
+                try:
+                    status = send()
+                except http.client.RemoteDisconnected:
+                    # conexão keep-alive fechada pelo servidor (por exemplo
+                    # um worker reciclado); repete uma vez, como o nginx
+                    status = send()
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+            return time.perf_counter() - started, status
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(request, range(options['warmup'])))
+            started = time.perf_counter()
+            results = list(pool.map(request, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        latencies = [latency * 1000 for latency, _ in results]
+        cuts = statistics.quantiles(latencies, n=100)
+        statuses = Counter(status for _, status in results)
+        self.stdout.write(
+            f'{len(results)} requisições em {elapsed:.2f}s '
+            f'({len(results) / elapsed:.1f} req/s), '
+            f'concorrência {options["concurrency"]}'
+        )
+        self.stdout.write(
+            '  '.join(
+                f'p{value}: {cuts[value - 1]:.1f} ms' for value in PERCENTILES
+            )
+        )
+        self.stdout.write(
+            'status: '
+            + ', '.join(f'{key}={count}' for key, count in statuses.items())
+        )
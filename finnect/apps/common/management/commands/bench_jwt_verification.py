@@ -0,0 +1,53 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from finnect.apps.common.cookies import CookieAuthentication
+from finnect.apps.common.tokens import verified_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a vazão de verificação de tokens de acesso com e sem o '
+        'cache de tokens verificados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument(
+            '--tokens',
+            type=int,
+            default=50,
+            help='Quantidade de tokens distintos usados em rodízio.',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        raw_tokens = []
+        for _ in range(options['tokens']):
+            token = AccessToken()
+            token[api_settings.USER_ID_CLAIM] = str(uuid.uuid4())
+            raw_tokens.append(str(token).encode())
+
+        verified_tokens.clear()
+        baseline = self.run(JWTAuthentication(), raw_tokens, iterations)
+        cached = self.run(CookieAuthentication(), raw_tokens, iterations)
+        verified_tokens.clear()
+
+        for label, rate in [
+            ('simplejwt', baseline),
+            ('cache de verificados', cached),
+        ]:
+            self.stdout.write(f'{label:<22} {rate:>12,.0f} tokens/s')
+        self.stdout.write(f'Ganho: {cached / baseline:.1f}x')
+
+    def run(self, authentication, raw_tokens, iterations):
+        count = len(raw_tokens)
+        started = time.perf_counter()
+        for index in range(iterations):
+            authentication.get_validated_token(raw_tokens[index % count])
+        return iterations / (time.perf_counter() - started)
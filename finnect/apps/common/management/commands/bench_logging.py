@@ -0,0 +1,121 @@
+import logging
+import multiprocessing
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from loguru import logger
+
+from finnect.interceptor import InterceptHandler, loguru_handlers
+
+MODES = {
+    'sync-text': {'enqueue': False, 'serialize': False},
+    'sync-json': {'enqueue': False, 'serialize': True},
+    'enqueue-text': {'enqueue': True, 'serialize': False},
+    'enqueue-json': {'enqueue': True, 'serialize': True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o custo dos logs no caminho da requisição para cada forma de '
+        'escrita (texto ou JSON, síncrona ou com fila) e nível. Cada '
+        'requisição simulada emite dois registros do loguru com campos, '
+        'um do logging da biblioteca padrão e três de DEBUG.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument(
+            '--level',
+            action='append',
+            dest='levels',
+            help='Nível dos sinks; pode ser repetido (padrão: DEBUG e INFO).',
+        )
+        parser.add_argument(
+            '--rotation',
+            default='10MB',
+            help=(
+                'Tamanho de rotação dos arquivos; um valor pequeno (100KB) '
+                'mostra o custo da rotação e da compressão no p99 e no máximo.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        levels = options['levels'] or ['DEBUG', 'INFO']
+        std_logger = logging.getLogger('finnect.bench_logging')
+        std_logger.propagate = False
+        std_logger.addHandler(InterceptHandler())
+
+        self.stdout.write(
+            f'{"modo":<14} {"nível":<6} {"média":>10} {"p99":>10} '
+            f'{"máximo":>11} {"com escrita":>12}'
+        )
+        try:
+            with tempfile.TemporaryDirectory() as log_dir:
+                for mode, mode_options in MODES.items():
+                    for level in levels:
+                        timings, total = self.run(
+                            log_dir,
+                            std_logger,
+                            options['requests'],
+                            level=level,
+                            rotation=options['rotation'],
+                            **mode_options,
+                        )
+                        p99 = statistics.quantiles(timings, n=100)[98]
+                        self.stdout.write(
+                            f'{mode:<14} {level:<6} '
+                            f'{statistics.fmean(timings):>7.1f} µs '
+                            f'{p99:>7.1f} µs {max(timings):>8.1f} µs '
+                            f'{total:>9.1f} µs'
+                        )
+        finally:
+            std_logger.handlers.clear()
+            logger.configure(**settings.LOGURU_LOGGING)
+
+    def run(self, log_dir, std_logger, requests, **options):
+        """
+        Tempo de cada requisição em µs e a média por requisição incluindo a
+        espera até a fila terminar de escrever.
+
+        Como no gunicorn com preload_app, o loguru é configurado neste
+        processo e as requisições rodam em um processo criado por fork; com
+        `enqueue`, a thread que escreve fica aqui e não disputa o GIL com
+        elas.
+        """
+        logger.configure(handlers=loguru_handlers(log_dir, **options))
+        std_logger.setLevel(options['level'])
+        context = multiprocessing.get_context('fork')
+        receiver, sender = context.Pipe(duplex=False)
+        started = time.perf_counter()
+        worker = context.Process(
+            target=self.worker, args=(sender, std_logger, requests)
+        )
+        worker.start()
+        sender.close()
+        timings = receiver.recv()
+        worker.join()
+        logger.complete()
+        total = (time.perf_counter() - started) / requests * 1e6
+        return timings, total
+
+    def worker(self, sender, std_logger, requests):
+        timings = []
+        for index in range(requests):
+            request_started = time.perf_counter()
+            self.request(index, std_logger)
+            timings.append((time.perf_counter() - request_started) * 1e6)
+        sender.send(timings)
+        sender.close()
+
+    def request(self, index, std_logger):
+        email = f'user{index}@example.com'
+        logger.debug('Looking up user {email}', email=email)
+        logger.debug('Cache miss for {email}', email=email)
+        logger.info('OTP sent for login to user: {email}', email=email)
+        std_logger.info('"POST /api/v1/auth/login/ HTTP/1.1" 200')
+        logger.debug('Queries for {email}: {count}', email=email, count=4)
+        logger.info('User logged in successfully: {email}', email=email)
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finnect.apps.common.models import ContentView
+from finnect.apps.common.partitions import (
+    MonthlyPartitions,
+    add_months,
+    month_start,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria as partições mensais futuras da tabela de ContentView e '
+        'desanexa (ou apaga, com --drop) as que saíram da janela de '
+        'retenção. Só se aplica ao Postgres.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.CONTENT_VIEW_PARTITION_MONTHS_AHEAD,
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.CONTENT_VIEW_RETENTION_MONTHS,
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            default=settings.CONTENT_VIEW_DROP_EXPIRED_PARTITIONS,
+            help='Apaga as partições expiradas em vez de só desanexá-las.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Só lista as partições existentes, sem alterar nada.',
+        )
+
+    def handle(self, *args, **options):
+        partitions = MonthlyPartitions(ContentView)
+        if not partitions.enabled:
+            raise CommandError(
+                f'A tabela {partitions.table} não é particionada '
+                '(o particionamento só é aplicado no Postgres).'
+            )
+
+        if options['dry_run']:
+            cutoff = add_months(
+                month_start(timezone.now().date()),
+                -options['retention_months'],
+            )
+            for month, name in sorted(partitions.partitions().items()):
+                status = 'expired' if month < cutoff else 'kept'
+                self.stdout.write(f'{name}: {status}')
+            return
+
+        created, expired = partitions.maintain(
+            months_ahead=options['months_ahead'],
+            retention_months=options['retention_months'],
+            drop=options['drop'],
+        )
+        for name in created:
+            self.stdout.write(f'created {name}')
+        action = 'dropped' if options['drop'] else 'detached'
+        for name in expired:
+            self.stdout.write(f'{action} {name}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{len(created)} created, {len(expired)} {action}'
+            )
+        )
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finnect.profiling import TOKEN_HEADER, make_profiling_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Emite, para um usuário staff, um token que faz a requisição que o '
+        f'envia no header {TOKEN_HEADER} ser perfilada (com '
+        'PROFILING_ENABLED). O token vale por PROFILING_TOKEN_MAX_AGE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email do usuário staff.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError('Usuário não encontrado.')
+        try:
+            token = make_profiling_token(user)
+        except ValueError:
+            raise CommandError('Só usuários staff podem perfilar requisições.')
+
+        if not settings.PROFILING_ENABLED:
+            self.stderr.write(
+                'PROFILING_ENABLED está desligado; o token será ignorado.'
+            )
+        self.stdout.write(f'{TOKEN_HEADER}: {token}')
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import Sum
+
+
+class ContentViewRollupQuerySet(models.QuerySet):
+    """
+    API de consulta sobre as tabelas de rollup de visualizações, para que
+    relatórios e dashboards nunca precisem contar linhas de ContentView.
+    """
+
+    def for_object(self, content_object: Any) -> 'ContentViewRollupQuerySet':
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(content_object),
+            object_id=content_object.pk,
+        )
+
+    def for_model(self, model: Any) -> 'ContentViewRollupQuerySet':
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(model)
+        )
+
+    def between(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> 'ContentViewRollupQuerySet':
+        """
+        Períodos que começam em [start, end).
+        """
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(period_start__gte=start)
+        if end is not None:
+            queryset = queryset.filter(period_start__lt=end)
+        return queryset
+
+    def totals(self) -> dict[str, int]:
+        totals = self.aggregate(
+            views=Sum('views'), new_viewers=Sum('new_viewers')
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+    def series(self) -> list[tuple[datetime, int, int]]:
+        """
+        Série temporal (início do período, visualizações, novos visitantes),
+        somando os objetos do queryset em cada período.
+        """
+        return list(
+            self.values('period_start')
+            .annotate(total_views=Sum('views'), total_new=Sum('new_viewers'))
+            .order_by('period_start')
+            .values_list('period_start', 'total_views', 'total_new')
+        )
+
+    def top(self, limit: int = 10) -> list[tuple[int, Any, int]]:
+        """
+        Objetos mais vistos como (content_type_id, object_id, visualizações).
+        """
+        return list(
+            self.values('content_type_id', 'object_id')
+            .annotate(total_views=Sum('views'))
+            .order_by('-total_views')
+            .values_list('content_type_id', 'object_id', 'total_views')[
+                :limit
+            ]
+        )
@@ -0,0 +1,431 @@
+import atexit
+import bisect
+import functools
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar, Token
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from loguru import logger
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+_LE_LABEL = re.compile(r'le="([^"]*)"')
+
+
+def _escape(value: Any) -> str:
+    return (
+        str(value)
+        .replace('\\', r'\\')
+        .replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def _format_labels(labels: Iterable[tuple[str, Any]]) -> str:
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return f'{{{pairs}}}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _sort_key(sample: str) -> tuple[str, float]:
+    # buckets em ordem numérica de `le`, não alfabética
+    match = _LE_LABEL.search(sample)
+    if match is None:
+        return sample, 0.0
+    return sample[: match.start()], float(match.group(1))
+
+
+class Metric:
+    type = ''
+
+    def __init__(
+        self,
+        registry: 'MetricsRegistry',
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...],
+    ) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+
+    @property
+    def sample_names(self) -> tuple[str, ...]:
+        return (self.name,)
+
+    def _labels(self, labels: dict[str, Any]) -> tuple[tuple[str, Any], ...]:
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        sample = self.name + _format_labels(self._labels(labels))
+        self.registry.add([(sample, amount)])
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(
+        self,
+        registry: 'MetricsRegistry',
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # nomes das amostras por combinação de labels, montados uma vez
+        self._samples: dict[tuple, tuple[list[str], str, str]] = {}
+
+    @property
+    def sample_names(self) -> tuple[str, ...]:
+        return (
+            f'{self.name}_bucket',
+            f'{self.name}_sum',
+            f'{self.name}_count',
+        )
+
+    def _sample_names(
+        self, labels: tuple[tuple[str, Any], ...]
+    ) -> tuple[list[str], str, str]:
+        names = self._samples.get(labels)
+        if names is None:
+            buckets = [
+                f'{self.name}_bucket'
+                + _format_labels(labels + (('le', _format_value(bound)),))
+                for bound in (*self.buckets, math.inf)
+            ]
+            suffix = _format_labels(labels)
+            names = (
+                buckets,
+                f'{self.name}_sum{suffix}',
+                f'{self.name}_count{suffix}',
+            )
+            self._samples[labels] = names
+        return names
+
+    def observe(self, value: float, **labels: Any) -> None:
+        buckets, sum_name, count_name = self._sample_names(
+            self._labels(labels)
+        )
+        # buckets cumulativos: a observação conta em todos com `le` >= value
+        first = bisect.bisect_left(self.buckets, value)
+        samples = [(bucket, 1) for bucket in buckets[first:]]
+        samples += [(sum_name, value), (count_name, 1)]
+        self.registry.add(samples)
+
+
+class MetricsRegistry:
+    """
+    Métricas do processo. Os incrementos ficam em memória e são somados ao
+    backend de `METRICS_BACKEND` a cada `METRICS_FLUSH_INTERVAL` e ao
+    encerrar o processo, então a requisição não faz I/O para registrá-los.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._pending: defaultdict[str, float] = defaultdict(float)
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, help: str, labelnames: tuple[str, ...] = ()
+    ) -> Counter:
+        return self.register(Counter(self, name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(self, name, help, labelnames, buckets))
+
+    def add(self, samples: Iterable[tuple[str, float]]) -> None:
+        with self._lock:
+            for sample, amount in samples:
+                self._pending[sample] += amount
+
+    def flush_due(self) -> bool:
+        interval = settings.METRICS_FLUSH_INTERVAL.total_seconds()
+        return time.monotonic() - self._last_flush >= interval
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            get_metrics_backend().push(pending)
+        except Exception as exc:
+            # devolve os incrementos para a próxima tentativa
+            logger.warning(
+                'Could not flush the metrics: {error}', error=str(exc)
+            )
+            self.add(pending.items())
+
+    def render(self, samples: dict[str, float]) -> str:
+        """
+        Amostras no formato de texto do Prometheus, com HELP e TYPE de cada
+        métrica registrada.
+        """
+        owners = {
+            sample_name: metric.name
+            for metric in self.metrics.values()
+            for sample_name in metric.sample_names
+        }
+        grouped = defaultdict(list)
+        for sample, value in samples.items():
+            owner = owners.get(sample.split('{', 1)[0])
+            if owner is not None:
+                grouped[owner].append((sample, value))
+
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {_escape(metric.help)}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for sample, value in sorted(
+                grouped[metric.name], key=lambda item: _sort_key(item[0])
+            ):
+                lines.append(f'{sample} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class BaseMetricsBackend:
+    """
+    Onde os processos somam suas métricas e de onde o endpoint as lê.
+    """
+
+    def push(self, samples: dict[str, float]) -> None:
+        raise NotImplementedError
+
+    def read(self) -> dict[str, float]:
+        raise NotImplementedError
+
+
+class RedisMetricsBackend(BaseMetricsBackend):
+    """
+    Soma as amostras de todos os workers em um hash no Redis, com um
+    HINCRBYFLOAT por amostra em um único pipeline por descarga.
+    """
+
+    def __init__(self) -> None:
+        self.client = get_redis_connection(settings.METRICS_CACHE_ALIAS)
+        self.key = settings.METRICS_KEY
+
+    def push(self, samples: dict[str, float]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for sample, amount in samples.items():
+            pipeline.hincrbyfloat(self.key, sample, amount)
+        pipeline.execute()
+
+    def read(self) -> dict[str, float]:
+        return {
+            sample.decode(): float(value)
+            for sample, value in self.client.hgetall(self.key).items()
+        }
+
+
+class InMemoryMetricsBackend(BaseMetricsBackend):
+    """
+    Totais só do processo atual, para testes e desenvolvimento sem Redis.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: defaultdict[str, float] = defaultdict(float)
+
+    def push(self, samples: dict[str, float]) -> None:
+        with self._lock:
+            for sample, amount in samples.items():
+                self._totals[sample] += amount
+
+    def read(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._totals)
+
+
+@functools.cache
+def get_metrics_backend() -> BaseMetricsBackend:
+    return import_string(settings.METRICS_BACKEND)()
+
+
+@receiver(setting_changed)
+def reset_metrics_backend(*, setting: str, **kwargs: Any) -> None:
+    if setting in {
+        'METRICS_BACKEND',
+        'METRICS_CACHE_ALIAS',
+        'METRICS_KEY',
+    }:
+        get_metrics_backend.cache_clear()
+
+
+class QueryTracker:
+    """
+    Conta as consultas e o tempo gasto nelas enquanto estiver ativo. Vale
+    para o contexto atual (contextvars), então acompanha a requisição até o
+    sync_to_async das views assíncronas, que consulta o banco pelas conexões
+    de outra thread.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self._token: Optional[Token] = None
+
+    def __enter__(self) -> 'QueryTracker':
+        self._token = _current_tracker.set(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _current_tracker.reset(self._token)
+
+
+_current_tracker: ContextVar[Optional[QueryTracker]] = ContextVar(
+    'query_tracker', default=None
+)
+
+
+def track_queries(execute, sql, params, many, context):
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tracker.count += 1
+        tracker.duration += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_tracking(*, connection: Any, **kwargs: Any) -> None:
+    """
+    Deixa track_queries instalado em toda conexão (o mesmo mecanismo de
+    `connection.execute_wrapper`), já que as conexões são por thread e a
+    requisição não alcança as da thread do sync_to_async.
+    """
+    if track_queries not in connection.execute_wrappers:
+        # no início da lista: execute_wrapper() remove o último wrapper ao
+        # sair, que deve continuar sendo o de quem o instalou
+        connection.execute_wrappers.insert(0, track_queries)
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    'finnect_http_request_duration_seconds',
+    'Latência das requisições, por view.',
+    ('view', 'method'),
+)
+RESPONSES = registry.counter(
+    'finnect_http_responses_total',
+    'Respostas enviadas, por view e status.',
+    ('view', 'method', 'status'),
+)
+DB_QUERIES = registry.histogram(
+    'finnect_db_queries_per_request',
+    'Consultas ao banco feitas por requisição, por view.',
+    ('view',),
+    QUERY_COUNT_BUCKETS,
+)
+DB_DURATION = registry.histogram(
+    'finnect_db_duration_seconds',
+    'Tempo gasto em consultas ao banco por requisição, por view.',
+    ('view',),
+)
+CACHE_LOOKUPS = registry.counter(
+    'finnect_cache_lookups_total',
+    'Leituras de cache, por cache e resultado (hit ou miss).',
+    ('cache', 'result'),
+)
+
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def record_request(
+    request: Any, response: Any, duration: float, queries: QueryTracker
+) -> None:
+    match = request.resolver_match
+    # a view, e não o caminho, para que IDs na URL não virem séries novas
+    view = match.view_name if match is not None else 'unresolved'
+    method = request.method if request.method in HTTP_METHODS else 'other'
+    REQUEST_DURATION.observe(duration, view=view, method=method)
+    RESPONSES.inc(view=view, method=method, status=response.status_code)
+    DB_QUERIES.observe(queries.count, view=view)
+    DB_DURATION.observe(queries.duration, view=view)
+
+
+def cache_hit_ratios(samples: dict[str, float]) -> str:
+    """
+    Razão de acertos acumulada de cada cache, calculada na leitura a partir
+    de finnect_cache_lookups_total.
+    """
+    lookups: defaultdict[str, dict[str, float]] = defaultdict(dict)
+    pattern = re.compile(
+        rf'{CACHE_LOOKUPS.name}\{{cache="([^"]*)",result="(hit|miss)"\}}'
+    )
+    for sample, value in samples.items():
+        match = pattern.fullmatch(sample)
+        if match is not None:
+            lookups[match.group(1)][match.group(2)] = value
+
+    name = 'finnect_cache_hit_ratio'
+    lines = [
+        f'# HELP {name} Fração das leituras de cache que acertaram.',
+        f'# TYPE {name} gauge',
+    ]
+    for cache, results in sorted(lookups.items()):
+        total = results.get('hit', 0.0) + results.get('miss', 0.0)
+        if total:
+            ratio = results.get('hit', 0.0) / total
+            labels = _format_labels([('cache', cache)])
+            lines.append(f'{name}{labels} {_format_value(ratio)}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_metrics(samples: Optional[dict[str, float]] = None) -> str:
+    """
+    Descarrega as métricas deste processo e devolve o total de todos os
+    processos no formato de texto do Prometheus.
+    """
+    if samples is None:
+        registry.flush()
+        samples = get_metrics_backend().read()
+    return registry.render(samples) + cache_hit_ratios(samples)
@@ -0,0 +1,50 @@
+import time
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+
+from finnect.apps.common.metrics import QueryTracker, record_request, registry
+
+
+class MetricsMiddleware:
+    """
+    Registra a latência, o número de consultas e o tempo no banco de cada
+    requisição, por view (ver finnect.apps.common.metrics). Deve ser o
+    primeiro middleware, para medir também os demais.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self._acall(request)
+        started = time.perf_counter()
+        with QueryTracker() as queries:
+            response = self.get_response(request)
+        record_request(
+            request, response, time.perf_counter() - started, queries
+        )
+        if registry.flush_due():
+            registry.flush()
+        return response
+
+    async def _acall(self, request):
+        started = time.perf_counter()
+        with QueryTracker() as queries:
+            response = await self.get_response(request)
+        record_request(
+            request, response, time.perf_counter() - started, queries
+        )
+        if registry.flush_due():
+            await sync_to_async(registry.flush)()
+        return response
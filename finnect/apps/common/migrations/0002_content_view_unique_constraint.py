@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:52
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_views(apps, schema_editor):
+    # unique_together tratava NULLs como distintos, então visitas anônimas
+    # podiam se repetir; mantém só a mais recente de cada combinação
+    ContentView = apps.get_model('common', 'ContentView')
+    fields = ['content_type', 'object_id', 'user', 'viewer_ip']
+    duplicates = (
+        ContentView.objects.values(*fields)
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        duplicate.pop('total')
+        views = ContentView.objects.filter(
+            **{
+                f'{field}__isnull' if value is None else field: (
+                    True if value is None else value
+                )
+                for field, value in duplicate.items()
+            }
+        ).order_by('-last_viewed')
+        keep = views.values_list('id', flat=True).first()
+        views.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='contentview',
+            unique_together=set(),
+        ),
+        migrations.RunPython(
+            remove_duplicate_views, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='contentview',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'user', 'viewer_ip'), name='content_view_unique_viewer', nulls_distinct=False),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:54
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_content_view_unique_constraint'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyContentViewRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('object_id', models.UUIDField(verbose_name='Object ID')),
+                ('period_start', models.DateTimeField(verbose_name='Period Start')),
+                ('views', models.PositiveBigIntegerField(default=0, verbose_name='Views')),
+                ('new_viewers', models.PositiveBigIntegerField(default=0, verbose_name='New Viewers')),
+            ],
+            options={
+                'verbose_name': 'Daily Content View Rollup',
+                'verbose_name_plural': 'Daily Content View Rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyContentViewRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('object_id', models.UUIDField(verbose_name='Object ID')),
+                ('period_start', models.DateTimeField(verbose_name='Period Start')),
+                ('views', models.PositiveBigIntegerField(default=0, verbose_name='Views')),
+                ('new_viewers', models.PositiveBigIntegerField(default=0, verbose_name='New Viewers')),
+            ],
+            options={
+                'verbose_name': 'Hourly Content View Rollup',
+                'verbose_name_plural': 'Hourly Content View Rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Name')),
+                ('processed_until', models.DateTimeField(verbose_name='Processed Until')),
+            ],
+            options={
+                'verbose_name': 'Rollup Watermark',
+                'verbose_name_plural': 'Rollup Watermarks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='contentview',
+            index=models.Index(fields=['updated_at'], name='content_view_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailycontentviewrollup',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content Type'),
+        ),
+        migrations.AddField(
+            model_name='hourlycontentviewrollup',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content Type'),
+        ),
+        migrations.AddIndex(
+            model_name='dailycontentviewrollup',
+            index=models.Index(fields=['period_start'], name='daily_view_rollup_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycontentviewrollup',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'period_start'), name='daily_view_rollup_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='hourlycontentviewrollup',
+            index=models.Index(fields=['period_start'], name='hourly_view_rollup_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlycontentviewrollup',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'period_start'), name='hourly_view_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:58
+
+from datetime import date
+from datetime import timezone as dt_timezone
+
+import finnect.apps.common.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+# partições mensais criadas à frente do mês corrente; depois disso a task
+# rotate_content_view_partitions mantém a janela
+MONTHS_AHEAD = 3
+
+
+def next_month(value):
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+
+def backfill_period(apps, schema_editor):
+    ContentView = apps.get_model('common', 'ContentView')
+    ContentView.objects.update(
+        period=TruncMonth(
+            'created_at',
+            output_field=models.DateField(),
+            tzinfo=dt_timezone.utc,
+        )
+    )
+
+
+def rebuild_table(schema_editor, model, partitioned):
+    """
+    Recria a tabela do modelo, particionada por mês em `period` ou não,
+    copiando as linhas, chaves estrangeiras, constraints e índices.
+    """
+    execute = schema_editor.execute
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    old = f'{table}_old'
+
+    execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+    if partitioned:
+        execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} '
+            'INCLUDING DEFAULTS) PARTITION BY RANGE (period)'
+        )
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN(period) FROM {quote(old)}')
+            (first,) = cursor.fetchone()
+        today = timezone.now().date().replace(day=1)
+        month = min(first or today, today)
+        last = today
+        for _ in range(MONTHS_AHEAD):
+            last = next_month(last)
+        while month <= last:
+            execute(
+                f'CREATE TABLE {quote(f"{table}_p{month:%Y%m}")} '
+                f'PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)',
+                [month, next_month(month)],
+            )
+            month = next_month(month)
+        execute(
+            f'CREATE TABLE {quote(f"{table}_default")} '
+            f'PARTITION OF {quote(table)} DEFAULT'
+        )
+    else:
+        execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} '
+            'INCLUDING DEFAULTS)'
+        )
+
+    execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+    # leva junto as partições, no caminho de volta
+    execute(f'DROP TABLE {quote(old)} CASCADE')
+
+    # a chave primária de uma tabela particionada precisa incluir a chave
+    # de partição
+    primary_key = '(id, period)' if partitioned else '(id)'
+    execute(
+        f'ALTER TABLE {quote(table)} ADD CONSTRAINT '
+        f'{quote(f"{table}_pkey")} PRIMARY KEY {primary_key}'
+    )
+    for field in model._meta.local_fields:
+        if field.remote_field:
+            execute(schema_editor._create_index_sql(model, fields=[field]))
+            execute(
+                schema_editor._create_fk_sql(
+                    model, field, '_fk_%(to_table)s_%(to_column)s'
+                )
+            )
+    for constraint in model._meta.constraints:
+        schema_editor.add_constraint(model, constraint)
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    rebuild_table(
+        schema_editor, apps.get_model('common', 'ContentView'), True
+    )
+
+
+def unpartition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    rebuild_table(
+        schema_editor, apps.get_model('common', 'ContentView'), False
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0003_content_view_rollups'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='contentview',
+            name='content_view_unique_viewer',
+        ),
+        migrations.AddField(
+            model_name='contentview',
+            name='period',
+            field=models.DateField(default=finnect.apps.common.models.current_period, editable=False, verbose_name='Period'),
+        ),
+        migrations.RunPython(backfill_period, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='contentview',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'user', 'viewer_ip', 'period'), name='content_view_unique_viewer', nulls_distinct=False),
+        ),
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
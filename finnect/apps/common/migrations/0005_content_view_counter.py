@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+
+def backfill_views(apps, schema_editor):
+    # cada linha existente representa ao menos uma visualização, que os
+    # rollups antigos já contaram
+    ContentView = apps.get_model('common', 'ContentView')
+    ContentView.objects.update(views=1, rolled_up_views=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0004_content_view_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentview',
+            name='views',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Views'),
+        ),
+        migrations.AddField(
+            model_name='contentview',
+            name='rolled_up_views',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Rolled Up Views'),
+        ),
+        migrations.RunPython(backfill_views, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,16 @@
 import uuid
-from typing import Any, Optional
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from typing import Any, Iterable, Optional
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import IntegrityError, models
+from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from finnect.apps.common.managers import ContentViewRollupQuerySet
+
 User = get_user_model()
 
 
@@ -21,6 +25,17 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+def period_of(value: datetime) -> date:
+    """
+    Primeiro dia do mês (UTC) de `value`, a chave de partição de ContentView.
+    """
+    return value.astimezone(dt_timezone.utc).date().replace(day=1)
+
+
+def current_period() -> date:
+    return period_of(timezone.now())
+
+
 class ContentView(TimeStampedModel):
     """
     Modelo para rastrear visualizações de diferentes tipos de conteúdo na aplicação.
@@ -78,13 +93,45 @@ class ContentView(TimeStampedModel):
         null=True, blank=True, verbose_name=_('Viewer IP')
     )
     last_viewed = models.DateTimeField()
+    # quantas vezes a combinação (usuário, IP) viu o objeto no mês, somadas
+    # a cada descarga do buffer; `rolled_up_views` é a parte que o rollup
+    # incremental já contou
+    views = models.PositiveBigIntegerField(
+        default=0, verbose_name=_('Views')
+    )
+    rolled_up_views = models.PositiveBigIntegerField(
+        default=0, editable=False, verbose_name=_('Rolled Up Views')
+    )
+    # Mês em que a linha foi criada. No Postgres a tabela é particionada por
+    # este campo (ver common/partitions.py), e toda constraint única de uma
+    # tabela particionada precisa incluir a chave de partição.
+    period = models.DateField(
+        default=current_period, editable=False, verbose_name=_('Period')
+    )
 
     class Meta:
         verbose_name = _('Content View')
         verbose_name_plural = _('Content Views')
-        # Impede que um usuário com o mesmo IP registre visualizações repetidas
-        # no banco de dados para o mesmo objeto.
-        unique_together = ['content_type', 'object_id', 'user', 'viewer_ip']
+        constraints = [
+            # Impede que um usuário com o mesmo IP registre visualizações
+            # repetidas no banco de dados para o mesmo objeto no mesmo mês.
+            # NULLS NOT DISTINCT faz visitas anônimas (user nulo) também
+            # colidirem, o que o upsert em lote de record_view precisa.
+            models.UniqueConstraint(
+                fields=[
+                    'content_type', 'object_id', 'user', 'viewer_ip', 'period'
+                ],
+                name='content_view_unique_viewer',
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            # usado pelo rollup incremental, que lê só as linhas alteradas
+            # desde a última execução
+            models.Index(
+                fields=['updated_at'], name='content_view_updated_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return (
@@ -99,19 +146,130 @@ class ContentView(TimeStampedModel):
         user: Optional[User],  # type: ignore
         viewer_ip: Optional[str] = None,
     ) -> None:
+        """
+        Registra a visualização no buffer de visualizações, sem escrever no
+        banco durante a requisição. O buffer é gravado em lote pela task
+        `flush_content_views` (ver CONTENT_VIEW_BUFFER_BACKEND). O visitante
+        também entra no contador de visitantes únicos do objeto (ver
+        UNIQUE_VIEWERS_BACKEND).
+        """
+        from finnect.apps.common.unique_viewers import (
+            get_unique_viewer_counter,
+            viewer_identity,
+        )
+        from finnect.apps.common.view_buffer import get_content_view_buffer
+
         content_type = ContentType.objects.get_for_model(content_object)
-        try:
-            view, created = cls.objects.get_or_create(
-                content_type=content_type,
-                object_id=content_object.id,
-                user=user,
-                viewer_ip=viewer_ip,
-                defaults={'last_viewed': timezone.now()}
+        object_id = str(content_object.id)
+        user_id = str(user.pk) if getattr(user, 'pk', None) else None
+        now = timezone.now()
+        get_content_view_buffer().add(
+            (content_type.pk, object_id, user_id, viewer_ip, period_of(now)),
+            now,
+        )
+
+        viewer = viewer_identity(user_id, viewer_ip)
+        if viewer is not None:
+            get_unique_viewer_counter().add(
+                content_type.pk, object_id, viewer, now.date()
             )
-            if not created:
-                view.last_viewed = timezone.now()
-                view.save()
-            
-        except IntegrityError:
-            pass
-    
\ No newline at end of file
+
+    @classmethod
+    def unique_viewers(
+        cls, content_object: Any, days: Optional[Iterable[date]] = None
+    ) -> int:
+        """
+        Estimativa (HyperLogLog) de visitantes únicos do objeto desde
+        sempre ou, com `days`, nos dias informados (UTC).
+
+        Exemplo:
+            >>> ContentView.unique_viewers(post)
+            >>> ContentView.unique_viewers(post, days=[date.today()])
+        """
+        from finnect.apps.common.unique_viewers import (
+            get_unique_viewer_counter,
+        )
+
+        content_type = ContentType.objects.get_for_model(content_object)
+        return get_unique_viewer_counter().count(
+            content_type.pk, str(content_object.id), days
+        )
+
+
+class ContentViewRollup(TimeStampedModel):
+    """
+    Contagem agregada de visualizações de um objeto em um período.
+
+    As tabelas são mantidas pela task `rollup_content_views`, que processa só
+    as linhas de ContentView alteradas desde a execução anterior e soma o
+    que o contador `views` de cada uma cresceu desde então. O acréscimo entra
+    no período do `last_viewed` da linha: visualizações de um mesmo
+    visitante entre duas execuções ficam no período da última delas.
+    `new_viewers` conta as linhas criadas na janela, isto é, as combinações
+    (usuário, IP) que viram o objeto pela primeira vez no mês.
+    """
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, verbose_name=_('Content Type')
+    )
+    object_id = models.UUIDField(verbose_name=_('Object ID'))
+    period_start = models.DateTimeField(verbose_name=_('Period Start'))
+    views = models.PositiveBigIntegerField(default=0, verbose_name=_('Views'))
+    new_viewers = models.PositiveBigIntegerField(
+        default=0, verbose_name=_('New Viewers')
+    )
+
+    objects = ContentViewRollupQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+
+class HourlyContentViewRollup(ContentViewRollup):
+    class Meta:
+        verbose_name = _('Hourly Content View Rollup')
+        verbose_name_plural = _('Hourly Content View Rollups')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'period_start'],
+                name='hourly_view_rollup_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['period_start'], name='hourly_view_rollup_period_idx'
+            ),
+        ]
+
+
+class DailyContentViewRollup(ContentViewRollup):
+    class Meta:
+        verbose_name = _('Daily Content View Rollup')
+        verbose_name_plural = _('Daily Content View Rollups')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'period_start'],
+                name='daily_view_rollup_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['period_start'], name='daily_view_rollup_period_idx'
+            ),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """
+    Até onde (em `updated_at`) cada job de rollup já processou.
+    """
+    name = models.CharField(
+        max_length=64, primary_key=True, verbose_name=_('Name')
+    )
+    processed_until = models.DateTimeField(verbose_name=_('Processed Until'))
+
+    class Meta:
+        verbose_name = _('Rollup Watermark')
+        verbose_name_plural = _('Rollup Watermarks')
+
+    def __str__(self) -> str:
+        return f'{self.name} @ {self.processed_until}'
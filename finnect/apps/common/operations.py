@@ -0,0 +1,40 @@
+from django.db.migrations.operations import AddIndex, RunSQL
+
+
+class PostgresOnlyOperationMixin:
+    """
+    Operação de migração aplicada só no Postgres. O estado dos modelos é
+    alterado em qualquer banco, para que o makemigrations continue
+    enxergando o Meta, mas no SQLite (USE_SQLITE) nada é executado.
+    """
+
+    def database_forwards(
+        self, app_label, schema_editor, from_state, to_state
+    ) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(
+        self, app_label, schema_editor, from_state, to_state
+    ) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def describe(self) -> str:
+        return f'{super().describe()} (PostgreSQL only)'
+
+
+class PostgresAddIndex(PostgresOnlyOperationMixin, AddIndex):
+    """
+    AddIndex para índices específicos do Postgres (GIN, opclasses).
+    """
+
+
+class PostgresRunSQL(PostgresOnlyOperationMixin, RunSQL):
+    """
+    RunSQL com SQL específico do Postgres (sequências, funções).
+    """
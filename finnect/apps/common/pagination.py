@@ -0,0 +1,185 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Any, Optional
+
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+    ValidationError,
+)
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginação por keyset: cada página continua a partir dos valores de
+    ordenação da última linha vista (`WHERE (campos) < (valores)`), sem
+    OFFSET nem COUNT(*), então o custo é o mesmo em qualquer profundidade.
+
+    A ordenação vem de `ordering` (na paginação ou na view), da ordenação do
+    queryset ou do Meta do modelo, sempre completada pela chave primária
+    para desempatar. Os campos precisam ser colunas não nulas do próprio
+    modelo, e um índice com a mesma ordenação deixa cada página em uma
+    varredura curta de índice.
+
+    O cursor é opaco para o cliente (JSON em base64) e as respostas trazem
+    só `next`, `previous` e `results`. Para configurar por view:
+
+        class UserListView(ListAPIView):
+            pagination_class = KeysetPagination
+            ordering = ['-date_joined']
+    """
+
+    ordering = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(
+        self, request: Request, queryset: QuerySet, view: Any
+    ) -> tuple[str, ...]:
+        ordering = (
+            self.ordering
+            or getattr(view, 'ordering', None)
+            or queryset.query.order_by
+            or queryset.model._meta.ordering
+        )
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        ordering = list(ordering)
+
+        opts = queryset.model._meta
+        for item in ordering:
+            if not isinstance(item, str) or '__' in item or '?' in item:
+                raise ImproperlyConfigured(
+                    f'{type(self).__name__} only supports ordering by '
+                    f'local fields, got {item!r}.'
+                )
+
+        names = {item.lstrip('-') for item in ordering}
+        if not names & {'pk', opts.pk.name}:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return tuple(ordering)
+
+    def _field(self, queryset: QuerySet, item: str):
+        name = item.lstrip('-')
+        opts = queryset.model._meta
+        if name == 'pk':
+            return opts.pk
+        try:
+            return opts.get_field(name)
+        except FieldDoesNotExist as exc:
+            raise ImproperlyConfigured(str(exc)) from exc
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: Any = None
+    ) -> Optional[list]:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [self._field(queryset, item) for item in self.ordering]
+
+        position, reverse = self.decode_cursor(request) or (None, False)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                item[1:] if item.startswith('-') else f'-{item}'
+                for item in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        return self.page
+
+    def _after(self, ordering: tuple[str, ...], position: list) -> Q:
+        """
+        Linhas depois de `position` na ordenação: (a, b, c) > (x, y, z)
+        expandido em ORs, já que os campos podem ter direções diferentes.
+        O primeiro termo também limita o primeiro campo (a >= x), para que
+        o banco comece a varredura do índice no ponto certo.
+        """
+        condition = Q()
+        equal = Q()
+        for item, value in zip(ordering, position):
+            name = item.lstrip('-')
+            lookup = 'lt' if item.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': position[0]}) & condition
+
+    def _position(self, instance: Any) -> list:
+        return [
+            field.value_to_string(instance)
+            if not isinstance(instance, dict)
+            else instance[field.attname]
+            for field in self.fields
+        ]
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor((self._position(self.page[-1]), False))
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor((self._position(self.page[0]), True))
+
+    def encode_cursor(self, cursor: tuple[list, bool]) -> str:
+        position, reverse = cursor
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':'), default=str).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.rstrip('=')
+        )
+
+    def decode_cursor(self, request: Request) -> Optional[tuple[list, bool]]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(
+                urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            )
+            raw = payload['p']
+            if not isinstance(raw, list) or len(raw) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.fields, raw)
+            ]
+        except (
+            binascii.Error,
+            KeyError,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get('r'))
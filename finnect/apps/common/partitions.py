@@ -0,0 +1,185 @@
+import re
+from datetime import date
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from loguru import logger
+
+from finnect.apps.common.models import ContentView
+
+PARTITION_SUFFIX = re.compile(r'_p(?P<year>\d{4})(?P<month>\d{2})$')
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    year, month = divmod(value.month - 1 + months, 12)
+    return date(value.year + year, month + 1, 1)
+
+
+class MonthlyPartitions:
+    """
+    Partições mensais (RANGE por `period`) de uma tabela Postgres já
+    particionada, chamadas `<tabela>_pAAAAMM`, mais a partição DEFAULT
+    `<tabela>_default`, que só recebe linhas se faltar a partição do mês.
+    """
+
+    def __init__(self, model, using: Optional[str] = None) -> None:
+        self.using = using or router.db_for_write(model)
+        self.connection = connections[self.using]
+        self.table = model._meta.db_table
+        self.default_partition = f'{self.table}_default'
+
+    @property
+    def enabled(self) -> bool:
+        if self.connection.vendor != 'postgresql':
+            return False
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)',
+                [self.table],
+            )
+            row = cursor.fetchone()
+        return row is not None and row[0] == 'p'
+
+    def partition_name(self, month: date) -> str:
+        return f'{self.table}_p{month:%Y%m}'
+
+    def partitions(self) -> dict[date, str]:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid '
+                'WHERE i.inhparent = to_regclass(%s)',
+                [self.table],
+            )
+            names = [name for (name,) in cursor.fetchall()]
+        partitions = {}
+        for name in names:
+            match = PARTITION_SUFFIX.search(name)
+            if match:
+                month = date(int(match['year']), int(match['month']), 1)
+                partitions[month] = name
+        return partitions
+
+    def create(self, month: date) -> str:
+        """
+        Cria a partição do mês. Linhas do mês que já tenham caído na
+        partição DEFAULT são movidas para ela.
+        """
+        quote = self.connection.ops.quote_name
+        table, default = quote(self.table), quote(self.default_partition)
+        name = self.partition_name(month)
+        bounds = [month, add_months(month, 1)]
+        with transaction.atomic(using=self.using):
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM {default} '
+                    'WHERE period >= %s AND period < %s)',
+                    bounds,
+                )
+                (stray_rows,) = cursor.fetchone()
+                if stray_rows:
+                    cursor.execute(
+                        f'ALTER TABLE {table} DETACH PARTITION {default}'
+                    )
+                cursor.execute(
+                    f'CREATE TABLE {quote(name)} PARTITION OF {table} '
+                    'FOR VALUES FROM (%s) TO (%s)',
+                    bounds,
+                )
+                if stray_rows:
+                    cursor.execute(
+                        f'WITH moved AS (DELETE FROM {default} '
+                        'WHERE period >= %s AND period < %s RETURNING *) '
+                        f'INSERT INTO {table} SELECT * FROM moved',
+                        bounds,
+                    )
+                    cursor.execute(
+                        f'ALTER TABLE {table} ATTACH PARTITION {default} '
+                        'DEFAULT'
+                    )
+        return name
+
+    def detach(self, name: str, drop: bool = False) -> None:
+        quote = self.connection.ops.quote_name
+        with transaction.atomic(using=self.using):
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f'ALTER TABLE {quote(self.table)} '
+                    f'DETACH PARTITION {quote(name)}'
+                )
+                if drop:
+                    cursor.execute(f'DROP TABLE {quote(name)}')
+
+    def maintain(
+        self,
+        months_ahead: int,
+        retention_months: int,
+        drop: bool = False,
+        today: Optional[date] = None,
+    ) -> tuple[list[str], list[str]]:
+        """
+        Garante as partições do mês atual e dos `months_ahead` seguintes e
+        desanexa (ou apaga, com `drop`) as que ficaram inteiras antes dos
+        últimos `retention_months` meses.
+        """
+        current = month_start(today or timezone.now().date())
+        existing = self.partitions()
+
+        created = [
+            self.create(month)
+            for month in (
+                add_months(current, offset)
+                for offset in range(months_ahead + 1)
+            )
+            if month not in existing
+        ]
+
+        cutoff = add_months(current, -retention_months)
+        expired = [
+            name for month, name in sorted(existing.items()) if month < cutoff
+        ]
+        for name in expired:
+            self.detach(name, drop=drop)
+        return created, expired
+
+
+def maintain_content_view_partitions(
+    months_ahead: Optional[int] = None,
+    retention_months: Optional[int] = None,
+    drop: Optional[bool] = None,
+) -> tuple[list[str], list[str]]:
+    partitions = MonthlyPartitions(ContentView)
+    if not partitions.enabled:
+        logger.debug('ContentView is not partitioned, skipping maintenance')
+        return [], []
+
+    created, expired = partitions.maintain(
+        months_ahead=(
+            settings.CONTENT_VIEW_PARTITION_MONTHS_AHEAD
+            if months_ahead is None
+            else months_ahead
+        ),
+        retention_months=(
+            settings.CONTENT_VIEW_RETENTION_MONTHS
+            if retention_months is None
+            else retention_months
+        ),
+        drop=(
+            settings.CONTENT_VIEW_DROP_EXPIRED_PARTITIONS
+            if drop is None
+            else drop
+        ),
+    )
+    if created or expired:
+        logger.info(
+            'ContentView partitions created: {created}, expired: {expired}',
+            created=created,
+            expired=expired,
+        )
+    return created, expired
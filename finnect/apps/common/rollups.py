@@ -0,0 +1,142 @@
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from loguru import logger
+
+from finnect.apps.common.models import (
+    ContentView,
+    DailyContentViewRollup,
+    HourlyContentViewRollup,
+    RollupWatermark,
+)
+from finnect.apps.common.partitions import add_months, month_start
+
+WATERMARK_NAME = 'content_views'
+ROLLUPS = [
+    (HourlyContentViewRollup, TruncHour),
+    (DailyContentViewRollup, TruncDay),
+]
+BATCH_SIZE = 1000
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _apply(model, buckets) -> int:
+    """
+    Soma os buckets às linhas de rollup existentes. Roda com a marca d'água
+    travada, então a leitura seguida do upsert não disputa com outra
+    execução.
+    """
+    applied = 0
+    for chunk in _chunks(buckets.iterator(chunk_size=BATCH_SIZE), BATCH_SIZE):
+        existing = {
+            (row.content_type_id, row.object_id, row.period_start): row
+            for row in model.objects.filter(
+                content_type_id__in={b['content_type_id'] for b in chunk},
+                object_id__in={b['object_id'] for b in chunk},
+                period_start__in={b['bucket'] for b in chunk},
+            )
+        }
+        rows = []
+        for bucket in chunk:
+            key = (
+                bucket['content_type_id'],
+                bucket['object_id'],
+                bucket['bucket'],
+            )
+            current = existing.get(key)
+            rows.append(
+                model(
+                    content_type_id=bucket['content_type_id'],
+                    object_id=bucket['object_id'],
+                    period_start=bucket['bucket'],
+                    views=bucket['added_views']
+                    + (current.views if current else 0),
+                    new_viewers=bucket['new_viewers']
+                    + (current.new_viewers if current else 0),
+                )
+            )
+        model.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['content_type', 'object_id', 'period_start'],
+            update_fields=['views', 'new_viewers', 'updated_at'],
+        )
+        applied += len(rows)
+    return applied
+
+
+def update_content_view_rollups(now: Optional[datetime] = None) -> int:
+    """
+    Atualiza os rollups por hora e por dia com as linhas de ContentView
+    alteradas desde a última execução.
+
+    Só processa até `agora - CONTENT_VIEW_ROLLUP_LAG`, para não pular linhas
+    de transações que ainda não tinham sido confirmadas quando a janela foi
+    lida. Cada linha alterada soma `views - rolled_up_views` (o que o
+    contador cresceu desde a execução anterior) no período do seu
+    `last_viewed`; linhas criadas na janela também contam como novo
+    visitante.
+    """
+    until = (now or timezone.now()) - settings.CONTENT_VIEW_ROLLUP_LAG
+    with transaction.atomic():
+        watermark, _ = (
+            RollupWatermark.objects.select_for_update().get_or_create(
+                name=WATERMARK_NAME, defaults={'processed_until': EPOCH}
+            )
+        )
+        since = watermark.processed_until
+        if until <= since:
+            return 0
+
+        # Uma linha só é atualizada no mês do seu `period`, então o filtro
+        # deixa o Postgres podar as partições antigas. O mês anterior entra
+        # para cobrir a descarga que atravessa a virada do mês.
+        changed = ContentView.objects.filter(
+            period__gte=add_months(month_start(since), -1),
+            updated_at__gt=since,
+            updated_at__lte=until,
+        )
+        # Trava as linhas até o fim: uma descarga que somasse visualizações
+        # entre a leitura dos acréscimos e o update de `rolled_up_views`
+        # teria as dela marcadas como contadas.
+        locked = changed.select_for_update().values_list('pk', flat=True)
+        for _ in locked.iterator(chunk_size=BATCH_SIZE):
+            pass
+
+        applied = 0
+        for model, trunc in ROLLUPS:
+            buckets = (
+                changed.annotate(bucket=trunc('last_viewed'))
+                .values('content_type_id', 'object_id', 'bucket')
+                .annotate(
+                    added_views=Sum(F('views') - F('rolled_up_views')),
+                    new_viewers=Count('id', filter=Q(created_at__gt=since)),
+                )
+                .order_by()
+            )
+            applied += _apply(model, buckets)
+        changed.update(rolled_up_views=F('views'))
+
+        watermark.processed_until = until
+        watermark.save(update_fields=['processed_until'])
+
+    if applied:
+        logger.info(
+            'Updated {applied} content view rollup rows up to {until}',
+            applied=applied,
+            until=until,
+        )
+    return applied
@@ -0,0 +1,41 @@
+from typing import Any, Type
+
+from celery.signals import worker_process_init, worker_shutdown
+from django.conf import settings
+from django.db.models.base import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from finnect.apps.common.cache import invalidate_cached_user
+from finnect.apps.common.content_types import warm_content_type_cache
+from finnect.apps.common.view_buffer import flush_content_view_buffer
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cache(
+    sender: Type[Model], instance: Model, using: str, **kwargs: Any
+) -> None:
+    """
+    Descarta o snapshot em cache do usuário sempre que ele é salvo ou removido
+    (depois do commit, ver invalidate_cached_user).
+    """
+    invalidate_cached_user(instance.pk, using=using)
+
+
+@worker_shutdown.connect
+def drain_content_view_buffer(**kwargs: Any) -> None:
+    """
+    Grava as visualizações pendentes antes de o worker do celery encerrar,
+    para que nada fique esperando a próxima descarga periódica.
+    """
+    flush_content_view_buffer()
+
+
+@worker_process_init.connect
+def warm_worker_content_types(**kwargs: Any) -> None:
+    """
+    Carrega os ContentTypes em cada processo do celery, que registra
+    visualizações e resolve relações genéricas nas tasks.
+    """
+    warm_content_type_cache()
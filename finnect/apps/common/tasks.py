@@ -0,0 +1,26 @@
+from celery import shared_task
+
+from finnect.apps.common.mail import flush_queued_emails
+from finnect.apps.common.partitions import maintain_content_view_partitions
+from finnect.apps.common.rollups import update_content_view_rollups
+from finnect.apps.common.view_buffer import flush_content_view_buffer
+
+
+@shared_task(name='common.flush_email_batch', ignore_result=True)
+def flush_email_batch() -> int:
+    return flush_queued_emails()
+
+
+@shared_task(name='common.flush_content_views', ignore_result=True)
+def flush_content_views() -> int:
+    return flush_content_view_buffer()
+
+
+@shared_task(name='common.rollup_content_views', ignore_result=True)
+def rollup_content_views() -> int:
+    return update_content_view_rollups()
+
+
+@shared_task(name='common.rotate_content_view_partitions', ignore_result=True)
+def rotate_content_view_partitions() -> None:
+    maintain_content_view_partitions()
@@ -0,0 +1,76 @@
+"""
+Utilitários compartilhados pelos testes dos apps.
+"""
+
+from typing import Any, Callable
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+PASSWORD = 'Secret123!x'
+# para testes que criam muitos usuários, em que o argon2 dominaria o tempo
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# caches em memória do processo no lugar do Redis, para os testes que passam
+# pelas views (throttles do DRF e cache de usuários usam o alias "default")
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-default',
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-local',
+    },
+}
+
+
+def create_user(index: int, **extra_fields: Any):
+    """
+    Usuário válido com e-mail e id_number derivados de `index`.
+    """
+    return get_user_model().objects.create_user(
+        email=f'user{index}@example.com',
+        password=PASSWORD,
+        first_name='Test',
+        last_name=f'User {index}',
+        id_number=index,
+        security_question='maiden_name',
+        security_answer='answer',
+        **extra_fields,
+    )
+
+
+class AdminQueryCountMixin:
+    """
+    Para TestCase: loga um superusuário (`self.admin`, criado com o índice
+    0) e confere que uma changelist do admin roda o mesmo número de
+    consultas com uma linha e com `rows` linhas, o que pega colunas que leem
+    uma relação por linha.
+    """
+
+    rows = 20
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.admin = create_user(0, is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+
+    def assert_constant_queries(
+        self, url: str, add_rows: Callable[[], Any]
+    ) -> None:
+        """
+        `url` deve listar uma linha; `add_rows` cria as outras `rows - 1`.
+        """
+        # a primeira requisição preenche os caches de sessão e ContentType
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        assert response.context['cl'].result_count == 1
+
+        add_rows()
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.context['cl'].result_count == self.rows
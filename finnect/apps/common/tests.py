@@ -1,3 +1,898 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import pstats
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import unittest
+import uuid
+from base64 import urlsafe_b64encode
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import signing
+from django.core.cache import caches
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from loguru import logger
+from rest_framework import generics, serializers, status
+from rest_framework.test import APIRequestFactory
+
+from finnect import profiling
+from finnect.apps.common import mail, tasks, view_buffer
+from finnect.apps.common.cache import get_cached_user, get_user_version
+from finnect.apps.common.models import (
+    ContentView,
+    DailyContentViewRollup,
+    HourlyContentViewRollup,
+    period_of,
+)
+from finnect.apps.common.pagination import KeysetPagination
+from finnect.apps.common.rollups import update_content_view_rollups
+from finnect.apps.common.testing import (
+    FAST_PASSWORD_HASHERS,
+    LOCAL_CACHES,
+    AdminQueryCountMixin,
+    create_user,
+)
+from finnect.apps.common.unique_viewers import HyperLogLog
+from finnect.apps.common.view_buffer import (
+    RedisContentViewBuffer,
+    get_content_view_buffer,
+    upsert_content_views,
+)
+from finnect.apps.userprofile.models import Profile
+from finnect.interceptor import InterceptHandler, json_format
+from finnect.profiling import (
+    ProfilingASGIMiddleware,
+    ProfilingWSGIMiddleware,
+    RequestProfiler,
+    check_profiling_token,
+    make_profiling_token,
+)
+
+User = get_user_model()
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'user-cache-tests',
+        },
+        'local': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'user-cache-tests-local',
+        },
+    },
+    USER_CACHE_ALIAS='default',
+    USER_CACHE_LOCAL_ALIAS='local',
+)
+class UserCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['local'].clear()
+        self.user = create_user(1)
+
+    def test_snapshot_leaves_out_the_password_hash(self):
+        get_cached_user(self.user.pk)
+        caches['local'].clear()
+
+        cached = get_cached_user(self.user.pk)
+        assert cached.get_deferred_fields() == {'password'}
+        # still readable, from the database
+        assert cached.password == self.user.password
+
+    def test_invalidation_waits_for_the_commit(self):
+        version = get_user_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.user.first_name = 'Changed'
+                self.user.save()
+                # a concurrent reader still sees the old row
+                assert get_user_version(self.user.pk) == version
+        assert get_user_version(self.user.pk) != version
+        assert get_cached_user(self.user.pk).first_name == 'Changed'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class SMTPStandIn:
+    """
+    aiosmtpd handler that keeps the messages and the sessions (one per
+    SMTP connection) they arrived on.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(session)
+        return '250 Message accepted for delivery'
+
+
+@unittest.skipIf(Controller is None, 'aiosmtpd is not installed')
+@override_settings(
+    EMAIL_BACKEND='finnect.apps.common.mail.BatchingEmailBackend',
+    CELERY_EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+    EMAIL_HOST='127.0.0.1',
+    EMAIL_USE_TLS=False,
+    EMAIL_USE_SSL=False,
+    EMAIL_BATCH_QUEUE_KEY='email:batch:tests',
+    EMAIL_BATCH_SIZE=3,
+)
+class EmailBatchTests(SimpleTestCase):
+    """
+    Needs the Redis behind EMAIL_BATCH_CACHE_ALIAS.
+    """
+
+    count = 7
+
+    def setUp(self):
+        try:
+            self.client = mail.get_email_batch_client()
+            self.client.ping()
+        except Exception as exc:
+            self.skipTest(f'no Redis for EMAIL_BATCH_CACHE_ALIAS: {exc}')
+        self.clear_queue()
+        self.addCleanup(self.clear_queue)
+
+        self.smtp = SMTPStandIn()
+        self.port = free_port()
+        controller = Controller(
+            self.smtp, hostname='127.0.0.1', port=self.port
+        )
+        controller.start()
+        self.addCleanup(controller.stop)
+
+    def clear_queue(self):
+        registry = mail._processing_key()
+        self.client.delete(
+            'email:batch:tests', registry, *self.client.zrange(registry, 0, -1)
+        )
+
+    def queue_messages(self):
+        connection = get_connection()
+        # the size trigger would queue flush_email_batch on the broker
+        with mock.patch.object(tasks, 'flush_email_batch') as flush_task:
+            for index in range(self.count):
+                EmailMessage(
+                    f'Message {index}',
+                    'Body',
+                    'bank@example.com',
+                    [f'user{index}@example.com'],
+                    connection=connection,
+                ).send()
+        assert flush_task.delay.called
+
+    def flush(self, port=None):
+        with self.settings(EMAIL_PORT=port or self.port):
+            return mail.flush_queued_emails()
+
+    def assert_delivered(self):
+        assert len(self.smtp.messages) == self.count
+        # every batch goes over the same connection
+        assert len(self.smtp.sessions) == 1
+        assert self.client.llen('email:batch:tests') == 0
+        assert self.client.zcard(mail._processing_key()) == 0
+
+    def test_flush_sends_every_batch_over_one_connection(self):
+        self.queue_messages()
+        assert self.flush() == self.count
+        self.assert_delivered()
+
+    def test_failed_connection_keeps_the_messages_queued(self):
+        self.queue_messages()
+        # nothing listening on the port
+        with contextlib.suppress(OSError):
+            self.flush(port=free_port())
+        assert not self.smtp.messages
+
+        assert self.client.llen('email:batch:tests') == self.count
+        assert self.client.zcard(mail._processing_key()) == 0
+        assert self.flush() == self.count
+        self.assert_delivered()
+
+    def test_batch_of_an_interrupted_flush_is_requeued(self):
+        self.queue_messages()
+        # a worker that claimed a batch and died before sending it
+        claim_batch = self.client.register_script(mail.CLAIM_BATCH_SCRIPT)
+        processing = f'{mail._processing_key()}:dead-worker'
+        claimed = time.time() - 3600
+        claim_batch(
+            keys=['email:batch:tests', processing, mail._processing_key()],
+            args=[3, claimed],
+        )
+
+        assert self.flush() == self.count
+        self.assert_delivered()
+        subjects = [
+            message.content.split(b'Subject: ')[1].split(b'\n')[0].strip()
+            for message in self.smtp.messages
+        ]
+        assert subjects[0] == b'Message 0'
+
+
+class HyperLogLogTests(SimpleTestCase):
+    # erro padrão de 1,04 / sqrt(2 ** 14)
+    standard_error = 0.0081
+
+    def test_error_stays_within_the_standard_error(self):
+        # 41 mil é o limite de 2,5 * 2 ** 14 do linear counting, onde o
+        # estimador original superestimava em cerca de 2,5%
+        for cardinality in [1_000, 41_000, 60_000, 80_000]:
+            with self.subTest(cardinality=cardinality):
+                errors = []
+                for seed in range(3):
+                    counter = HyperLogLog()
+                    for index in range(cardinality):
+                        counter.add(f'{seed}:user:{index}')
+                    errors.append(counter.count() / cardinality - 1)
+                assert max(map(abs, errors)) < 3 * self.standard_error
+                assert abs(statistics.fmean(errors)) < self.standard_error
+
+    def test_empty_and_merged_counts(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        assert first.count() == 0
+        for index in range(500):
+            first.add(f'user:{index}')
+            second.add(f'user:{index + 250}')
+        first.merge(second)
+        assert abs(first.count() - 750) < 3 * self.standard_error * 750
+
+
+class InterceptHandlerTests(SimpleTestCase):
+    # between INFO and WARNING, with no loguru level of its own
+    custom_level = logging.INFO + 5
+
+    def setUp(self):
+        self.records = []
+        sink = logger.add(self.records.append, format='{message}')
+        self.addCleanup(logger.remove, sink)
+        self.std_logger = logging.Logger(f'intercept-{uuid.uuid4().hex}')
+        self.std_logger.addHandler(InterceptHandler())
+
+    def test_records_point_at_the_caller(self):
+        # the depth is cached per call site after the first record
+        for attempt in range(2):
+            line = sys._getframe().f_lineno + 1
+            self.std_logger.warning('Attempt %s', attempt)
+            self.std_logger.error('Other site')
+            record = self.records[-2].record
+            assert record['message'] == f'Attempt {attempt}'
+            assert record['level'].name == 'WARNING'
+            assert record['name'] == __name__
+            assert record['function'] == 'test_records_point_at_the_caller'
+            assert record['line'] == line
+            assert self.records[-1].record['line'] == line + 1
+
+    def test_exception_and_custom_levels(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            self.std_logger.exception('Failed')
+        self.std_logger.log(self.custom_level, 'Custom level')
+        failed, custom = (message.record for message in self.records)
+        assert failed['level'].name == 'ERROR'
+        assert failed['exception'].type is ZeroDivisionError
+        assert custom['level'].no == self.custom_level
+
+
+class SerializeRecordTests(SimpleTestCase):
+    attempt = 2
+
+    def setUp(self):
+        self.lines = []
+        sink = logger.add(self.lines.append, format=json_format)
+        self.addCleanup(logger.remove, sink)
+
+    def test_named_arguments_become_fields(self):
+        logger.info(
+            'Signed in {email}', email='user@example.com', attempt=self.attempt
+        )
+        line = json.loads(self.lines[0])
+        assert line['message'] == 'Signed in user@example.com'
+        assert line['level'] == 'INFO'
+        assert line['logger'] == __name__
+        assert line['function'] == 'test_named_arguments_become_fields'
+        assert line['email'] == 'user@example.com'
+        assert line['attempt'] == self.attempt
+        assert 'serialized' not in line
+        assert 'exception' not in line
+        assert datetime.fromisoformat(line['time'])
+
+    def test_exception_and_non_json_values(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception('Failed on {day}', day=date(2026, 1, 31))
+        line = json.loads(self.lines[0])
+        assert line['day'] == '2026-01-31'
+        assert line['exception'].startswith('Traceback')
+        assert 'ZeroDivisionError' in line['exception']
+
+
+@override_settings(CACHES=LOCAL_CACHES, PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class ContentViewAdminQueryTests(AdminQueryCountMixin, TestCase):
+    """
+    The viewed objects, their __str__ and the viewers are all loaded in
+    bulk.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.content_type = ContentType.objects.get_for_model(Profile)
+
+    def create_view(self, index):
+        # alternates signed-in and anonymous viewers
+        viewer = create_user(index + 1) if index % 2 == 0 else None
+        return ContentView.objects.create(
+            content_type=self.content_type,
+            object_id=create_user(index + 100).profile.pk,
+            user=viewer,
+            viewer_ip=f'10.0.0.{index}',
+            last_viewed=timezone.now(),
+        )
+
+    def test_changelist_queries_do_not_grow_with_the_rows(self):
+        self.create_view(0)
+        self.assert_constant_queries(
+            reverse('admin:common_contentview_changelist'),
+            lambda: [self.create_view(i) for i in range(1, self.rows)],
+        )
+
+
+@override_settings(
+    CACHES=LOCAL_CACHES,
+    METRICS_BACKEND='finnect.apps.common.metrics.InMemoryMetricsBackend',
+    PASSWORD_HASHERS=FAST_PASSWORD_HASHERS,
+)
+class MetricsViewTests(TestCase):
+    url = reverse_lazy('metrics')
+
+    def test_closed_without_a_token(self):
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get(self.url)
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+            response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer ')
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_bearer_token(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(self.url)
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+            response = self.client.get(
+                self.url, HTTP_AUTHORIZATION='Bearer wrong'
+            )
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+            response = self.client.get(
+                self.url, HTTP_AUTHORIZATION='Bearer secret'
+            )
+            assert response.status_code == status.HTTP_200_OK
+
+    def test_staff_session(self):
+        self.client.force_login(create_user(1))
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get(self.url)
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        self.client.force_login(create_user(2, is_staff=True))
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get(self.url)
+            assert response.status_code == status.HTTP_200_OK
+
+
+# the last minute of January and the first of February, UTC
+END_OF_JANUARY = datetime(2026, 1, 31, 23, 59, tzinfo=dt_timezone.utc)
+START_OF_FEBRUARY = datetime(2026, 2, 1, 0, 1, tzinfo=dt_timezone.utc)
+
+
+@override_settings(
+    CONTENT_VIEW_BUFFER_BACKEND=(
+        'finnect.apps.common.view_buffer.InMemoryContentViewBuffer'
+    ),
+    UNIQUE_VIEWERS_BACKEND=(
+        'finnect.apps.common.unique_viewers.InMemoryUniqueViewerCounter'
+    ),
+    PASSWORD_HASHERS=FAST_PASSWORD_HASHERS,
+)
+class ContentViewBufferTests(TestCase):
+    def setUp(self):
+        self.profile = create_user(1).profile
+        self.content_type_id = ContentType.objects.get_for_model(Profile).pk
+
+    def key(self, viewed_at, viewer_ip='10.0.0.1'):
+        return (
+            self.content_type_id,
+            str(self.profile.pk),
+            None,
+            viewer_ip,
+            period_of(viewed_at),
+        )
+
+    def test_upsert_writes_each_view_to_its_month(self):
+        # flushed in March, long after both views
+        with mock.patch.object(
+            timezone, 'now', return_value=END_OF_JANUARY + timedelta(days=40)
+        ):
+            upsert_content_views([
+                (self.key(END_OF_JANUARY), END_OF_JANUARY, 1),
+                (self.key(START_OF_FEBRUARY), START_OF_FEBRUARY, 1),
+            ])
+        rows = ContentView.objects.order_by('period')
+        assert [(row.period, row.last_viewed) for row in rows] == [
+            (date(2026, 1, 1), END_OF_JANUARY),
+            (date(2026, 2, 1), START_OF_FEBRUARY),
+        ]
+
+    def test_upsert_adds_to_the_row_of_the_month(self):
+        earlier = END_OF_JANUARY - timedelta(days=1)
+        upsert_content_views([(self.key(earlier), earlier, 3)])
+        upsert_content_views([(self.key(END_OF_JANUARY), END_OF_JANUARY, 2)])
+        row = ContentView.objects.get()
+        assert row.period == date(2026, 1, 1)
+        assert row.last_viewed == END_OF_JANUARY
+        assert row.views == 3 + 2
+
+    def test_buffer_keeps_the_months_of_a_viewer_apart(self):
+        buffer = get_content_view_buffer()
+        views = [END_OF_JANUARY, START_OF_FEBRUARY]
+        for viewed_at in views:
+            with mock.patch.object(timezone, 'now', return_value=viewed_at):
+                ContentView.record_view(self.profile, None, '10.0.0.1')
+        # a repeated view in the same month shares the entry
+        buffer.add(self.key(END_OF_JANUARY), END_OF_JANUARY)
+
+        assert buffer.flush() == len(views)
+        assert list(
+            ContentView.objects.order_by('period').values_list(
+                'period', 'views'
+            )
+        ) == [(date(2026, 1, 1), 2), (date(2026, 2, 1), 1)]
+
+    def test_rollups_add_up_the_view_counters(self):
+        def view(viewer_ip, times):
+            for _ in range(times):
+                ContentView.record_view(self.profile, None, viewer_ip)
+
+        def rollup():
+            get_content_view_buffer().flush()
+            # everything flushed so far is past the lag
+            update_content_view_rollups(
+                now=timezone.now() + settings.CONTENT_VIEW_ROLLUP_LAG
+            )
+            return [
+                model.objects.for_object(self.profile).totals()
+                for model in [HourlyContentViewRollup, DailyContentViewRollup]
+            ]
+
+        view('10.0.0.1', 3)
+        view('10.0.0.2', 1)
+        totals = {'views': 3 + 1, 'new_viewers': 2}
+        assert rollup() == [totals, totals]
+
+        # a returning viewer adds views but is not a new viewer
+        view('10.0.0.1', 2)
+        totals = {'views': 3 + 1 + 2, 'new_viewers': 2}
+        assert rollup() == [totals, totals]
+        assert rollup() == [totals, totals]
+
+
+@override_settings(
+    CONTENT_VIEW_BUFFER_KEY='content_views:buffer:tests',
+    CONTENT_VIEW_FLUSH_BATCH_SIZE=2,
+)
+class RedisContentViewBufferTests(TestCase):
+    """
+    Needs the Redis behind CONTENT_VIEW_BUFFER_CACHE_ALIAS. Each test
+    buffers `count` views, flushed in batches of 2.
+    """
+
+    count = 5
+
+    def setUp(self):
+        try:
+            self.buffer = RedisContentViewBuffer()
+            self.buffer.client.ping()
+        except Exception as exc:
+            self.skipTest(
+                f'no Redis for CONTENT_VIEW_BUFFER_CACHE_ALIAS: {exc}'
+            )
+        self.clear_buffer()
+        self.addCleanup(self.clear_buffer)
+        self.content_type_id = ContentType.objects.get_for_model(Profile).pk
+        self.viewed_at = timezone.now().replace(microsecond=0)
+        self.add_views(range(self.count))
+
+    def clear_buffer(self):
+        self.buffer.client.delete(
+            self.buffer.key, self.buffer.flushing_key, self.buffer.lock_key
+        )
+
+    def add_views(self, indexes):
+        for index in indexes:
+            self.buffer.add(
+                (
+                    self.content_type_id,
+                    str(uuid.UUID(int=index)),
+                    None,
+                    '10.0.0.1',
+                    period_of(self.viewed_at),
+                ),
+                self.viewed_at,
+            )
+
+    def test_flush_writes_every_batch(self):
+        assert self.buffer.flush() == self.count
+        assert ContentView.objects.count() == self.count
+        assert not self.buffer.client.exists(
+            self.buffer.key, self.buffer.flushing_key
+        )
+        assert self.buffer.flush() == 0
+
+    def test_flush_waits_for_a_running_flush(self):
+        lock = self.buffer.client.lock(self.buffer.lock_key, timeout=60)
+        assert lock.acquire(blocking=False)
+        assert self.buffer.flush() == 0
+        assert self.buffer.client.hlen(self.buffer.key) == self.count
+
+        lock.release()
+        assert self.buffer.flush() == self.count
+
+    def test_interrupted_flush_resumes_after_the_written_batches(self):
+        upsert = view_buffer.upsert_content_views
+        batches = []
+
+        def fail_second_batch(views):
+            batches.append(views)
+            if len(batches) > 1:
+                raise ConnectionError
+            return upsert(views)
+
+        with (
+            mock.patch.object(
+                view_buffer, 'upsert_content_views', fail_second_batch
+            ),
+            contextlib.suppress(ConnectionError),
+        ):
+            self.buffer.flush()
+        written = ContentView.objects.count()
+        assert written == settings.CONTENT_VIEW_FLUSH_BATCH_SIZE
+        left = self.buffer.client.hlen(self.buffer.flushing_key)
+        assert left == self.count - written
+
+        # views recorded meanwhile wait for the flush after the resumed one
+        self.add_views([self.count])
+        assert self.buffer.flush() == left
+        assert self.buffer.flush() == 1
+        assert ContentView.objects.count() == self.count + 1
+
+    def test_flush_keeps_the_month_of_the_view(self):
+        self.clear_buffer()
+        self.buffer.add(
+            (
+                self.content_type_id,
+                str(uuid.UUID(int=0)),
+                None,
+                '10.0.0.1',
+                period_of(END_OF_JANUARY),
+            ),
+            END_OF_JANUARY,
+        )
+        # buffered before the period was part of the key
+        self.buffer.client.hset(
+            self.buffer.key,
+            f'{self.content_type_id}|{uuid.UUID(int=1)}||10.0.0.1',
+            START_OF_FEBRUARY.timestamp(),
+        )
+        with mock.patch.object(
+            timezone, 'now', return_value=END_OF_JANUARY + timedelta(days=40)
+        ):
+            self.buffer.flush()
+        assert list(
+            ContentView.objects.order_by('period').values_list(
+                'period', 'views'
+            )
+        ) == [(date(2026, 1, 1), 1), (date(2026, 2, 1), 1)]
+
+    def test_repeated_views_add_up(self):
+        key = (
+            self.content_type_id,
+            str(uuid.UUID(int=0)),
+            None,
+            '10.0.0.1',
+            period_of(self.viewed_at),
+        )
+        earlier = self.viewed_at - timedelta(minutes=1)
+        self.buffer.add(key, self.viewed_at)
+        self.buffer.add(key, earlier)
+        assert self.buffer.flush() == self.count
+        self.buffer.add(key, earlier)
+        assert self.buffer.flush() == 1
+
+        row = ContentView.objects.get(object_id=uuid.UUID(int=0))
+        assert row.views == 1 + 2 + 1
+        assert row.last_viewed == self.viewed_at
+
+
+class UserIdSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id']
+
+
+class UserListView(generics.ListAPIView):
+    authentication_classes = []
+    permission_classes = []
+    pagination_class = KeysetPagination
+    serializer_class = UserIdSerializer
+    queryset = User.objects.all()
+    ordering = ['-date_joined']
+
+
+@override_settings(CACHES=LOCAL_CACHES, PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class KeysetPaginationTests(TestCase):
+    url = '/users/?page_size=2'
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [create_user(index) for index in range(7)]
+        # most users joined at the same instant, so the pk breaks the ties
+        joined = timezone.now()
+        User.objects.filter(pk__in=[user.pk for user in users[:5]]).update(
+            date_joined=joined
+        )
+        User.objects.filter(pk__in=[user.pk for user in users[5:]]).update(
+            date_joined=joined - timedelta(days=1)
+        )
+        cls.expected = [
+            str(pk)
+            for pk in User.objects.order_by('-date_joined', '-pk').values_list(
+                'pk', flat=True
+            )
+        ]
+
+    def get(self, url, **initkwargs):
+        view = UserListView.as_view(**initkwargs)
+        return view(APIRequestFactory().get(url))
+
+    def walk(self, link, url=None, **initkwargs):
+        """
+        Pages from `url` (the first page by default) following `link`.
+        """
+        pages = []
+        url = url or self.url
+        while url is not None:
+            response = self.get(url, **initkwargs)
+            assert response.status_code == status.HTTP_200_OK
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def assert_walks(self, **initkwargs):
+        forward = self.walk('next', **initkwargs)
+        assert [len(page) for page in forward] == [2, 2, 2, 1]
+        assert sum(forward, []) == self.expected
+
+        last = self.get(self.url, **initkwargs)
+        while last.data['next'] is not None:
+            last = self.get(last.data['next'], **initkwargs)
+        backward = self.walk(
+            'previous', url=last.data['previous'], **initkwargs
+        )
+        assert sum(reversed(backward), []) + forward[-1] == self.expected
+
+    def test_walks_with_tied_sort_values(self):
+        self.assert_walks()
+
+    def test_walks_values_querysets(self):
+        self.assert_walks(queryset=User.objects.values('id', 'date_joined'))
+
+    def test_malformed_cursors_are_not_found(self):
+        def encode(payload):
+            return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in [
+            'not base64!',
+            encode('not an object'),
+            encode({'p': ['2026-01-01T00:00:00+00:00']}),
+            encode({'p': ['not a date', str(uuid.uuid4())]}),
+            encode({'p': ['2026-01-01T00:00:00+00:00', 'not a uuid']}),
+        ]:
+            with self.subTest(cursor=cursor):
+                response = self.get(f'{self.url}&cursor={cursor}')
+                assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class ProfilingTokenTests(TestCase):
+    def setUp(self):
+        self.staff = create_user(1, is_staff=True)
+
+    def test_staff_tokens_are_accepted(self):
+        token = make_profiling_token(self.staff)
+        assert check_profiling_token(token) == str(self.staff.pk)
+
+    def test_junk_and_expired_tokens_are_rejected(self):
+        token = make_profiling_token(self.staff)
+        for junk in [
+            'junk',
+            f'{token}x',
+            # signed by the same key for something else
+            signing.dumps(str(self.staff.pk)),
+        ]:
+            with self.subTest(token=junk):
+                assert check_profiling_token(junk) is None
+
+        later = time.time() + settings.PROFILING_TOKEN_MAX_AGE.seconds + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            assert check_profiling_token(token) is None
+
+    def test_non_staff_users_get_no_token(self):
+        user = create_user(2)
+        with self.assertRaisesMessage(ValueError, 'Only staff users'):
+            make_profiling_token(user)
+        with self.assertRaisesMessage(CommandError, 'staff'):
+            call_command('profiling_token', user.email, stdout=io.StringIO())
+
+
+class ProfilingTestMixin:
+    """
+    cProfile profiles written to a temporary directory.
+    """
+
+    profiling_settings = {}
+
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(
+            override_settings(**{
+                'PROFILER': 'cprofile',
+                'PROFILING_DIR': str(self.directory),
+                'PROFILING_SAMPLE_RATE': 0,
+                **self.profiling_settings,
+            })
+        )
+        self.profiler = RequestProfiler()
+
+    def profiles(self):
+        return sorted(path.name for path in self.directory.glob('*.pstats'))
+
+
+class RequestProfilerTests(ProfilingTestMixin, SimpleTestCase):
+    profiling_settings = {'PROFILING_MAX_FILES': 3}
+    sample_rate = 4
+
+    def test_token_or_one_in_n_sample(self):
+        staff = SimpleNamespace(pk=1, is_staff=True)
+        with mock.patch.object(profiling.random, 'randrange') as randrange:
+            assert self.profiler.reason(None) is None
+            assert self.profiler.reason('junk') is None
+            assert self.profiler.reason(make_profiling_token(staff)) == (
+                'token of user 1'
+            )
+            randrange.assert_not_called()
+
+        self.profiler.sample_rate = self.sample_rate
+        with mock.patch.object(
+            profiling.random, 'randrange', side_effect=[3, 0, 1]
+        ) as randrange:
+            reasons = [self.profiler.reason(None) for _ in range(3)]
+        assert reasons == [None, '1 in 4 sample', None]
+        randrange.assert_called_with(self.sample_rate)
+
+    def test_one_request_at_a_time(self):
+        profiled = self.profiler.begin('test', 'GET', '/first/')
+        assert self.profiler.begin('test', 'GET', '/second/') is None
+        self.profiler.stop(profiled)
+        self.profiler.stop(self.profiler.begin('test', 'GET', '/third/'))
+
+    def test_rotation_keeps_the_newest_profiles(self):
+        (self.directory / 'notes.txt').write_text('kept')
+        saved = []
+        for index in range(5):
+            profiled = self.profiler.begin('test', 'GET', f'/page/{index}/')
+            self.profiler.stop(profiled)
+            saved.append(self.profiler.save(profiled).name)
+        assert self.profiles() == saved[-3:]
+        assert (self.directory / 'notes.txt').exists()
+
+
+class ProfilingMiddlewareTests(ProfilingTestMixin, SimpleTestCase):
+    # every request is sampled
+    profiling_settings = {'PROFILING_SAMPLE_RATE': 1}
+
+    def test_wsgi_profile_covers_the_streamed_body(self):
+        def streamed_body():
+            # the profile is still open while the server reads the body
+            assert self.profiler._busy.locked()
+            yield b'first'
+            yield b'second'
+
+        body = streamed_body()
+
+        def application(environ, start_response):
+            start_response('200 OK', [])
+            return body
+
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/stream/'}
+        middleware = ProfilingWSGIMiddleware(application, self.profiler)
+        response = middleware(environ, mock.Mock())
+        assert self.profiles() == []
+        assert b''.join(response) == b'firstsecond'
+        response.close()
+
+        assert body.gi_frame is None
+        assert not self.profiler._busy.locked()
+        (name,) = self.profiles()
+        assert '-GET-stream-200-' in name
+        stats = pstats.Stats(str(self.directory / name)).stats
+        assert 'streamed_body' in {function for _, _, function in stats}
+
+    def test_wsgi_errors_end_the_profile(self):
+        def application(environ, start_response):
+            raise RuntimeError('Broken view')
+
+        middleware = ProfilingWSGIMiddleware(application, self.profiler)
+        with self.assertRaisesMessage(RuntimeError, 'Broken view'):
+            middleware({'REQUEST_METHOD': 'GET'}, mock.Mock())
+        assert not self.profiler._busy.locked()
+        assert len(self.profiles()) == 1
+
+    def test_asgi_profiles_http_requests(self):
+        async def application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 201})
+            await send({'type': 'http.response.body', 'body': b'created'})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = ProfilingASGIMiddleware(application, self.profiler)
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/api/v1/items/',
+            'headers': [],
+        }
+        asyncio.run(middleware(scope, mock.AsyncMock(), send))
+
+        assert [message['type'] for message in sent] == [
+            'http.response.start',
+            'http.response.body',
+        ]
+        (name,) = self.profiles()
+        assert '-POST-api-v1-items-201-' in name
+        assert not self.profiler._busy.locked()
+
+        # lifespan and websocket scopes go straight to the application
+        asyncio.run(middleware({'type': 'lifespan'}, mock.AsyncMock(), send))
+        assert len(self.profiles()) == 1
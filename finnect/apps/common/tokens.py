@@ -0,0 +1,65 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+
+from django.conf import settings
+from rest_framework_simplejwt.tokens import Token
+
+
+class VerifiedTokenCache:
+    """
+    LRU limitado de tokens JWT já verificados.
+
+    A chave é o SHA-256 do token bruto, então o próprio token não fica em
+    memória como chave. Cada entrada expira junto com o claim `exp` do token,
+    de forma que um token vencido volta a passar pela validação completa do
+    simplejwt (e é rejeitado por ela).
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[Token, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(raw_token: Union[str, bytes]) -> str:
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).hexdigest()
+
+    def get(self, raw_token: Union[str, bytes]) -> Optional[Token]:
+        if self.maxsize <= 0:
+            return None
+
+        key = self._digest(raw_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def add(self, raw_token: Union[str, bytes], token: Token) -> None:
+        expires_at = token.get('exp')
+        if self.maxsize <= 0 or expires_at is None:
+            return
+
+        key = self._digest(raw_token)
+        with self._lock:
+            self._entries[key] = (token, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(settings.JWT_VERIFIED_TOKEN_CACHE_SIZE)
@@ -0,0 +1,225 @@
+import functools
+import hashlib
+import math
+import threading
+from datetime import date
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+
+class HyperLogLog:
+    """
+    Estimador de cardinalidade com memória fixa (2 ** precision registradores
+    de um byte). Com a precisão 14, a mesma do Redis, o erro padrão é de
+    cerca de 0,8%.
+
+    A contagem usa o estimador de Ertl ("New cardinality estimation
+    algorithms for HyperLogLog sketches", 2017), o mesmo do PFCOUNT desde o
+    Redis 5. O estimador original, com linear counting abaixo de
+    2,5 * 2 ** precision, superestima em alguns por cento logo acima desse
+    limite (por volta de 40 a 80 mil visitantes com a precisão 14); este não
+    tem a descontinuidade e fica dentro do erro padrão em toda a faixa.
+    """
+
+    def __init__(self, precision: int = 14) -> None:
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = hashed >> bits
+        # posição do primeiro bit 1 nos bits restantes
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        size = len(self.registers)
+        bits = 64 - self.precision
+        # histograma dos registradores, de 0 a bits + 1
+        histogram = [0] * (bits + 2)
+        for rank in self.registers:
+            histogram[rank] += 1
+        if histogram[0] == size:
+            return 0
+
+        z = size * _tau((size - histogram[bits + 1]) / size)
+        for rank in range(bits, 0, -1):
+            z = (z + histogram[rank]) * 0.5
+        z += size * _sigma(histogram[0] / size)
+        return round(0.5 / math.log(2) * size * size / z)
+
+
+def _sigma(x: float) -> float:
+    """
+    Corrige a estimativa pelos registradores vazios (Ertl, 2017).
+    """
+    y = 1.0
+    z = x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    """
+    Corrige a estimativa pelos registradores saturados (Ertl, 2017).
+    """
+    if x in {0, 1}:
+        return 0.0
+    y = 1.0
+    z = 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class BaseUniqueViewerCounter:
+    """
+    Conta visitantes únicos por objeto (content_type, object_id) de forma
+    aproximada, com um HyperLogLog para o total e um para cada dia.
+    """
+
+    def add(
+        self, content_type_id: int, object_id: str, viewer: str, day: date
+    ) -> None:
+        raise NotImplementedError
+
+    def count(
+        self,
+        content_type_id: int,
+        object_id: str,
+        days: Optional[Iterable[date]] = None,
+    ) -> int:
+        """
+        Estimativa de visitantes únicos no total ou, com `days`, nos dias
+        informados (visitantes que voltam em dias diferentes contam uma vez).
+        """
+        raise NotImplementedError
+
+
+class RedisUniqueViewerCounter(BaseUniqueViewerCounter):
+    """
+    Usa PFADD/PFCOUNT do Redis; cada chave ocupa no máximo 12 KB. As chaves
+    diárias expiram depois de UNIQUE_VIEWERS_DAILY_TTL.
+    """
+
+    def __init__(self) -> None:
+        self.client = get_redis_connection(settings.UNIQUE_VIEWERS_CACHE_ALIAS)
+        self.prefix = settings.UNIQUE_VIEWERS_KEY_PREFIX
+        self.daily_ttl = settings.UNIQUE_VIEWERS_DAILY_TTL
+
+    def _key(
+        self, content_type_id: int, object_id: str, day: Optional[date]
+    ) -> str:
+        suffix = 'total' if day is None else f'{day:%Y%m%d}'
+        return f'{self.prefix}:{content_type_id}:{object_id}:{suffix}'
+
+    def add(
+        self, content_type_id: int, object_id: str, viewer: str, day: date
+    ) -> None:
+        daily_key = self._key(content_type_id, object_id, day)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.pfadd(self._key(content_type_id, object_id, None), viewer)
+        pipeline.pfadd(daily_key, viewer)
+        pipeline.expire(daily_key, self.daily_ttl)
+        pipeline.execute()
+
+    def count(
+        self,
+        content_type_id: int,
+        object_id: str,
+        days: Optional[Iterable[date]] = None,
+    ) -> int:
+        if days is None:
+            keys = [self._key(content_type_id, object_id, None)]
+        else:
+            keys = [self._key(content_type_id, object_id, day) for day in days]
+            if not keys:
+                return 0
+        return self.client.pfcount(*keys)
+
+
+class InMemoryUniqueViewerCounter(BaseUniqueViewerCounter):
+    """
+    HyperLogLog em Python puro, local do processo, para testes e
+    desenvolvimento sem Redis.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, HyperLogLog] = {}
+
+    def add(
+        self, content_type_id: int, object_id: str, viewer: str, day: date
+    ) -> None:
+        with self._lock:
+            for period in (None, day):
+                key = (content_type_id, str(object_id), period)
+                self._counters.setdefault(key, HyperLogLog()).add(viewer)
+
+    def count(
+        self,
+        content_type_id: int,
+        object_id: str,
+        days: Optional[Iterable[date]] = None,
+    ) -> int:
+        periods = [None] if days is None else list(days)
+        merged = HyperLogLog()
+        with self._lock:
+            for period in periods:
+                counter = self._counters.get((
+                    content_type_id,
+                    str(object_id),
+                    period,
+                ))
+                if counter is not None:
+                    merged.merge(counter)
+        return merged.count()
+
+
+def viewer_identity(
+    user_id: Optional[str], viewer_ip: Optional[str]
+) -> Optional[str]:
+    """
+    Identifica o visitante pelo usuário ou, se anônimo, pelo IP.
+    """
+    if user_id:
+        return f'user:{user_id}'
+    if viewer_ip:
+        return f'ip:{viewer_ip}'
+    return None
+
+
+@functools.cache
+def get_unique_viewer_counter() -> BaseUniqueViewerCounter:
+    return import_string(settings.UNIQUE_VIEWERS_BACKEND)()
+
+
+@receiver(setting_changed)
+def reset_unique_viewer_counter(*, setting: str, **kwargs: Any) -> None:
+    if setting in {
+        'UNIQUE_VIEWERS_BACKEND',
+        'UNIQUE_VIEWERS_CACHE_ALIAS',
+        'UNIQUE_VIEWERS_KEY_PREFIX',
+        'UNIQUE_VIEWERS_DAILY_TTL',
+    }:
+        get_unique_viewer_counter.cache_clear()
@@ -0,0 +1,356 @@
+import atexit
+import contextlib
+import functools
+import threading
+import time
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from typing import Any, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from loguru import logger
+from redis.exceptions import LockError
+
+from finnect.apps.common.models import ContentView, period_of
+
+# (content_type_id, object_id, user_id, viewer_ip, period); o período é o
+# mês da visualização, para que uma descarga depois da virada do mês não
+# grave visualizações do mês anterior na partição nova
+ViewKey = tuple[int, str, Optional[str], Optional[str], date]
+
+UNIQUE_FIELDS = ['content_type', 'object_id', 'user', 'viewer_ip', 'period']
+INSERT_FIELDS = [
+    'id',
+    'created_at',
+    'updated_at',
+    *UNIQUE_FIELDS,
+    'last_viewed',
+    'views',
+    'rolled_up_views',
+]
+
+
+def upsert_content_views(
+    views: Iterable[tuple[ViewKey, datetime, int]],
+) -> int:
+    """
+    Grava um lote de (combinação, última visualização, quantidade) com um
+    único INSERT ... ON CONFLICT. Nas combinações que já existem no mês da
+    visualização, soma a quantidade ao contador `views` e avança
+    `last_viewed`, que não volta se uma descarga atrasada trouxer um horário
+    anterior.
+    """
+    objs = [
+        ContentView(
+            content_type_id=content_type_id,
+            object_id=object_id,
+            user_id=user_id,
+            viewer_ip=viewer_ip,
+            period=period,
+            last_viewed=viewed_at,
+            views=count,
+        )
+        for (
+            content_type_id,
+            object_id,
+            user_id,
+            viewer_ip,
+            period,
+        ), viewed_at, count in views
+    ]
+    if not objs:
+        return 0
+
+    using = router.db_for_write(ContentView)
+    connection = connections[using]
+    if connection.features.supports_nulls_distinct_unique_constraints:
+        _insert_or_increment(objs, connection)
+        return len(objs)
+
+    # Sem NULLS NOT DISTINCT (SQLite, Postgres < 15) a constraint não é
+    # criada e o ON CONFLICT não tem alvo; grava linha a linha, ainda em uma
+    # única transação.
+    with transaction.atomic(using=using):
+        for obj in objs:
+            ContentView.objects.using(using).update_or_create(
+                content_type_id=obj.content_type_id,
+                object_id=obj.object_id,
+                user_id=obj.user_id,
+                viewer_ip=obj.viewer_ip,
+                period=obj.period,
+                defaults={
+                    'last_viewed': Greatest(
+                        'last_viewed', Value(obj.last_viewed)
+                    ),
+                    'views': F('views') + obj.views,
+                },
+                create_defaults={
+                    'last_viewed': obj.last_viewed,
+                    'views': obj.views,
+                },
+            )
+    return len(objs)
+
+
+def _insert_or_increment(objs: list[ContentView], connection) -> None:
+    """
+    O bulk_create(update_conflicts=True) só sabe copiar o valor novo
+    (EXCLUDED) por cima do antigo; aqui o conflito soma `views` ao contador
+    da linha existente e fica com o maior `last_viewed`.
+    """
+    meta = ContentView._meta
+    quote = connection.ops.quote_name
+    fields = [meta.get_field(name) for name in INSERT_FIELDS]
+    now = timezone.now()
+    params = []
+    for obj in objs:
+        obj.created_at = obj.updated_at = now
+        params.extend(
+            field.get_db_prep_save(getattr(obj, field.attname), connection)
+            for field in fields
+        )
+
+    table = quote(meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    row = f'({", ".join(["%s"] * len(fields))})'
+    unique_columns = ', '.join(
+        quote(meta.get_field(name).column) for name in UNIQUE_FIELDS
+    )
+    views, last_viewed, updated_at = map(
+        quote, ['views', 'last_viewed', 'updated_at']
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'VALUES {", ".join([row] * len(objs))} '
+            f'ON CONFLICT ({unique_columns}) DO UPDATE SET '
+            f'{views} = {table}.{views} + EXCLUDED.{views}, '
+            f'{last_viewed} = GREATEST({table}.{last_viewed}, '
+            f'EXCLUDED.{last_viewed}), '
+            f'{updated_at} = EXCLUDED.{updated_at}',
+            params,
+        )
+
+
+class BaseContentViewBuffer:
+    """
+    Acumula as visualizações registradas por `ContentView.record_view` para
+    gravá-las em lote. Visualizações repetidas da mesma combinação
+    (conteúdo, usuário, IP, mês) ocupam uma única entrada, com o último
+    horário e a quantidade.
+    """
+
+    def add(self, key: ViewKey, viewed_at: datetime) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> int:
+        """
+        Grava tudo o que está no buffer e retorna quantas entradas foram
+        gravadas.
+        """
+        raise NotImplementedError
+
+
+class RedisContentViewBuffer(BaseContentViewBuffer):
+    """
+    Guarda as visualizações em um hash no Redis, compartilhado por todos os
+    processos e esvaziado pela task `flush_content_views`. O valor de cada
+    combinação é "<quantidade> <timestamp da última visualização>".
+    """
+
+    add_script = """
+    local count, viewed_at = 1, ARGV[2]
+    local current = redis.call('HGET', KEYS[1], ARGV[1])
+    if current then
+        local previous, previous_at = string.match(current, '^(%d+) (%S+)$')
+        if not previous then
+            previous, previous_at = 1, current
+        end
+        count = tonumber(previous) + 1
+        if tonumber(previous_at) > tonumber(viewed_at) then
+            viewed_at = previous_at
+        end
+    end
+    redis.call('HSET', KEYS[1], ARGV[1], count .. ' ' .. viewed_at)
+    """
+
+    # Move o buffer para a chave de processamento, a menos que uma descarga
+    # anterior tenha sido interrompida; nesse caso ela é retomada primeiro.
+    claim_script = """
+    if redis.call('EXISTS', KEYS[2]) == 0 then
+        if redis.call('EXISTS', KEYS[1]) == 0 then
+            return 0
+        end
+        redis.call('RENAME', KEYS[1], KEYS[2])
+    end
+    return 1
+    """
+
+    separator = '|'
+
+    def __init__(self) -> None:
+        self.client = get_redis_connection(
+            settings.CONTENT_VIEW_BUFFER_CACHE_ALIAS
+        )
+        self.key = settings.CONTENT_VIEW_BUFFER_KEY
+        self.flushing_key = f'{self.key}:flushing'
+        self.lock_key = f'{self.key}:lock'
+        self._add = self.client.register_script(self.add_script)
+        self._claim = self.client.register_script(self.claim_script)
+
+    def _encode(self, key: ViewKey) -> str:
+        return self.separator.join(
+            '' if part is None else str(part) for part in key
+        )
+
+    def _decode(self, field: bytes, viewed_at: datetime) -> ViewKey:
+        content_type_id, object_id, user_id, viewer_ip, *period = (
+            field.decode().split(self.separator)
+        )
+        return (
+            int(content_type_id),
+            object_id,
+            user_id or None,
+            viewer_ip or None,
+            # entradas gravadas antes de o período entrar na chave
+            date.fromisoformat(period[0]) if period else period_of(viewed_at),
+        )
+
+    def _parse(self, value: bytes) -> tuple[datetime, int]:
+        # entradas gravadas antes do contador trazem só o timestamp
+        count, _, timestamp = value.decode().rpartition(' ')
+        viewed_at = datetime.fromtimestamp(
+            float(timestamp), tz=dt_timezone.utc
+        )
+        return viewed_at, int(count or 1)
+
+    def add(self, key: ViewKey, viewed_at: datetime) -> None:
+        self._add(
+            keys=[self.key], args=[self._encode(key), viewed_at.timestamp()]
+        )
+
+    def flush(self) -> int:
+        """
+        Uma descarga por vez, sob um lock no Redis: uma segunda descarga
+        retomaria o hash de processamento da primeira enquanto ele ainda está
+        sendo gravado. O lock é renovado a cada lote; se expirar mesmo assim,
+        a descarga para no lote seguinte e deixa o resto para a próxima.
+        """
+        timeout = settings.CONTENT_VIEW_FLUSH_LOCK_TIMEOUT.total_seconds()
+        lock = self.client.lock(self.lock_key, timeout=timeout)
+        if not lock.acquire(blocking=False):
+            return 0
+        try:
+            if not self._claim(keys=[self.key, self.flushing_key]):
+                return 0
+            flushed = 0
+            for batch in self._batches():
+                flushed += upsert_content_views(
+                    (self._decode(field, viewed_at), viewed_at, count)
+                    for field, viewed_at, count in batch
+                )
+                # tira do hash só o que já foi gravado; se a descarga cair
+                # no meio, a próxima continua do lote seguinte (e, se cair
+                # entre o commit e o HDEL, conta esse lote duas vezes)
+                self.client.hdel(
+                    self.flushing_key, *(field for field, _, _ in batch)
+                )
+                lock.extend(timeout, replace_ttl=True)
+            return flushed
+        finally:
+            with contextlib.suppress(LockError):
+                lock.release()
+
+    def _batches(self) -> Iterator[list[tuple[bytes, datetime, int]]]:
+        batch = []
+        for field, value in self.client.hscan_iter(
+            self.flushing_key, count=settings.CONTENT_VIEW_FLUSH_BATCH_SIZE
+        ):
+            batch.append((field, *self._parse(value)))
+            if len(batch) >= settings.CONTENT_VIEW_FLUSH_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class InMemoryContentViewBuffer(BaseContentViewBuffer):
+    """
+    Buffer local do processo, para testes e desenvolvimento sem Redis.
+
+    Como a task periódica roda em outro processo, este buffer se esvazia
+    sozinho ao atingir `CONTENT_VIEW_FLUSH_BATCH_SIZE` entradas, quando
+    `CONTENT_VIEW_FLUSH_INTERVAL` passa desde a última descarga e ao encerrar
+    o processo.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # combinação -> (última visualização, quantidade)
+        self._views: dict[ViewKey, tuple[datetime, int]] = {}
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def add(self, key: ViewKey, viewed_at: datetime) -> None:
+        with self._lock:
+            self._merge(key, viewed_at, 1)
+            due = (
+                len(self._views) >= settings.CONTENT_VIEW_FLUSH_BATCH_SIZE
+                or time.monotonic() - self._last_flush
+                >= settings.CONTENT_VIEW_FLUSH_INTERVAL.total_seconds()
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            views, self._views = self._views, {}
+            self._last_flush = time.monotonic()
+        try:
+            return upsert_content_views(
+                (key, viewed_at, count)
+                for key, (viewed_at, count) in views.items()
+            )
+        except Exception:
+            # devolve ao buffer o que não foi gravado, somado ao que chegou
+            # enquanto isso
+            with self._lock:
+                for key, (viewed_at, count) in views.items():
+                    self._merge(key, viewed_at, count)
+            raise
+
+    def _merge(self, key: ViewKey, viewed_at: datetime, count: int) -> None:
+        previous_at, previous = self._views.get(key, (viewed_at, 0))
+        self._views[key] = (max(previous_at, viewed_at), previous + count)
+
+
+@functools.cache
+def get_content_view_buffer() -> BaseContentViewBuffer:
+    return import_string(settings.CONTENT_VIEW_BUFFER_BACKEND)()
+
+
+def flush_content_view_buffer() -> int:
+    flushed = get_content_view_buffer().flush()
+    if flushed:
+        logger.info(
+            'Flushed {flushed} buffered content views', flushed=flushed
+        )
+    return flushed
+
+
+@receiver(setting_changed)
+def reset_content_view_buffer(*, setting: str, **kwargs: Any) -> None:
+    if setting in {
+        'CONTENT_VIEW_BUFFER_BACKEND',
+        'CONTENT_VIEW_BUFFER_CACHE_ALIAS',
+        'CONTENT_VIEW_BUFFER_KEY',
+    }:
+        get_content_view_buffer.cache_clear()
@@ -1,3 +1,33 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from finnect.apps.common.metrics import render_metrics
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Métricas de todos os workers no formato de texto do Prometheus. A rota
+    não passa pelo nginx e só responde a quem enviar
+    `Authorization: Bearer <METRICS_TOKEN>` ou estiver logado como staff;
+    sem METRICS_TOKEN definido, só staff.
+    """
+    if not (_has_metrics_token(request) or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def _has_metrics_token(request) -> bool:
+    token = settings.METRICS_TOKEN
+    if not token:
+        return False
+    return hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(),
+        f'Bearer {token}'.encode(),
+    )
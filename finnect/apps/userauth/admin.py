@@ -89,4 +89,6 @@ class CustomUserAdmin(UserAdmin):
     )
 
     search_fields = ['email', 'username', 'first_name', 'last_name']
+    # skip the unfiltered COUNT(*) over every user on each search
+    show_full_result_count = False
     ordering = ['email']
\ No newline at end of file
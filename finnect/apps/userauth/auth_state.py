@@ -0,0 +1,505 @@
+import functools
+import hmac
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+from finnect.apps.common.cache import invalidate_cached_user
+from finnect.apps.userauth.utils import hash_otp
+
+
+class BaseAuthStateBackend:
+    """
+    Stores the short-lived login state of a user: the pending OTP
+    challenge and the failed login counter / lockout window.
+
+    An OTP is always resolved within a scope, the challenge id returned at
+    login or the email the login was made with; codes are only 6 digits,
+    so a code alone could match the challenge of another user.
+    """
+
+    def issue_otp(self, user: Any, otp: str) -> str:
+        raise NotImplementedError
+
+    def resolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        raise NotImplementedError
+
+    def consume_otp(self, user: Any, otp: str) -> bool:
+        raise NotImplementedError
+
+    def register_failed_attempt(self, user: Any) -> int:
+        raise NotImplementedError
+
+    def reset_failed_attempts(self, user: Any) -> None:
+        raise NotImplementedError
+
+    def block(self, user: Any) -> None:
+        raise NotImplementedError
+
+    def unblock(self, user: Any) -> None:
+        raise NotImplementedError
+
+    def is_blocked(self, user: Any) -> bool:
+        raise NotImplementedError
+
+    # async counterparts used by the ASGI views; backends override them
+    # when they can avoid the thread hop of sync_to_async
+    async def aresolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        return await sync_to_async(self.resolve_otp)(otp, challenge_id, email)
+
+    async def aconsume_otp(self, user: Any, otp: str) -> bool:
+        return await sync_to_async(self.consume_otp)(user, otp)
+
+    async def ais_blocked(self, user: Any) -> bool:
+        return await sync_to_async(self.is_blocked)(user)
+
+    def _get_user(self, user_id: Optional[str]) -> Optional[Any]:
+        if user_id is None:
+            return None
+        User = get_user_model()
+        try:
+            return User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+
+    async def _aget_user(self, user_id: Optional[str]) -> Optional[Any]:
+        if user_id is None:
+            return None
+        User = get_user_model()
+        try:
+            return await User.objects.aget(pk=user_id)
+        except User.DoesNotExist:
+            return None
+
+    def _get_user_by_email(self, email: Optional[str]) -> Optional[Any]:
+        if not email:
+            return None
+        User = get_user_model()
+        try:
+            return User.objects.get(email=email)
+        except User.DoesNotExist:
+            return None
+
+    async def _aget_user_by_email(self, email: Optional[str]) -> Optional[Any]:
+        if not email:
+            return None
+        User = get_user_model()
+        try:
+            return await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            return None
+
+    @staticmethod
+    def _ttl(duration) -> int:
+        return max(int(duration.total_seconds()), 1)
+
+
+class DatabaseAuthStateBackend(BaseAuthStateBackend):
+    def issue_otp(self, user: Any, otp: str) -> str:
+        from finnect.apps.userauth.models import OTPChallenge
+
+        return str(OTPChallenge.objects.issue(user, otp).id)
+
+    def resolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        from finnect.apps.userauth.models import OTPChallenge
+
+        challenge = OTPChallenge.objects.resolve(otp, challenge_id, email)
+        return challenge.user if challenge else None
+
+    def consume_otp(self, user: Any, otp: str) -> bool:
+        from finnect.apps.userauth.models import OTPChallenge
+
+        return OTPChallenge.objects.consume(user, otp)
+
+    async def aresolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        from finnect.apps.userauth.models import OTPChallenge
+
+        challenge = await OTPChallenge.objects.aresolve(
+            otp, challenge_id, email
+        )
+        return challenge.user if challenge else None
+
+    async def aconsume_otp(self, user: Any, otp: str) -> bool:
+        from finnect.apps.userauth.models import OTPChallenge
+
+        return await OTPChallenge.objects.aconsume(user, otp)
+
+    def register_failed_attempt(self, user: Any) -> int:
+        users = get_user_model().objects.filter(pk=user.pk)
+        users.update(
+            failed_login_attempts=F('failed_login_attempts') + 1,
+            last_failed_login=timezone.now(),
+        )
+        invalidate_cached_user(user.pk)
+        return users.values_list('failed_login_attempts', flat=True).get()
+
+    def reset_failed_attempts(self, user: Any) -> None:
+        if (
+            user.failed_login_attempts == 0
+            and user.last_failed_login is None
+            and user.account_status == user.AccountStatus.ACTIVE
+        ):
+            return
+        get_user_model().objects.filter(pk=user.pk).update(
+            failed_login_attempts=0,
+            last_failed_login=None,
+            account_status=user.AccountStatus.ACTIVE,
+        )
+        invalidate_cached_user(user.pk)
+
+    def block(self, user: Any) -> None:
+        get_user_model().objects.filter(pk=user.pk).update(
+            account_status=user.AccountStatus.BLOCKED,
+            last_failed_login=timezone.now(),
+        )
+        invalidate_cached_user(user.pk)
+
+    def unblock(self, user: Any) -> None:
+        self.reset_failed_attempts(user)
+
+    def is_blocked(self, user: Any) -> bool:
+        if user.account_status != user.AccountStatus.BLOCKED:
+            return False
+        # blocks set through the admin have no failed login and never expire
+        if user.last_failed_login is None:
+            return True
+        return (
+            user.last_failed_login + settings.BLOCKED_ACCOUNT_DURATION
+            > timezone.now()
+        )
+
+    async def ais_blocked(self, user: Any) -> bool:
+        # only reads fields already loaded on the user
+        return self.is_blocked(user)
+
+
+class RedisAuthStateBackend(BaseAuthStateBackend):
+    consume_otp_script = """
+    local record = redis.call('GET', KEYS[1])
+    if not record then
+        return 0
+    end
+    local sep = string.find(record, ':', 1, true)
+    local challenge_id = string.sub(record, 1, sep - 1)
+    local code_hash = string.sub(record, sep + 1)
+    if code_hash ~= ARGV[1] then
+        return 0
+    end
+    redis.call('DEL', KEYS[1], ARGV[2] .. challenge_id)
+    return 1
+    """
+
+    def __init__(self) -> None:
+        self.client = get_redis_connection(settings.AUTH_STATE_CACHE_ALIAS)
+        self.prefix = settings.AUTH_STATE_KEY_PREFIX
+        self._consume_otp = self.client.register_script(
+            self.consume_otp_script
+        )
+
+    def _key(self, *parts: Any) -> str:
+        return ':'.join([self.prefix, *map(str, parts)])
+
+    def issue_otp(self, user: Any, otp: str) -> str:
+        challenge_id = uuid.uuid4().hex
+        code_hash = hash_otp(otp)
+        ttl = self._ttl(settings.OTP_EXPIRATION)
+        user_key = self._key('otp', 'user', user.pk)
+
+        previous = self.client.get(user_key)
+        with self.client.pipeline() as pipe:
+            if previous:
+                old_challenge_id = previous.decode().split(':', 1)[0]
+                pipe.delete(self._key('otp', 'challenge', old_challenge_id))
+            pipe.set(user_key, f'{challenge_id}:{code_hash}', ex=ttl)
+            pipe.set(
+                self._key('otp', 'challenge', challenge_id),
+                f'{user.pk}:{code_hash}',
+                ex=ttl,
+            )
+            pipe.execute()
+        return challenge_id
+
+    def _resolve_user_id(self, otp: str, challenge_id: str) -> Optional[str]:
+        record = self.client.get(self._key('otp', 'challenge', challenge_id))
+        if not record:
+            return None
+        user_id, stored_hash = record.decode().split(':', 1)
+        if not hmac.compare_digest(stored_hash, hash_otp(otp)):
+            return None
+        return user_id
+
+    def _has_otp(self, user: Any, otp: str) -> bool:
+        record = self.client.get(self._key('otp', 'user', user.pk))
+        if not record:
+            return False
+        stored_hash = record.decode().split(':', 1)[1]
+        return hmac.compare_digest(stored_hash, hash_otp(otp))
+
+    def resolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        if challenge_id is not None:
+            return self._get_user(self._resolve_user_id(otp, challenge_id))
+        user = self._get_user_by_email(email)
+        if user is not None and self._has_otp(user, otp):
+            return user
+        return None
+
+    # the redis client is blocking but holds no database connection, so it
+    # can run on any worker thread instead of the shared sync thread
+    async def aresolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        if challenge_id is not None:
+            user_id = await sync_to_async(
+                self._resolve_user_id, thread_sensitive=False
+            )(otp, challenge_id)
+            return await self._aget_user(user_id)
+        user = await self._aget_user_by_email(email)
+        if user is not None and await sync_to_async(
+            self._has_otp, thread_sensitive=False
+        )(user, otp):
+            return user
+        return None
+
+    async def aconsume_otp(self, user: Any, otp: str) -> bool:
+        return await sync_to_async(self.consume_otp, thread_sensitive=False)(
+            user, otp
+        )
+
+    async def ais_blocked(self, user: Any) -> bool:
+        return await sync_to_async(self.is_blocked, thread_sensitive=False)(
+            user
+        )
+
+    def consume_otp(self, user: Any, otp: str) -> bool:
+        consumed = self._consume_otp(
+            keys=[self._key('otp', 'user', user.pk)],
+            args=[hash_otp(otp), self._key('otp', 'challenge', '')],
+        )
+        return consumed == 1
+
+    def register_failed_attempt(self, user: Any) -> int:
+        key = self._key('login', 'attempts', user.pk)
+        with self.client.pipeline() as pipe:
+            pipe.incr(key)
+            pipe.expire(
+                key, self._ttl(settings.FAILED_LOGIN_ATTEMPTS_WINDOW), nx=True
+            )
+            attempts, _ = pipe.execute()
+        return attempts
+
+    def reset_failed_attempts(self, user: Any) -> None:
+        self.client.delete(
+            self._key('login', 'attempts', user.pk),
+            self._key('login', 'blocked', user.pk),
+        )
+
+    def block(self, user: Any) -> None:
+        with self.client.pipeline() as pipe:
+            pipe.set(
+                self._key('login', 'blocked', user.pk),
+                1,
+                ex=self._ttl(settings.BLOCKED_ACCOUNT_DURATION),
+            )
+            pipe.delete(self._key('login', 'attempts', user.pk))
+            pipe.execute()
+
+    def unblock(self, user: Any) -> None:
+        self.reset_failed_attempts(user)
+
+    def is_blocked(self, user: Any) -> bool:
+        if user.account_status == user.AccountStatus.BLOCKED:
+            return True
+        return bool(self.client.exists(self._key('login', 'blocked', user.pk)))
+
+
+class InMemoryAuthStateBackend(BaseAuthStateBackend):
+    """
+    Process-local backend meant for tests and local development.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._challenges: dict[str, tuple[str, str, float]] = {}
+        self._user_challenges: dict[str, str] = {}
+        self._attempts: dict[str, tuple[int, float]] = {}
+        self._blocked: dict[str, float] = {}
+
+    @staticmethod
+    def _expires(duration) -> float:
+        return time.monotonic() + duration.total_seconds()
+
+    @staticmethod
+    def _alive(expires_at: float) -> bool:
+        return expires_at > time.monotonic()
+
+    def issue_otp(self, user: Any, otp: str) -> str:
+        challenge_id = uuid.uuid4().hex
+        user_id = str(user.pk)
+        with self._lock:
+            previous = self._user_challenges.pop(user_id, None)
+            self._challenges.pop(previous, None)
+            self._challenges[challenge_id] = (
+                user_id,
+                hash_otp(otp),
+                self._expires(settings.OTP_EXPIRATION),
+            )
+            self._user_challenges[user_id] = challenge_id
+        return challenge_id
+
+    def _resolve_user_id(self, otp: str, challenge_id: str) -> Optional[str]:
+        with self._lock:
+            challenge = self._challenges.get(challenge_id)
+        if not challenge:
+            return None
+        user_id, stored_hash, expires_at = challenge
+        if not (
+            self._alive(expires_at)
+            and hmac.compare_digest(stored_hash, hash_otp(otp))
+        ):
+            return None
+        return user_id
+
+    def _has_otp(self, user: Any, otp: str) -> bool:
+        with self._lock:
+            challenge_id = self._user_challenges.get(str(user.pk))
+        return challenge_id is not None and (
+            self._resolve_user_id(otp, challenge_id) is not None
+        )
+
+    def resolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        if challenge_id is not None:
+            return self._get_user(self._resolve_user_id(otp, challenge_id))
+        user = self._get_user_by_email(email)
+        if user is not None and self._has_otp(user, otp):
+            return user
+        return None
+
+    async def aresolve_otp(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ) -> Optional[Any]:
+        if challenge_id is not None:
+            return await self._aget_user(
+                self._resolve_user_id(otp, challenge_id)
+            )
+        user = await self._aget_user_by_email(email)
+        if user is not None and self._has_otp(user, otp):
+            return user
+        return None
+
+    async def aconsume_otp(self, user: Any, otp: str) -> bool:
+        return self.consume_otp(user, otp)
+
+    async def ais_blocked(self, user: Any) -> bool:
+        return self.is_blocked(user)
+
+    def consume_otp(self, user: Any, otp: str) -> bool:
+        user_id = str(user.pk)
+        with self._lock:
+            challenge_id = self._user_challenges.get(user_id)
+            challenge = self._challenges.get(challenge_id)
+            if not challenge:
+                return False
+            _, stored_hash, expires_at = challenge
+            if not (
+                self._alive(expires_at)
+                and hmac.compare_digest(stored_hash, hash_otp(otp))
+            ):
+                return False
+            del self._challenges[challenge_id]
+            del self._user_challenges[user_id]
+        return True
+
+    def register_failed_attempt(self, user: Any) -> int:
+        user_id = str(user.pk)
+        with self._lock:
+            attempts, expires_at = self._attempts.get(user_id, (0, 0.0))
+            if not self._alive(expires_at):
+                attempts = 0
+                expires_at = self._expires(
+                    settings.FAILED_LOGIN_ATTEMPTS_WINDOW
+                )
+            self._attempts[user_id] = (attempts + 1, expires_at)
+        return attempts + 1
+
+    def reset_failed_attempts(self, user: Any) -> None:
+        with self._lock:
+            self._attempts.pop(str(user.pk), None)
+            self._blocked.pop(str(user.pk), None)
+
+    def block(self, user: Any) -> None:
+        with self._lock:
+            self._attempts.pop(str(user.pk), None)
+            self._blocked[str(user.pk)] = self._expires(
+                settings.BLOCKED_ACCOUNT_DURATION
+            )
+
+    def unblock(self, user: Any) -> None:
+        self.reset_failed_attempts(user)
+
+    def is_blocked(self, user: Any) -> bool:
+        if user.account_status == user.AccountStatus.BLOCKED:
+            return True
+        with self._lock:
+            return self._alive(self._blocked.get(str(user.pk), 0.0))
+
+
+@functools.cache
+def get_auth_state_backend() -> BaseAuthStateBackend:
+    return import_string(settings.AUTH_STATE_BACKEND)()
+
+
+@receiver(setting_changed)
+def reset_auth_state_backend(*, setting: str, **kwargs: Any) -> None:
+    if setting in {
+        'AUTH_STATE_BACKEND',
+        'AUTH_STATE_CACHE_ALIAS',
+        'AUTH_STATE_KEY_PREFIX',
+    }:
+        get_auth_state_backend.cache_clear()
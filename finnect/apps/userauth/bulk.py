@@ -0,0 +1,238 @@
+import contextlib
+import csv
+import json
+import os
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from loguru import logger
+
+from finnect.apps.userauth.hashing import (
+    get_password_hashing_executor,
+    make_process_pool,
+)
+from finnect.apps.userauth.usernames import allocate_usernames
+from finnect.apps.userprofile.models import Profile
+
+User = get_user_model()
+
+REQUIRED_FIELDS = (
+    'email',
+    'password',
+    'first_name',
+    'last_name',
+    'id_number',
+    'security_question',
+    'security_answer',
+)
+OPTIONAL_FIELDS = ('middle_name', 'role')
+# JSON records can hold lists and objects, which no field accepts
+SCALAR_TYPES = (str, int, float, bool, type(None))
+INSERT_ATTEMPTS = 3
+
+
+class BulkImportResult:
+    def __init__(self) -> None:
+        self.processed = 0
+        self.created = 0
+        # (record number, message), record numbers start at 1
+        self.errors: list[tuple[int, str]] = []
+
+    @property
+    def skipped(self) -> int:
+        return self.processed - self.created
+
+
+def read_records(stream: TextIO, format: str) -> Iterator[dict[str, Any]]:
+    """
+    Yields one record per CSV row (with a header line) or JSONL line,
+    reading the input as it goes.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+    elif format == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f'Line {number}: {exc}') from exc
+            if not isinstance(record, dict):
+                raise ValueError(f'Line {number}: expected a JSON object.')
+            yield record
+    else:
+        raise ValueError(f'Unknown format {format!r}.')
+
+
+def hash_passwords(
+    passwords: list[str], pool: Optional[Executor] = None, workers: int = 1
+) -> list[str]:
+    """
+    Hashes in `pool` if given, otherwise through the process-wide
+    PASSWORD_HASHING_EXECUTOR.
+    """
+    if pool is None:
+        return get_password_hashing_executor().make_passwords(passwords)
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def build_user(record: dict[str, Any]) -> Any:
+    """
+    Unsaved user from an import record, with the same field validation as
+    the model (uniqueness is checked per batch, see import_batch).
+    """
+    fields = REQUIRED_FIELDS + OPTIONAL_FIELDS
+    not_scalar = [
+        field
+        for field in fields
+        if not isinstance(record.get(field), SCALAR_TYPES)
+    ]
+    if not_scalar:
+        raise ValidationError(
+            f'Expected a single value in: {", ".join(not_scalar)}.'
+        )
+    missing = [field for field in REQUIRED_FIELDS if _blank(record.get(field))]
+    if missing:
+        raise ValidationError(f'Missing fields: {", ".join(missing)}.')
+
+    values = {
+        field: record[field]
+        for field in fields
+        if field != 'password' and not _blank(record.get(field))
+    }
+    values['email'] = User.objects.normalize_email(str(values['email']))
+    user = User(**values)
+    user.clean_fields(exclude=['password', 'username'])
+    return user
+
+
+def _blank(value: Any) -> bool:
+    # not `not value`: 0 and False are values
+    return value is None or value == ''  # noqa: PLC1901
+
+
+def import_batch(
+    records: list[tuple[int, dict[str, Any]]],
+    result: BulkImportResult,
+    hasher: Callable[[list[str]], list[str]],
+) -> None:
+    """
+    Validates a batch, hashes its passwords and inserts the users and their
+    profiles in one transaction. Records that fail validation or clash with
+    existing users (or with each other) are reported and skipped.
+    """
+    pending = []
+    emails, id_numbers = set(), set()
+    for number, record in records:
+        result.processed += 1
+        try:
+            user = build_user(record)
+        except ValidationError as exc:
+            result.errors.append((number, ' '.join(exc.messages)))
+            continue
+        if user.email in emails or user.id_number in id_numbers:
+            result.errors.append((number, 'Duplicated in the input.'))
+            continue
+        emails.add(user.email)
+        id_numbers.add(user.id_number)
+        pending.append((number, user, str(record['password'])))
+
+    # checked before hashing, by far the slowest step
+    pending = _drop_existing(pending, result)
+    if not pending:
+        return
+    hashes = hasher([password for _, _, password in pending])
+    for (_, user, _), password in zip(pending, hashes):
+        user.password = password
+
+    for attempt in range(1, INSERT_ATTEMPTS + 1):
+        if attempt > 1:
+            pending = _drop_existing(pending, result)
+        users = [user for _, user, _ in pending]
+        for user, username in zip(users, allocate_usernames(len(users))):
+            user.username = username
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                Profile.objects.bulk_create(Profile(user=u) for u in users)
+        except IntegrityError:
+            # a concurrent signup took an email, ID number or username
+            # between the checks and the insert; check again and retry
+            if attempt == INSERT_ATTEMPTS:
+                raise
+            continue
+        result.created += len(users)
+        return
+
+
+def _drop_existing(
+    pending: list[tuple[int, Any, str]], result: BulkImportResult
+) -> list[tuple[int, Any, str]]:
+    emails = set(
+        User.objects
+        .filter(email__in=[user.email for _, user, _ in pending])
+        .order_by()
+        .values_list('email', flat=True)
+    )
+    id_numbers = set(
+        User.objects
+        .filter(id_number__in=[user.id_number for _, user, _ in pending])
+        .order_by()
+        .values_list('id_number', flat=True)
+    )
+    kept = []
+    for number, user, password in pending:
+        if user.email in emails:
+            result.errors.append((number, 'Email already registered.'))
+        elif user.id_number in id_numbers:
+            result.errors.append((number, 'ID number already registered.'))
+        else:
+            kept.append((number, user, password))
+    return kept
+
+
+def import_users(
+    records: Iterable[dict[str, Any]],
+    batch_size: int = 1000,
+    workers: Optional[int] = None,
+    on_batch: Optional[Callable[[BulkImportResult], None]] = None,
+) -> BulkImportResult:
+    """
+    Creates users and their profiles from `records` in batches, skipping
+    the per-user path of create_user (one INSERT and the post_save profile
+    signals per user). Passwords are hashed in a pool of `workers`
+    processes (the CPU count by default); with `workers=1` they go through
+    PASSWORD_HASHING_EXECUTOR.
+
+        with open('customers.jsonl') as stream:
+            result = import_users(read_records(stream, 'jsonl'))
+    """
+    workers = workers or os.cpu_count() or 1
+    result = BulkImportResult()
+    numbered = enumerate(records, start=1)
+    with contextlib.ExitStack() as stack:
+        pool = None
+        if workers > 1:
+            pool = stack.enter_context(make_process_pool(workers))
+
+        def hasher(passwords: list[str]) -> list[str]:
+            return hash_passwords(passwords, pool, workers)
+
+        while batch := list(islice(numbered, batch_size)):
+            import_batch(batch, result, hasher)
+            if on_batch is not None:
+                on_batch(result)
+
+    logger.info(
+        'Bulk user import: {created} created, {skipped} skipped',
+        created=result.created,
+        skipped=result.skipped,
+    )
+    return result
@@ -0,0 +1,193 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from loguru import logger
+
+from finnect.apps.common.cache import invalidate_cached_user
+
+
+def make_process_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Process pool for password hashing. Workers are spawned rather than
+    forked so they never share the parent's database connections, and set
+    Django up from DJANGO_SETTINGS_MODULE to get the same PASSWORD_HASHERS.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def verify_password(password: str, encoded: str) -> tuple[bool, bool]:
+    """
+    check_password returning whether the hash should be upgraded to the
+    preferred hasher, instead of calling a setter, so it can run in another
+    process.
+    """
+    outdated = []
+    is_correct = check_password(password, encoded, setter=outdated.append)
+    return is_correct, bool(outdated)
+
+
+def upgrade_password_hash(user_id: Any, password: str, encoded: str) -> bool:
+    """
+    Rehashes `password` with the preferred hasher and saves it, unless the
+    stored hash is no longer `encoded` (the password changed meanwhile).
+    """
+    new_encoded = get_password_hashing_executor().make_password(password)
+    updated = (
+        get_user_model()
+        .objects.filter(pk=user_id, password=encoded)
+        .update(password=new_encoded)
+    )
+    if updated:
+        invalidate_cached_user(user_id)
+    return bool(updated)
+
+
+class PasswordHashingExecutor:
+    """
+    Runs make_password and password checks in a bounded pool, so a burst
+    of signups or logins cannot put more than `workers` hashes per process
+    on the CPU at once.
+
+    - `thread`: `workers` threads. The bundled hashers (PBKDF2 from
+      hashlib, argon2-cffi, bcrypt, scrypt) release the GIL while hashing,
+      so the other threads of a gthread worker keep serving requests.
+    - `process`: `workers` spawned processes, for hashers that hold the
+      GIL. Not available inside daemonic processes (celery prefork).
+    - `inline`: on the calling thread, as Django does.
+
+    Async views await the same pool through run_in_executor. Hash upgrades
+    after a successful login run on a background thread, off the request,
+    except in `inline` mode.
+    """
+
+    KINDS = ('inline', 'thread', 'process')
+
+    def __init__(self, kind: str, workers: int) -> None:
+        if kind not in self.KINDS:
+            raise ImproperlyConfigured(
+                f'PASSWORD_HASHING_EXECUTOR must be one of {self.KINDS}, '
+                f'got {kind!r}.'
+            )
+        self.kind = kind
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._pool: Optional[Executor] = None
+        self._background: Optional[ThreadPoolExecutor] = None
+
+    def _pools(self) -> tuple[Optional[Executor], ThreadPoolExecutor]:
+        with self._lock:
+            if self._pid != os.getpid():
+                # pools do not survive a fork (gunicorn preload), so each
+                # process starts its own on first use
+                self._pool = None
+                self._background = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='password-rehash'
+                )
+                if self.kind == 'process':
+                    self._pool = make_process_pool(self.workers)
+                elif self.kind == 'thread':
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix='password-hashing',
+                    )
+                self._pid = os.getpid()
+            return self._pool, self._background
+
+    def run(self, func: Callable, *args: Any) -> Any:
+        pool, _ = self._pools()
+        if pool is None:
+            return func(*args)
+        return pool.submit(func, *args).result()
+
+    async def arun(self, func: Callable, *args: Any) -> Any:
+        pool, _ = self._pools()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, func, *args)
+
+    def make_password(self, password: Optional[str]) -> str:
+        return self.run(make_password, password)
+
+    async def amake_password(self, password: Optional[str]) -> str:
+        return await self.arun(make_password, password)
+
+    def make_passwords(self, passwords: list[str]) -> list[str]:
+        """
+        Hashes a batch, up to `workers` passwords at a time.
+        """
+        pool, _ = self._pools()
+        if pool is None:
+            return [make_password(password) for password in passwords]
+        return list(pool.map(make_password, passwords))
+
+    def verify(self, password: str, encoded: str) -> tuple[bool, bool]:
+        return self.run(verify_password, password, encoded)
+
+    async def averify(self, password: str, encoded: str) -> tuple[bool, bool]:
+        return await self.arun(verify_password, password, encoded)
+
+    def upgrade(self, user: Any, password: str) -> None:
+        """
+        Moves the user's hash to the preferred hasher, in the background
+        unless this executor is inline.
+        """
+        args = (user.pk, password, user.password)
+        if self.kind == 'inline':
+            upgrade_password_hash(*args)
+            return
+        _, background = self._pools()
+        background.submit(self._upgrade_in_background, *args)
+
+    @staticmethod
+    def _upgrade_in_background(
+        user_id: Any, password: str, encoded: str
+    ) -> None:
+        try:
+            if upgrade_password_hash(user_id, password, encoded):
+                logger.info(
+                    'Password hash upgraded for user {user_id}',
+                    user_id=user_id,
+                )
+        except Exception as exc:
+            logger.error(
+                'Could not upgrade the hash of {user_id}: {error}',
+                user_id=user_id,
+                error=str(exc),
+            )
+        finally:
+            # connections opened by this thread
+            connections.close_all()
+
+
+@functools.cache
+def get_password_hashing_executor() -> PasswordHashingExecutor:
+    return PasswordHashingExecutor(
+        settings.PASSWORD_HASHING_EXECUTOR, settings.PASSWORD_HASHING_WORKERS
+    )
+
+
+@receiver(setting_changed)
+def reset_password_hashing_executor(*, setting: str, **kwargs: Any) -> None:
+    if setting in {'PASSWORD_HASHING_EXECUTOR', 'PASSWORD_HASHING_WORKERS'}:
+        get_password_hashing_executor.cache_clear()
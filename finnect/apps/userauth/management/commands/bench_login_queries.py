@@ -0,0 +1,124 @@
+import random
+import uuid
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from finnect.apps.userauth import views
+
+User = get_user_model()
+
+PASSWORD = 'Bench-Passw0rd!'
+
+
+class Command(BaseCommand):
+    help = (
+        'Counts the SQL queries issued by each step of the login flow. '
+        'Everything runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--auth-state-backend',
+            default=settings.AUTH_STATE_BACKEND,
+            help='Dotted path of the AUTH_STATE_BACKEND to measure.',
+        )
+
+    def handle(self, *args, **options):
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_CLASSES': [],
+        }
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            AUTH_STATE_BACKEND=options['auth_state_backend'],
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            REST_FRAMEWORK=rest_framework,
+        ), transaction.atomic():
+            results = self.run_flow()
+            transaction.set_rollback(True)
+
+        backend = options['auth_state_backend']
+        self.stdout.write(f'Auth state backend: {backend}')
+        for step, queries in results:
+            self.stdout.write(f'{step:<28} {queries:>3} queries')
+
+    def run_flow(self):
+        email = f'bench-{uuid.uuid4().hex[:12]}@example.com'
+        user = User.objects.create_user(
+            email=email,
+            password=PASSWORD,
+            first_name='Bench',
+            last_name='User',
+            id_number=random.randint(10**8, 2**31 - 1),
+            security_question=User.SecurityQuestions.MAIDEN_NAME,
+            security_answer='bench',
+        )
+        client = Client()
+        issued = []
+
+        def capture_otp(*args, **kwargs):
+            otp = generate_otp(*args, **kwargs)
+            issued.append(otp)
+            return otp
+
+        generate_otp = views.generate_otp
+        results = []
+        with (
+            mock.patch.object(views, 'generate_otp', capture_otp),
+            mock.patch.object(views, 'queue_otp_email'),
+        ):
+            result, _ = self.measure(
+                'login (bad password)',
+                lambda: client.post(
+                    '/api/v1/auth/login/',
+                    {'email': email, 'password': 'wrong-password'},
+                    content_type='application/json',
+                ),
+                expected=400,
+            )
+            results.append(result)
+            result, response = self.measure(
+                'login',
+                lambda: client.post(
+                    '/api/v1/auth/login/',
+                    {'email': email, 'password': PASSWORD},
+                    content_type='application/json',
+                ),
+            )
+            results.append(result)
+            # the code is only resolved together with its challenge
+            challenge_id = response.json()['challenge_id']
+            result, _ = self.measure(
+                'verify-otp',
+                lambda: client.post(
+                    '/api/v1/auth/verify-otp/',
+                    {'otp': issued[-1], 'challenge_id': challenge_id},
+                    content_type='application/json',
+                ),
+            )
+            results.append(result)
+
+        user = User.objects.get(pk=user.pk)
+        results.append(self.measure('user.save() (no changes)', user.save)[0])
+        user.last_name = 'Renamed'
+        results.append(self.measure('user.save() (last_name)', user.save)[0])
+        return results
+
+    def measure(self, step, call, expected=200):
+        """
+        Returns (step, query count) and the response of `call`, failing if
+        the request did not get the `expected` status.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = call()
+        if response is not None and response.status_code != expected:
+            raise CommandError(
+                f'{step} returned {response.status_code}, expected {expected}.'
+            )
+        return (step, len(context.captured_queries)), response
@@ -0,0 +1,112 @@
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils.module_loading import import_string
+
+User = get_user_model()
+
+PASSWORD = 'Bench-Passw0rd!'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures each password hasher: milliseconds to hash and to verify, '
+        'and logins per second per core through authenticate() (user lookup '
+        'included). Runs on one thread with the inline executor, inside a '
+        'transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher',
+            action='append',
+            dest='hashers',
+            help='Dotted path of a hasher to measure (repeatable). Defaults '
+            'to PASSWORD_HASHERS.',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=3.0,
+            help='Seconds spent on each measurement.',
+        )
+
+    def handle(self, *args, **options):
+        duration = options['duration']
+        self.stdout.write(
+            f'{"hasher":<28} {"hash ms":>8} {"verify ms":>10} '
+            f'{"logins/s/core":>14}'
+        )
+        measured = 0
+        for path in options['hashers'] or settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as exc:
+                # library not installed (bcrypt)
+                self.stderr.write(f'{path}: {exc}')
+                continue
+            hash_ms = self.time_call(
+                lambda: hasher.encode(PASSWORD, hasher.salt()), duration
+            )
+            verify_ms = self.time_call(
+                lambda: hasher.verify(PASSWORD, encoded), duration
+            )
+            logins = self.logins_per_second(path, encoded, duration)
+            self.stdout.write(
+                f'{hasher.algorithm:<28} {hash_ms:>8.1f} {verify_ms:>10.1f} '
+                f'{logins:>14.1f}'
+            )
+            measured += 1
+        if not measured:
+            raise CommandError('No hasher could be loaded.')
+
+    def time_call(self, call, duration):
+        """
+        Mean milliseconds per call, calling for about `duration` seconds.
+        """
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            call()
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= duration:
+                return elapsed * 1000 / calls
+
+    def logins_per_second(self, path, encoded, duration):
+        # the measured hasher goes first so the logins do not upgrade it
+        hashers = [path] + [
+            other for other in settings.PASSWORD_HASHERS if other != path
+        ]
+        with (
+            override_settings(
+                PASSWORD_HASHERS=hashers, PASSWORD_HASHING_EXECUTOR='inline'
+            ),
+            transaction.atomic(),
+        ):
+            email = f'bench-{uuid.uuid4().hex[:12]}@example.com'
+            user = User.objects.create_user(
+                email=email,
+                password=PASSWORD,
+                first_name='Bench',
+                last_name='User',
+                id_number=random.randint(10**8, 2**31 - 1),
+                security_question=User.SecurityQuestions.MAIDEN_NAME,
+                security_answer='bench',
+            )
+            User.objects.filter(pk=user.pk).update(password=encoded)
+
+            def login():
+                if authenticate(email=email, password=PASSWORD) is None:
+                    raise CommandError(f'Login failed with {path}.')
+
+            milliseconds = self.time_call(login, duration)
+            transaction.set_rollback(True)
+        return 1000 / milliseconds
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from finnect.apps.userauth.query_plans import (
+    explain,
+    flow_settings,
+    run_auth_flow,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the login flow and EXPLAINs every query it sends to the '
+        'database. Fails unless each one is an index point lookup, with no '
+        'sort and no sequential scan. Postgres only; everything runs inside '
+        'a transaction that is rolled back. The same checks run in the '
+        'userauth tests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--auth-state-backend',
+            default=settings.AUTH_STATE_BACKEND,
+            help='Dotted path of the AUTH_STATE_BACKEND to check.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans can only be checked on Postgres.')
+
+        with (
+            flow_settings(options['auth_state_backend']),
+            transaction.atomic(),
+        ):
+            steps = run_auth_flow()
+            for step in steps:
+                if step.status_code != step.expected:
+                    raise CommandError(
+                        f'{step.name} returned {step.status_code}, '
+                        f'expected {step.expected}.'
+                    )
+            explained = explain(steps)
+            transaction.set_rollback(True)
+
+        failures = 0
+        for step, plans in explained:
+            self.stdout.write(step.name)
+            for plan in plans:
+                if plan.problems:
+                    failures += 1
+                    status = self.style.ERROR(
+                        'FAIL ' + ', '.join(plan.problems)
+                    )
+                else:
+                    status = 'ok   ' + ', '.join(plan.scans)
+                self.stdout.write(f'  {status}')
+                if plan.problems or options['verbosity'] > 1:
+                    self.stdout.write(f'    {plan.sql}')
+
+        if failures:
+            raise CommandError(
+                f'{failures} auth-path queries are not index point lookups.'
+            )
+        self.stdout.write(self.style.SUCCESS('All auth-path plans are OK.'))
@@ -0,0 +1,91 @@
+import contextlib
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finnect.apps.userauth.bulk import (
+    OPTIONAL_FIELDS,
+    REQUIRED_FIELDS,
+    import_users,
+    read_records,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates users and their profiles in bulk from a CSV file (with a '
+        'header line) or a JSONL file. Required fields: '
+        f'{", ".join(REQUIRED_FIELDS)}; optional: '
+        f'{", ".join(OPTIONAL_FIELDS)}. Records that are invalid or already '
+        'registered are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Input format. Defaults to the file extension.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help=(
+                'Processes hashing passwords (1 uses '
+                'PASSWORD_HASHING_EXECUTOR).'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format']
+        if format is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            if extension not in {'csv', 'jsonl'}:
+                raise CommandError('Use --format to give the input format.')
+            format = extension
+
+        started = time.perf_counter()
+        reported = 0
+
+        def progress(result):
+            nonlocal reported
+            for number, message in result.errors[reported:]:
+                self.stderr.write(f'Record {number}: {message}')
+            reported = len(result.errors)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{result.processed:,} records, {result.created:,} created, '
+                f'{result.skipped:,} skipped '
+                f'({result.created / elapsed:,.0f} users/s)'
+            )
+
+        if path == '-':
+            stream = contextlib.nullcontext(sys.stdin)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as exc:
+                raise CommandError(str(exc))
+        try:
+            with stream as lines:
+                result = import_users(
+                    read_records(lines, format),
+                    batch_size=options['batch_size'],
+                    workers=options['workers'],
+                    on_batch=progress,
+                )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {result.created:,} users in {elapsed:.1f} s, '
+                f'skipped {result.skipped:,}.'
+            )
+        )
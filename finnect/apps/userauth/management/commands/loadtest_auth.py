@@ -0,0 +1,229 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+
+from finnect.apps.userauth import views
+from finnect.apps.userauth.usernames import allocate_usernames
+from finnect.apps.userprofile.models import Profile
+from finnect.celery_app import app as celery_app
+
+User = get_user_model()
+
+EMAIL_DOMAIN = 'loadtest.invalid'
+PASSWORD = 'Load-Test-Passw0rd!'
+STEPS = ['login', 'verify-otp', 'refresh', 'logout']
+PERCENTILES = [50, 95, 99]
+
+
+def percentile(samples, value):
+    ordered = sorted(samples)
+    index = round(value / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives login -> verify-otp -> refresh -> logout with concurrent '
+        'virtual users and reports latency percentiles, throughput and '
+        'query counts per step.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=20, help='Virtual users.'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5,
+            help='Full flows run by each virtual user.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='Virtual users running at the same time.',
+        )
+        parser.add_argument(
+            '--local-state',
+            action='store_true',
+            help=(
+                'Use local-memory caches and the in-memory auth state '
+                'backend, so no Redis is needed.'
+            ),
+        )
+        parser.add_argument(
+            '--keep-users',
+            action='store_true',
+            help='Do not delete the load test users at the end.',
+        )
+
+    def handle(self, *args, **options):
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+            'CELERY_EMAIL_BACKEND': (
+                'django.core.mail.backends.locmem.EmailBackend'
+            ),
+            'REST_FRAMEWORK': {
+                **settings.REST_FRAMEWORK,
+                'DEFAULT_THROTTLE_CLASSES': [],
+            },
+        }
+        if options['local_state']:
+            overrides['AUTH_STATE_BACKEND'] = (
+                'finnect.apps.userauth.auth_state.InMemoryAuthStateBackend'
+            )
+            overrides['CACHES'] = {
+                alias: {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': f'loadtest-{alias}',
+                }
+                for alias in settings.CACHES
+            }
+
+        self.captured = threading.local()
+        self.generate_otp = views.generate_otp
+        always_eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        try:
+            with override_settings(**overrides), mock.patch.object(
+                views, 'generate_otp', self.capture_otp
+            ):
+                emails = self.create_users(options['users'])
+                try:
+                    samples, errors, elapsed = self.run(emails, options)
+                finally:
+                    if not options['keep_users']:
+                        User.objects.filter(
+                            email__endswith=f'@{EMAIL_DOMAIN}'
+                        ).delete()
+        finally:
+            celery_app.conf.task_always_eager = always_eager
+
+        self.report(samples, errors, elapsed)
+
+    def capture_otp(self, *args, **kwargs):
+        otp = self.generate_otp(*args, **kwargs)
+        self.captured.otp = otp
+        return otp
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        usernames = allocate_usernames(count)
+        users = [
+            User(
+                email=f'vu{index}-{random.getrandbits(32):x}@{EMAIL_DOMAIN}',
+                username=usernames[index],
+                password=password,
+                first_name='Load',
+                last_name=f'Test {index}',
+                id_number=random.randint(10**8, 2**31 - 1),
+                security_question=User.SecurityQuestions.MAIDEN_NAME,
+                security_answer='loadtest',
+            )
+            for index in range(count)
+        ]
+        User.objects.bulk_create(users)
+        Profile.objects.bulk_create([Profile(user=user) for user in users])
+        return [user.email for user in users]
+
+    def run(self, emails, options):
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+
+        def virtual_user(email):
+            client = Client()
+            local_samples = []
+            local_errors = []
+            try:
+                for _ in range(options['iterations']):
+                    self.run_flow(client, email, local_samples, local_errors)
+            finally:
+                connections.close_all()
+            with lock:
+                for step, latency, queries in local_samples:
+                    samples[step].append((latency, queries))
+                for step in local_errors:
+                    errors[step] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(virtual_user, emails))
+        return samples, errors, time.perf_counter() - started
+
+    def run_flow(self, client, email, samples, errors):
+        requests = {
+            'login': lambda: client.post(
+                '/api/v1/auth/login/',
+                {'email': email, 'password': PASSWORD},
+                content_type='application/json',
+            ),
+            'verify-otp': lambda: client.post(
+                '/api/v1/auth/verify-otp/',
+                {'otp': self.captured.otp, 'email': email},
+                content_type='application/json',
+            ),
+            'refresh': lambda: client.post(
+                '/api/v1/auth/refresh/', content_type='application/json'
+            ),
+            'logout': lambda: client.post('/api/v1/auth/logout/'),
+        }
+        # logout only expires the cookies in the response, so start every
+        # flow with an empty jar instead of an empty access token
+        client.cookies.clear()
+        for step in STEPS:
+            queries = []
+
+            def count_query(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_query):
+                started = time.perf_counter()
+                response = requests[step]()
+                latency = time.perf_counter() - started
+
+            samples.append((step, latency, len(queries)))
+            if response.status_code >= 400:
+                errors.append(step)
+                return
+
+    def report(self, samples, errors, elapsed):
+        total = sum(len(step_samples) for step_samples in samples.values())
+        header = (
+            f'{"step":<12}{"requests":>10}{"errors":>8}'
+            + ''.join(f'{f"p{value} ms":>10}' for value in PERCENTILES)
+            + f'{"queries":>10}'
+        )
+        self.stdout.write(header)
+        for step in STEPS:
+            step_samples = samples.get(step)
+            if not step_samples:
+                continue
+            latencies = [latency * 1000 for latency, _ in step_samples]
+            queries = statistics.mean(count for _, count in step_samples)
+            self.stdout.write(
+                f'{step:<12}{len(step_samples):>10}{errors[step]:>8}'
+                + ''.join(
+                    f'{percentile(latencies, value):>10.1f}'
+                    for value in PERCENTILES
+                )
+                + f'{queries:>10.1f}'
+            )
+        self.stdout.write(
+            f'{total} requests in {elapsed:.2f}s '
+            f'({total / elapsed:.1f} req/s)'
+        )
@@ -0,0 +1,94 @@
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from finnect.apps.userauth.usernames import (
+    get_username_allocator,
+    random_usernames,
+    username_length,
+)
+from finnect.apps.userauth.utils import username_prefix
+
+
+def allocate_in_worker(mode: str, count: int) -> tuple[list[str], float]:
+    """
+    Allocates `count` usernames one at a time, as `count` signups would.
+    """
+    if mode == 'sequence':
+        allocate = get_username_allocator().allocate
+    else:
+        allocate = random_usernames
+    started = time.perf_counter()
+    usernames = [allocate(1)[0] for _ in range(count)]
+    return usernames, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Allocates usernames from several processes at once and checks that '
+        'none is handed out twice. Compares the sequence allocator with the '
+        'random usernames checked against the table. Postgres only; nothing '
+        'is written to the users table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument(
+            '--usernames',
+            type=int,
+            default=20_000,
+            help='Usernames allocated by each process.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'The username sequence only exists on Postgres.'
+            )
+
+        processes = options['processes']
+        count = options['usernames']
+        pattern = re.compile(
+            rf'{re.escape(username_prefix())}'
+            rf'[0-9A-Z]{{{username_length() - len(username_prefix())}}}'
+        )
+        failed = False
+        for mode in ('sequence', 'random'):
+            results = self.run(mode, processes, count)
+            usernames = [name for names, _ in results for name in names]
+            duplicates = len(usernames) - len(set(usernames))
+            malformed = sum(
+                1 for name in usernames if not pattern.fullmatch(name)
+            )
+            # the slowest process bounds the run
+            elapsed = max(seconds for _, seconds in results)
+            self.stdout.write(
+                f'{mode:<9} {len(usernames):>9,} usernames from {processes} '
+                f'processes, {len(usernames) / elapsed:>10,.0f}/s, '
+                f'{duplicates} duplicated'
+            )
+            if mode == 'sequence' and (duplicates or malformed):
+                failed = True
+                self.stderr.write(
+                    f'{duplicates} duplicated and {malformed} malformed '
+                    'usernames from the sequence allocator.'
+                )
+        if failed:
+            raise CommandError('The sequence allocator handed out bad names.')
+
+    def run(self, mode, processes, count):
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            futures = [
+                pool.submit(allocate_in_worker, mode, count)
+                for _ in range(processes)
+            ]
+            return [future.result() for future in futures]
@@ -1,10 +1,16 @@
+import hmac
 from typing import Any, Optional
 
-from django.contrib.auth.hashers import make_password
+from django.conf import settings
 from django.contrib.auth.models import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.db import models, router
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from finnect.apps.userauth.utils import generate_username, validate_email_address
+from finnect.apps.userauth.hashing import get_password_hashing_executor
+from finnect.apps.userauth.usernames import allocate_usernames
+from finnect.apps.userauth.utils import hash_otp, validate_email_address
 
 
 class CustomUserManager(BaseUserManager):
@@ -14,7 +20,9 @@ class CustomUserManager(BaseUserManager):
         if not password:
             raise ValueError(_("A password must be provided."))
 
-        username = generate_username()
+        [username] = allocate_usernames(
+            using=self._db or router.db_for_write(self.model)
+        )
         email = self.normalize_email(email)
         validate_email_address(email)
 
@@ -23,7 +31,9 @@ class CustomUserManager(BaseUserManager):
             email=email,
             **extra_fields
         )
-        user.password = make_password(password)
+        user.password = get_password_hashing_executor().make_password(
+            password
+        )
         user.save(using=self._db)
         return user
     
@@ -44,3 +54,88 @@ class CustomUserManager(BaseUserManager):
 
         return self._create_user(email, password, **extra_fields)
 
+
+class OTPChallengeManager(models.Manager):
+    def issue(self, user: Any, otp: str):
+        self.filter(user=user).delete()
+        return self.create(
+            user=user,
+            code_hash=hash_otp(otp),
+            expires_at=timezone.now() + settings.OTP_EXPIRATION,
+        )
+
+    def resolve(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ):
+        code_hash = hash_otp(otp)
+        challenges = self.select_related('user').filter(
+            expires_at__gt=timezone.now()
+        )
+        if challenge_id is None:
+            if not email:
+                return None
+            # the live challenge of the user who logged in with this email;
+            # sliced instead of .first(), which would add ORDER BY id
+            matches = challenges.filter(
+                user__email=email, code_hash=code_hash
+            )[:1]
+            return next(iter(matches), None)
+
+        try:
+            challenge = challenges.get(pk=challenge_id)
+        except (self.model.DoesNotExist, ValidationError):
+            return None
+        if challenge and hmac.compare_digest(challenge.code_hash, code_hash):
+            return challenge
+        return None
+
+    def consume(self, user: Any, otp: str) -> bool:
+        deleted, _ = self.filter(
+            user=user,
+            code_hash=hash_otp(otp),
+            expires_at__gt=timezone.now(),
+        ).delete()
+        return deleted > 0
+
+    async def aresolve(
+        self,
+        otp: str,
+        challenge_id: Optional[str] = None,
+        email: Optional[str] = None,
+    ):
+        code_hash = hash_otp(otp)
+        challenges = self.select_related('user').filter(
+            expires_at__gt=timezone.now()
+        )
+        if challenge_id is None:
+            if not email:
+                return None
+            matches = challenges.filter(
+                user__email=email, code_hash=code_hash
+            )[:1]
+            async for challenge in matches:
+                return challenge
+            return None
+
+        try:
+            challenge = await challenges.aget(pk=challenge_id)
+        except (self.model.DoesNotExist, ValidationError):
+            return None
+        if challenge and hmac.compare_digest(challenge.code_hash, code_hash):
+            return challenge
+        return None
+
+    async def aconsume(self, user: Any, otp: str) -> bool:
+        deleted, _ = await self.filter(
+            user=user,
+            code_hash=hash_otp(otp),
+            expires_at__gt=timezone.now(),
+        ).adelete()
+        return deleted > 0
+
+    def purge_expired(self) -> int:
+        deleted, _ = self.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
@@ -1,9 +1,36 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+
 class CustomHeaderMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self._acall(request)
         response = self.get_response(request)
-        if request.user.is_authenticated:
-            response['X-Django-User'] = request.user.email
-        return response
\ No newline at end of file
+        self.set_header(response, request.user)
+        return response
+
+    async def _acall(self, request):
+        response = await self.get_response(request)
+        user = request.user
+        # Still the lazy session user from AuthenticationMiddleware (the
+        # view did not authenticate the request itself): resolving it here
+        # would query the database from the event loop.
+        if isinstance(user, SimpleLazyObject):
+            user = await request.auser()
+        self.set_header(response, user)
+        return response
+
+    @staticmethod
+    def set_header(response, user):
+        if user.is_authenticated:
+            response['X-Django-User'] = user.email
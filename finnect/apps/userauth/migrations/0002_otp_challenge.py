@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:31
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userauth', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='otp',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='otp_expiration_time',
+        ),
+        migrations.CreateModel(
+            name='OTPChallenge',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('code_hash', models.CharField(max_length=64, verbose_name='Code Hash')),
+                ('expires_at', models.DateTimeField(verbose_name='Expires At')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='otp_challenges', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'OTP Challenge',
+                'verbose_name_plural': 'OTP Challenges',
+                'indexes': [models.Index(fields=['code_hash', 'expires_at'], name='otp_challenge_lookup_idx'), models.Index(fields=['expires_at'], name='otp_challenge_expiry_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from finnect.apps.common.operations import PostgresRunSQL
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('userauth', '0004_user_keyset_index'),
+    ]
+
+    operations = [
+        # numbers behind the usernames, see usernames.UsernameAllocator
+        PostgresRunSQL(
+            sql='CREATE SEQUENCE userauth_username_seq AS bigint',
+            reverse_sql='DROP SEQUENCE userauth_username_seq',
+        ),
+    ]
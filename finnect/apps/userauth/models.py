@@ -1,13 +1,24 @@
 import uuid
+from typing import Any, Iterable, Optional
 
+from asgiref.sync import sync_to_async
 from django.db import models
+from django.db.models import DEFERRED
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from finnect.apps.common.cache import invalidate_cached_user
+from finnect.apps.userauth.auth_state import get_auth_state_backend
+from finnect.apps.userauth.hashing import get_password_hashing_executor
 from finnect.apps.userauth.utils import send_account_blocked_email
-from finnect.apps.userauth.managers import CustomUserManager
+from finnect.apps.userauth.managers import (
+    CustomUserManager,
+    OTPChallengeManager,
+)
 
 
 class User(AbstractUser):
@@ -73,16 +84,6 @@ class User(AbstractUser):
     )
     failed_login_attempts = models.PositiveSmallIntegerField(default=0)
     last_failed_login = models.DateTimeField(null=True, blank=True)
-    otp = models.CharField(
-        _("OTP"),
-        max_length=6,
-        blank=True
-    )
-    otp_expiration_time = models.DateTimeField(
-        _("OTP Expiration Time"),
-        null=True,
-        blank=True
-    )
 
     objects = CustomUserManager()
 
@@ -95,46 +96,105 @@ class User(AbstractUser):
         "security_answer",
     ]
 
-    def set_otp(self, otp: str) -> None:
-        self.otp = otp
-        self.otp_expiration_time = timezone.now() + settings.OTP_EXPIRATION
-        self.save()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        loaded = getattr(self, "_loaded_values", {})
+        for field in self._meta.concrete_fields:
+            if update_fields is None or field.name in set(update_fields):
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
+
+    def get_changed_fields(self, fields: Iterable[str]) -> set[str]:
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return set(fields)
+        deferred = self.get_deferred_fields()
+        return {
+            field
+            for field in fields
+            if field not in deferred
+            and loaded.get(field, DEFERRED) != getattr(self, field)
+        }
+
+    def set_password(self, raw_password: Optional[str]) -> None:
+        self.password = get_password_hashing_executor().make_password(
+            raw_password
+        )
+        self._password = raw_password
+
+    def check_password(self, raw_password: str) -> bool:
+        # hashes from an older hasher are upgraded by the executor instead
+        # of the setter's save() on the request thread
+        executor = get_password_hashing_executor()
+        is_correct, outdated = executor.verify(raw_password, self.password)
+        if is_correct and outdated:
+            executor.upgrade(self, raw_password)
+        return is_correct
+
+    async def acheck_password(self, raw_password: str) -> bool:
+        executor = get_password_hashing_executor()
+        is_correct, outdated = await executor.averify(
+            raw_password, self.password
+        )
+        if is_correct and outdated:
+            await sync_to_async(executor.upgrade)(self, raw_password)
+        return is_correct
+
+    def set_otp(self, otp: str) -> str:
+        return get_auth_state_backend().issue_otp(self, otp)
     
     def verify_otp(self, otp: str) -> bool:
-        if self.otp == otp and self.otp_expiration_time > timezone.now():
-            self.otp = ""
-            self.otp_expiration_time = None
-            self.save()
-            return True
-        return False
+        return get_auth_state_backend().consume_otp(self, otp)
+
+    async def averify_otp(self, otp: str) -> bool:
+        return await get_auth_state_backend().aconsume_otp(self, otp)
     
     def handle_failed_login_attempts(self) -> None:
-        self.failed_login_attempts += 1
+        backend = get_auth_state_backend()
+        self.failed_login_attempts = backend.register_failed_attempt(self)
         self.last_failed_login = timezone.now()
         if self.failed_login_attempts >= settings.MAX_LOGIN_ATTEMPTS:
+            backend.block(self)
             self.account_status = self.AccountStatus.BLOCKED
-            self.save()
+            invalidate_cached_user(self.pk)
             send_account_blocked_email(self.email, self)
 
     def reset_failed_login_attempts(self) -> None:
+        get_auth_state_backend().reset_failed_attempts(self)
         self.failed_login_attempts = 0
         self.last_failed_login = None
         self.account_status = self.AccountStatus.ACTIVE
-        self.save()
     
     def unlock_account(self) -> None:
+        get_auth_state_backend().unblock(self)
         if self.account_status == self.AccountStatus.BLOCKED:
             self.account_status = self.AccountStatus.ACTIVE
             self.failed_login_attempts = 0
             self.last_failed_login = None
-            self.save()
+            self.save(
+                update_fields=[
+                    "account_status",
+                    "failed_login_attempts",
+                    "last_failed_login",
+                ]
+            )
     
     def has_role_permission(self, role_name: str) -> bool:
         return self.role == role_name
     
     @property
     def is_account_blocked(self) -> bool:
-        return self.account_status == self.AccountStatus.BLOCKED
+        return get_auth_state_backend().is_blocked(self)
+
+    async def ais_account_blocked(self) -> bool:
+        return await get_auth_state_backend().ais_blocked(self)
     
     @property
     def is_account_active(self) -> bool:
@@ -150,4 +210,52 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _("User")
         verbose_name_plural = _("Users")
-        ordering = ["-date_joined"]
\ No newline at end of file
+        ordering = ["-date_joined"]
+        indexes = [
+            # Keyset pagination walks this index: the default ordering plus
+            # the primary key as tie-breaker.
+            models.Index(
+                fields=["-date_joined", "-id"], name="user_date_joined_id_idx"
+            ),
+            # Trigram indexes for the admin search: icontains becomes
+            # UPPER(col::text) LIKE UPPER('%term%'), which these serve on
+            # Postgres (created only there, see migration 0003).
+            *[
+                GinIndex(
+                    OpClass(Upper(field), name="gin_trgm_ops"),
+                    name=f"user_{field}_trgm_idx",
+                )
+                for field in ("email", "username", "first_name", "last_name")
+            ],
+        ]
+
+
+class OTPChallenge(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="otp_challenges",
+        verbose_name=_("User"),
+    )
+    code_hash = models.CharField(_("Code Hash"), max_length=64)
+    expires_at = models.DateTimeField(_("Expires At"))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OTPChallengeManager()
+
+    def __str__(self) -> str:
+        return f"OTP challenge {self.id} for {self.user_id}"
+
+    class Meta:
+        verbose_name = _("OTP Challenge")
+        verbose_name_plural = _("OTP Challenges")
+        indexes = [
+            models.Index(
+                fields=["code_hash", "expires_at"],
+                name="otp_challenge_lookup_idx",
+            ),
+            models.Index(
+                fields=["expires_at"], name="otp_challenge_expiry_idx"
+            ),
+        ]
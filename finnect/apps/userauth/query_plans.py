@@ -0,0 +1,186 @@
+import json
+import random
+import uuid
+from typing import Callable, NamedTuple
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from finnect.apps.userauth import views
+
+User = get_user_model()
+
+PASSWORD = 'Bench-Passw0rd!'
+INDEX_SCANS = {'Index Scan', 'Index Only Scan'}
+REJECTED_NODES = {'Seq Scan', 'Sort', 'Incremental Sort'}
+
+
+class Step(NamedTuple):
+    name: str
+    status_code: int
+    expected: int
+    queries: list[str]
+
+
+class Plan(NamedTuple):
+    sql: str
+    scans: list[str]
+    problems: list[str]
+
+
+def flow_settings(auth_state_backend: str) -> override_settings:
+    """
+    Settings for run_auth_flow: no throttling, no real emails.
+    """
+    return override_settings(
+        ALLOWED_HOSTS=['testserver'],
+        AUTH_STATE_BACKEND=auth_state_backend,
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_CLASSES': [],
+        },
+    )
+
+
+def _capture(
+    name: str, call: Callable[[], HttpResponse], expected: int = 200
+) -> tuple[Step, HttpResponse]:
+    with CaptureQueriesContext(connection) as context:
+        response = call()
+    queries = [query['sql'] for query in context.captured_queries]
+    return Step(name, response.status_code, expected, queries), response
+
+
+def run_auth_flow() -> list[Step]:
+    """
+    Creates a user and goes through failed logins, login and verify-otp
+    (with the challenge id and with the email), an authenticated request
+    and a token refresh, capturing the queries of each step.
+    """
+    email = f'bench-{uuid.uuid4().hex[:12]}@example.com'
+    User.objects.create_user(
+        email=email,
+        password=PASSWORD,
+        first_name='Bench',
+        last_name='User',
+        id_number=random.randint(10**8, 2**31 - 1),
+        security_question=User.SecurityQuestions.MAIDEN_NAME,
+        security_answer='bench',
+    )
+    client = Client()
+    issued = []
+    generate_otp = views.generate_otp
+
+    def capture_otp(*args, **kwargs):
+        otp = generate_otp(*args, **kwargs)
+        issued.append(otp)
+        return otp
+
+    def login(email, password):
+        return lambda: client.post(
+            '/api/v1/auth/login/',
+            {'email': email, 'password': password},
+            content_type='application/json',
+        )
+
+    def verify(**scope):
+        return lambda: client.post(
+            '/api/v1/auth/verify-otp/',
+            {'otp': issued[-1], **scope},
+            content_type='application/json',
+        )
+
+    def me():
+        return client.get('/api/v1/auth/users/me/')
+
+    def refresh():
+        return client.post(
+            '/api/v1/auth/refresh/', {}, content_type='application/json'
+        )
+
+    steps = []
+    with (
+        mock.patch.object(views, 'generate_otp', capture_otp),
+        mock.patch.object(views, 'queue_otp_email'),
+    ):
+        for name, call in [
+            ('login (unknown email)', login(f'x{email}', PASSWORD)),
+            ('login (bad password)', login(email, 'wrong-password')),
+        ]:
+            steps.append(_capture(name, call, expected=400)[0])
+
+        step, response = _capture('login', login(email, PASSWORD))
+        steps.append(step)
+        challenge = {'challenge_id': response.json().get('challenge_id')}
+        steps.append(
+            _capture('verify-otp (challenge)', verify(**challenge))[0]
+        )
+        steps.append(_capture('login', login(email, PASSWORD))[0])
+        steps.append(_capture('verify-otp (email)', verify(email=email))[0])
+
+    # without the user cache, so that the lookup reaches the database
+    with override_settings(
+        CACHES={
+            **settings.CACHES,
+            'uncached': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            },
+        },
+        USER_CACHE_ALIAS='uncached',
+        USER_CACHE_LOCAL_ALIAS='uncached',
+    ):
+        steps.append(_capture('users/me', me)[0])
+    steps.append(_capture('refresh', refresh)[0])
+    return steps
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _walk(child)
+
+
+def explain(steps: list[Step]) -> list[tuple[Step, list[Plan]]]:
+    """
+    EXPLAINs each SELECT, UPDATE and DELETE of the steps with sequential and
+    bitmap scans disabled: with only a handful of rows the planner would
+    rather read the whole table, so this asks whether an index can serve
+    the query, not whether it is picked for an empty table. Postgres only;
+    must run inside a transaction.
+    """
+    explained = []
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('SET LOCAL enable_bitmapscan = off')
+        for step in steps:
+            plans = []
+            for sql in step.queries:
+                statement = sql.lstrip()[:6].upper()
+                if statement not in {'SELECT', 'UPDATE', 'DELETE'}:
+                    continue
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = list(_walk(plan[0]['Plan']))
+                scans = [
+                    f'{node["Node Type"]} using {node["Index Name"]}'
+                    for node in nodes
+                    if node['Node Type'] in INDEX_SCANS
+                ]
+                problems = [
+                    node['Node Type']
+                    for node in nodes
+                    if node['Node Type'] in REJECTED_NODES
+                ]
+                if not scans and not problems:
+                    problems.append('no index scan')
+                plans.append(Plan(sql, scans, problems))
+            explained.append((step, plans))
+    return explained
@@ -0,0 +1,41 @@
+from smtplib import SMTPException
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import get_connection
+from loguru import logger
+
+from finnect.apps.userauth.models import OTPChallenge
+from finnect.apps.userauth.utils import send_otp_email
+
+
+@shared_task(name='userauth.purge_expired_otp_challenges')
+def purge_expired_otp_challenges() -> int:
+    deleted = OTPChallenge.objects.purge_expired()
+    logger.info('Purged {deleted} expired OTP challenges', deleted=deleted)
+    return deleted
+
+
+@shared_task(
+    name='userauth.send_otp_email',
+    ignore_result=True,
+    autoretry_for=(SMTPException, OSError),
+    retry_backoff=True,
+    retry_backoff_max=int(settings.OTP_EXPIRATION.total_seconds()),
+    max_retries=5,
+)
+def send_otp_email_task(email: str, otp: str) -> None:
+    """
+    Queue with queue_otp_email, whose expiry also applies to the retries:
+    once the code has expired there is nothing worth delivering.
+    """
+    # already running on a worker, so skip the queueing EMAIL_BACKEND and
+    # hand the message straight to the transport
+    connection = get_connection(settings.CELERY_EMAIL_BACKEND)
+    send_otp_email(email, otp, connection=connection, fail_silently=False)
+
+
+def queue_otp_email(email: str, otp: str) -> None:
+    send_otp_email_task.apply_async(
+        (email, otp), expires=settings.OTP_EXPIRATION.total_seconds()
+    )
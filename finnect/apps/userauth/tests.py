@@ -1,3 +1,506 @@
-from django.test import TestCase
+import io
+import threading
+import unittest
+from smtplib import SMTPServerDisconnected
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse, reverse_lazy
+from django.utils.functional import SimpleLazyObject
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from finnect.apps.common.cache import get_cached_user, get_user_version
+from finnect.apps.common.testing import (
+    FAST_PASSWORD_HASHERS,
+    LOCAL_CACHES,
+    PASSWORD,
+    AdminQueryCountMixin,
+    create_user,
+)
+from finnect.apps.userauth import (
+    bulk,
+    hashing,
+    query_plans,
+    tasks,
+    views,
+)
+from finnect.apps.userauth.middlewares import CustomHeaderMiddleware
+
+User = get_user_model()
+
+AUTH_STATE_BACKENDS = [
+    'finnect.apps.userauth.auth_state.DatabaseAuthStateBackend',
+    'finnect.apps.userauth.auth_state.InMemoryAuthStateBackend',
+]
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class OTPScopeTests(TestCase):
+    """
+    Two users holding the same 6-digit code must never log in as each
+    other: a code is only resolved with the challenge id or the email.
+    """
+
+    code = '123456'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = create_user(1)
+        cls.bob = create_user(2)
+
+    def login(self, user):
+        with (
+            mock.patch.object(views, 'generate_otp', return_value=self.code),
+            mock.patch.object(views, 'queue_otp_email'),
+        ):
+            response = self.client.post(
+                '/api/v1/auth/login/',
+                {'email': user.email, 'password': PASSWORD},
+                content_type='application/json',
+            )
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()['challenge_id']
+
+    def verify(self, **data):
+        self.client.cookies.clear()
+        return self.client.post(
+            '/api/v1/auth/verify-otp/',
+            {'otp': self.code, **data},
+            content_type='application/json',
+        )
+
+    @staticmethod
+    def assert_logged_in_as(response, user):
+        assert response.status_code == status.HTTP_200_OK
+        token = AccessToken(response.cookies['access'].value)
+        assert token['user_id'] == str(user.pk)
+
+    def test_code_alone_is_rejected(self):
+        for backend in AUTH_STATE_BACKENDS:
+            with (
+                self.subTest(backend=backend),
+                self.settings(AUTH_STATE_BACKEND=backend),
+            ):
+                self.login(self.alice)
+                assert self.verify().status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_same_code_resolves_to_the_scoped_user(self):
+        for backend in AUTH_STATE_BACKENDS:
+            with (
+                self.subTest(backend=backend),
+                self.settings(AUTH_STATE_BACKEND=backend),
+            ):
+                alice_challenge = self.login(self.alice)
+                self.login(self.bob)
+                self.assert_logged_in_as(
+                    self.verify(challenge_id=alice_challenge), self.alice
+                )
+                self.assert_logged_in_as(
+                    self.verify(email=self.bob.email), self.bob
+                )
+
+    def test_reissuing_keeps_the_other_users_challenge(self):
+        for backend in AUTH_STATE_BACKENDS:
+            with (
+                self.subTest(backend=backend),
+                self.settings(AUTH_STATE_BACKEND=backend),
+            ):
+                bob_challenge = self.login(self.bob)
+                self.login(self.alice)
+                self.login(self.alice)
+                self.assert_logged_in_as(
+                    self.verify(challenge_id=bob_challenge), self.bob
+                )
+
+    def test_challenge_of_another_email_is_rejected(self):
+        for backend in AUTH_STATE_BACKENDS:
+            with (
+                self.subTest(backend=backend),
+                self.settings(AUTH_STATE_BACKEND=backend),
+            ):
+                self.login(self.alice)
+                response = self.verify(email=self.bob.email)
+                assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class AsyncOTPScopeTests(OTPScopeTests):
+    """
+    The same checks against the ASGI-native verify view, which is only
+    routed with ASYNC_AUTH_VIEWS.
+    """
+
+    def verify(self, **data):
+        request = RequestFactory().post(
+            '/api/v1/auth/verify-otp/',
+            {'otp': self.code, **data},
+            content_type='application/json',
+        )
+        return async_to_sync(views.AsyncOTPVerifyView.as_view())(request)
+
+
+class OTPEmailTaskTests(SimpleTestCase):
+    def test_transient_smtp_error_is_retried(self):
+        attempts = [
+            SMTPServerDisconnected('Connection unexpectedly closed'),
+            1,
+        ]
+        connection = mock.Mock()
+        connection.send_messages.side_effect = attempts
+        with mock.patch.object(
+            tasks, 'get_connection', return_value=connection
+        ):
+            tasks.send_otp_email_task.apply(('user@example.com', '123456'))
+        assert connection.send_messages.call_count == len(attempts)
+
+    def test_delivery_expires_with_the_code(self):
+        with mock.patch.object(
+            tasks.send_otp_email_task, 'apply_async'
+        ) as apply_async:
+            tasks.queue_otp_email('user@example.com', '123456')
+        assert apply_async.call_args.kwargs['expires'] == (
+            settings.OTP_EXPIRATION.total_seconds()
+        )
+
+
+class CustomHeaderMiddlewareTests(SimpleTestCase):
+    user = User(email='user1@example.com')
+
+    @staticmethod
+    async def get_response(request):
+        return HttpResponse()
+
+    def test_async_chain_stays_async(self):
+        middleware = CustomHeaderMiddleware(self.get_response)
+        assert iscoroutinefunction(middleware)
+
+    def test_async_path_awaits_the_session_user(self):
+        request = RequestFactory().get('/')
+
+        def get_user():
+            raise AssertionError('session user resolved synchronously')
+
+        async def auser():
+            return self.user
+
+        request.user = SimpleLazyObject(get_user)
+        request.auser = auser
+        middleware = CustomHeaderMiddleware(self.get_response)
+        response = async_to_sync(middleware)(request)
+        assert response['X-Django-User'] == self.user.email
+
+    def test_async_path_uses_the_user_set_by_the_view(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        async def get_response(request):
+            request.user = self.user
+            return HttpResponse()
+
+        middleware = CustomHeaderMiddleware(get_response)
+        response = async_to_sync(middleware)(request)
+        assert response['X-Django-User'] == self.user.email
+
+
+@override_settings(CACHES=LOCAL_CACHES, PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class UserAdminQueryTests(AdminQueryCountMixin, TestCase):
+    def test_changelist_queries_do_not_grow_with_the_rows(self):
+        # the admin is the first user
+        self.assert_constant_queries(
+            reverse('admin:userauth_user_changelist'),
+            lambda: [create_user(index) for index in range(1, self.rows)],
+        )
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql', 'query plans are checked on Postgres'
+)
+@override_settings(CACHES=LOCAL_CACHES)
+class AuthQueryPlanTests(TestCase):
+    """
+    Every query of the auth path must be an index lookup, with no sort and
+    no sequential scan (see query_plans.explain).
+    """
+
+    def test_auth_queries_use_indexes(self):
+        with query_plans.flow_settings(AUTH_STATE_BACKENDS[0]):
+            steps = query_plans.run_auth_flow()
+        for step, plans in query_plans.explain(steps):
+            with self.subTest(step=step.name):
+                assert step.status_code == step.expected
+                assert any(plan.scans for plan in plans)
+                for plan in plans:
+                    assert not plan.problems, plan.sql
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BenchLoginQueriesTests(TestCase):
+    def test_every_step_gets_the_expected_status(self):
+        # measure() fails the command on an unexpected status
+        for backend in AUTH_STATE_BACKENDS:
+            with self.subTest(backend=backend):
+                output = io.StringIO()
+                call_command(
+                    'bench_login_queries',
+                    auth_state_backend=backend,
+                    stdout=output,
+                )
+                assert 'verify-otp' in output.getvalue()
+
+
+@override_settings(
+    CACHES=LOCAL_CACHES,
+    PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ],
+)
+class PasswordRehashTests(TransactionTestCase):
+    """
+    Logins with a hash from an older hasher move it to the preferred one
+    (MD5 here, to keep the tests fast). Transactional, since the `thread`
+    mode saves from another thread and connection.
+    """
+
+    modes = ['inline', 'thread']
+
+    def setUp(self):
+        self.user = create_user(1)
+        hasher = PBKDF2PasswordHasher()
+        self.outdated = hasher.encode(PASSWORD, hasher.salt(), iterations=1000)
+
+    def login_user(self):
+        User.objects.filter(pk=self.user.pk).update(password=self.outdated)
+        return User.objects.get(pk=self.user.pk)
+
+    def stored_password(self):
+        return User.objects.values_list('password', flat=True).get(
+            pk=self.user.pk
+        )
+
+    def wait_for_upgrades(self):
+        # the background pool has a single thread, so this runs after the
+        # upgrades submitted before it
+        _, background = hashing.get_password_hashing_executor()._pools()
+        background.submit(lambda: None).result()
+
+    def test_outdated_hash_is_upgraded_after_login(self):
+        for mode in self.modes:
+            for check in ['check_password', 'acheck_password']:
+                with (
+                    self.subTest(mode=mode, check=check),
+                    self.settings(PASSWORD_HASHING_EXECUTOR=mode),
+                ):
+                    user = self.login_user()
+                    method = getattr(user, check)
+                    if check.startswith('a'):
+                        method = async_to_sync(method)
+                    assert method(PASSWORD)
+                    self.wait_for_upgrades()
+
+                    stored = self.stored_password()
+                    assert stored.startswith('md5$')
+                    assert check_password(PASSWORD, stored)
+
+    def test_wrong_password_keeps_the_hash(self):
+        for mode in self.modes:
+            with (
+                self.subTest(mode=mode),
+                self.settings(PASSWORD_HASHING_EXECUTOR=mode),
+            ):
+                assert not self.login_user().check_password('wrong')
+                self.wait_for_upgrades()
+                assert self.stored_password() == self.outdated
+
+    def test_upgrade_keeps_a_password_changed_meanwhile(self):
+        user = self.login_user()
+        changed = User.objects.get(pk=user.pk)
+        changed.set_password('Changed123!x')
+        changed.save()
+
+        assert not hashing.upgrade_password_hash(
+            user.pk, PASSWORD, self.outdated
+        )
+        assert self.stored_password() == changed.password
+
+    def test_upgrade_invalidates_the_cached_user(self):
+        user = self.login_user()
+        get_cached_user(user.pk)
+        version = get_user_version(user.pk)
+
+        assert hashing.upgrade_password_hash(user.pk, PASSWORD, self.outdated)
+        assert get_user_version(user.pk) != version
+        assert get_cached_user(user.pk).password == self.stored_password()
+
+
+def import_record(index, **fields):
+    return {
+        'email': f'imported{index}@example.com',
+        'password': PASSWORD,
+        'first_name': 'Imported',
+        'last_name': f'User {index}',
+        'id_number': 1000 + index,
+        'security_question': 'maiden_name',
+        'security_answer': 'answer',
+        **fields,
+    }
+
+
+@override_settings(CACHES=LOCAL_CACHES, PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class BulkUserImportTests(TestCase):
+    url = reverse_lazy('user-bulk-import')
+
+    def authenticate(self, user):
+        self.client.cookies[settings.COOKIE_NAME] = str(
+            AccessToken.for_user(user)
+        )
+
+    def test_invalid_duplicated_and_registered_records_are_skipped(self):
+        registered = create_user(1)
+        result = bulk.import_users(
+            [
+                import_record(1),
+                import_record(2),
+                import_record(1),
+                import_record(3, email=registered.email),
+                import_record(4, id_number=registered.id_number),
+                import_record(5, first_name=['Imported']),
+                import_record(6, last_name=''),
+                import_record(7, middle_name={'first': 'Middle'}),
+            ],
+            workers=1,
+        )
+        assert result.created == len(['imported1', 'imported2'])
+        assert sorted(result.errors) == [
+            (3, 'Duplicated in the input.'),
+            (4, 'Email already registered.'),
+            (5, 'ID number already registered.'),
+            (6, 'Expected a single value in: first_name.'),
+            (7, 'Missing fields: last_name.'),
+            (8, 'Expected a single value in: middle_name.'),
+        ]
+        imported = User.objects.filter(email__startswith='imported')
+        assert sorted(imported.values_list('email', flat=True)) == [
+            'imported1@example.com',
+            'imported2@example.com',
+        ]
+        assert all(user.profile for user in imported)
+        assert imported[0].check_password(PASSWORD)
+
+    def test_insert_is_retried_after_a_concurrent_signup(self):
+        allocate_usernames = bulk.allocate_usernames
+        attempts = []
+
+        def signup_before_the_insert(count):
+            attempts.append(count)
+            if len(attempts) == 1:
+                # someone signs up with the second ID number between the
+                # checks and the insert
+                create_user(import_record(2)['id_number'])
+            return allocate_usernames(count)
+
+        with mock.patch.object(
+            bulk, 'allocate_usernames', signup_before_the_insert
+        ):
+            result = bulk.import_users(
+                [import_record(1), import_record(2)], workers=1
+            )
+        # the whole batch, then what is left after checking again
+        assert attempts == [2, 1]
+        assert result.created == 1
+        assert result.errors == [(2, 'ID number already registered.')]
+        assert User.objects.filter(email='imported1@example.com').exists()
+
+    def test_view_is_for_staff_only(self):
+        self.authenticate(create_user(1))
+        response = self.client.post(
+            self.url, [import_record(1)], content_type='application/json'
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_view_reports_errors_per_record(self):
+        self.authenticate(create_user(1, is_staff=True))
+        response = self.client.post(
+            self.url,
+            [import_record(1), import_record(2, id_number=[1, 2])],
+            content_type='application/json',
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json() == {
+            'created': 1,
+            'skipped': 1,
+            'errors': [
+                {
+                    'record': 2,
+                    'error': 'Expected a single value in: id_number.',
+                }
+            ],
+        }
+
+    @override_settings(
+        PASSWORD_HASHING_EXECUTOR='thread', PASSWORD_HASHING_WORKERS=2
+    )
+    def test_view_hashes_on_the_password_hashing_executor(self):
+        self.authenticate(create_user(1, is_staff=True))
+        make_password = hashing.make_password
+        threads = set()
+
+        def record_thread(password):
+            threads.add(threading.current_thread().name)
+            return make_password(password)
+
+        with mock.patch.object(hashing, 'make_password', record_thread):
+            response = self.client.post(
+                self.url,
+                [import_record(index) for index in range(4)],
+                content_type='application/json',
+            )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert threads
+        assert all(name.startswith('password-hashing') for name in threads)
+
+    def test_view_reads_csv_uploads(self):
+        self.authenticate(create_user(1, is_staff=True))
+        records = [import_record(1), import_record(2)]
+        lines = [','.join(records[0])] + [
+            ','.join(str(value) for value in record.values())
+            for record in records
+        ]
+        upload = SimpleUploadedFile(
+            'customers.csv', '\n'.join(lines).encode(), 'text/csv'
+        )
+        response = self.client.post(self.url, {'file': upload})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()['created'] == len(records)
+
+    def test_view_rejects_requests_over_the_limit(self):
+        self.authenticate(create_user(1, is_staff=True))
+        records = [import_record(index) for index in range(3)]
+        with self.settings(BULK_USER_IMPORT_MAX_RECORDS=len(records) - 1):
+            response = self.client.post(
+                self.url, records, content_type='application/json'
+            )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not User.objects.filter(email__startswith='imported').exists()
+
+        response = self.client.post(
+            self.url,
+            [import_record(1), ['not', 'a', 'record']],
+            content_type='application/json',
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
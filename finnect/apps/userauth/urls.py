@@ -1,15 +1,32 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
+    AsyncLogoutView,
+    AsyncOTPVerifyView,
+    AsyncTokenRefreshView,
+    BulkUserImportView,
     CustomTokenCreateView,
     CustomTokenRefreshView,
     LogoutAPIView,
     OTPVerifyView,
 )
 
+if settings.ASYNC_AUTH_VIEWS:
+    refresh_view = AsyncTokenRefreshView
+    logout_view = AsyncLogoutView
+    otp_verify_view = AsyncOTPVerifyView
+else:
+    refresh_view = CustomTokenRefreshView
+    logout_view = LogoutAPIView
+    otp_verify_view = OTPVerifyView
+
 urlpatterns = [
     path('login/', CustomTokenCreateView.as_view(), name='login'),
-    path('refresh/', CustomTokenRefreshView.as_view(), name='refresh'),
-    path('logout/', LogoutAPIView.as_view(), name='logout'),
-    path('verify-otp/', OTPVerifyView.as_view(), name='otp-verify'),
-]
\ No newline at end of file
+    path('refresh/', refresh_view.as_view(), name='refresh'),
+    path('logout/', logout_view.as_view(), name='logout'),
+    path('verify-otp/', otp_verify_view.as_view(), name='otp-verify'),
+    path(
+        'bulk-import/', BulkUserImportView.as_view(), name='user-bulk-import'
+    ),
+]
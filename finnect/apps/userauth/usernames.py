@@ -0,0 +1,125 @@
+import functools
+import os
+import string
+import threading
+from collections import deque
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+from finnect.apps.userauth.utils import generate_username, username_prefix
+
+SEQUENCE_NAME = 'userauth_username_seq'
+ALPHABET = string.digits + string.ascii_uppercase
+
+
+def encode_base36(value: int, width: int) -> str:
+    """
+    `value` in base 36 (0-9, A-Z), left-padded with zeros to `width` so
+    that string order matches numeric order.
+    """
+    if value < 0 or value >= 36**width:
+        raise ValueError(f'{value} does not fit in {width} base-36 digits.')
+    digits = []
+    while value:
+        value, digit = divmod(value, 36)
+        digits.append(ALPHABET[digit])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+class UsernameAllocator:
+    """
+    Usernames made of the bank prefix and a number from a Postgres
+    sequence in base 36, such as `FB000000004F`.
+
+    Each process reserves `block_size` numbers with a single query and
+    hands them out from memory, so signups do not touch the database for
+    the username and processes never wait on each other: nextval() does
+    not lock and is not undone by a rollback, so a number is never handed
+    out twice. Numbers left in a block when the process exits are skipped.
+
+    The old random usernames have a dash right after the prefix and these
+    never do, so the two formats cannot collide. Outside Postgres there is
+    no sequence and the random format is used, checked against the table.
+    """
+
+    def __init__(self, block_size: int) -> None:
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._blocks: dict[str, deque[int]] = {}
+
+    def allocate(
+        self, count: int = 1, using: str = DEFAULT_DB_ALIAS
+    ) -> list[str]:
+        if connections[using].vendor != 'postgresql':
+            return random_usernames(count, using)
+
+        prefix = username_prefix()
+        width = username_length() - len(prefix)
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked after reserving: the parent keeps handing out its
+                # blocks, so the child must not reuse them
+                self._blocks.clear()
+                self._pid = os.getpid()
+            block = self._blocks.setdefault(using, deque())
+            if len(block) < count:
+                size = max(self.block_size, count - len(block))
+                block.extend(self.reserve(size, using))
+            values = [block.popleft() for _ in range(count)]
+        return [prefix + encode_base36(value, width) for value in values]
+
+    def reserve(self, count: int, using: str = DEFAULT_DB_ALIAS) -> list[int]:
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(%s) FROM generate_series(1, %s)',
+                [SEQUENCE_NAME, count],
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+
+def username_length() -> int:
+    return get_user_model()._meta.get_field('username').max_length
+
+
+def random_usernames(count: int, using: str = DEFAULT_DB_ALIAS) -> list[str]:
+    """
+    `count` distinct random usernames that are not taken yet, checked
+    against the table with one query per round.
+    """
+    User = get_user_model()
+    usernames: set[str] = set()
+    while len(usernames) < count:
+        candidates = {
+            generate_username() for _ in range(count - len(usernames))
+        } - usernames
+        taken = (
+            User.objects.using(using)
+            .filter(username__in=candidates)
+            .order_by()
+            .values_list('username', flat=True)
+        )
+        usernames |= candidates.difference(taken)
+    return list(usernames)
+
+
+@functools.cache
+def get_username_allocator() -> UsernameAllocator:
+    return UsernameAllocator(settings.USERNAME_BLOCK_SIZE)
+
+
+def allocate_usernames(
+    count: int = 1, using: str = DEFAULT_DB_ALIAS
+) -> list[str]:
+    return get_username_allocator().allocate(count, using)
+
+
+@receiver(setting_changed)
+def reset_username_allocator(*, setting: str, **kwargs: Any) -> None:
+    if setting == 'USERNAME_BLOCK_SIZE':
+        get_username_allocator.cache_clear()
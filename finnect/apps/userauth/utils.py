@@ -1,3 +1,6 @@
+import functools
+import hashlib
+import hmac
 import random
 import string
 
@@ -15,24 +18,48 @@ def generate_otp(length: int = 6) -> str:
     return "".join(random.choices(string.digits, k=length))
 
 
-def send_otp_email(email, otp):
-    subject = _('Your OTP code')
-    from_email = settings.DEFAULT_FROM_EMAIL
-    recipient_list = [email]
+def hash_otp(otp: str) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(), otp.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+OTP_PLACEHOLDER = '__otp__'
+
+
+@functools.cache
+def render_otp_email_templates() -> tuple[str, str]:
     context = {
-        'otp': otp,
-        'otp_expiration': settings.OTP_EXPIRATION,
+        'otp': OTP_PLACEHOLDER,
+        'otp_expiration': int(settings.OTP_EXPIRATION.total_seconds() // 60),
         'site_name': settings.SITE_NAME,
     }
     html_email = render_to_string('emails/otp_email.html', context)
-    text_email = strip_tags(html_email)
-    msg = EmailMultiAlternatives(subject, text_email, from_email, recipient_list)
+    return html_email, strip_tags(html_email)
+
+
+def send_otp_email(email, otp, connection=None, fail_silently=True):
+    subject = _('Your OTP code')
+    from_email = settings.DEFAULT_FROM_EMAIL
+    recipient_list = [email]
+    html_template, text_template = render_otp_email_templates()
+    html_email = html_template.replace(OTP_PLACEHOLDER, otp)
+    text_email = text_template.replace(OTP_PLACEHOLDER, otp)
+    msg = EmailMultiAlternatives(
+        subject, text_email, from_email, recipient_list, connection=connection
+    )
     msg.attach_alternative(html_email, "text/html")
     try:
         msg.send()
-        logger.info(f'OTP email sent successfully to: {email}')
+        logger.info('OTP email sent successfully to: {email}', email=email)
     except Exception as exc:
-        logger.error(f'Error sending OTP email to {email}: {exc}')
+        logger.error(
+            'Error sending OTP email to {email}: {error}',
+            email=email,
+            error=str(exc),
+        )
+        if not fail_silently:
+            raise
 
 
 def send_account_blocked_email(email, user):
@@ -41,7 +68,7 @@ def send_account_blocked_email(email, user):
     recipient_list = [email]
     context = {
         'user': user,
-        'lockout_duration': int(settings.LOCKOUT_DURATION.total_seconds() // 60),
+        'lockout_duration': int(settings.BLOCKED_ACCOUNT_DURATION.total_seconds() // 60),
         'site_name': settings.SITE_NAME,
     }
     html_email = render_to_string('emails/account_blocked.html', context)
@@ -50,15 +77,25 @@ def send_account_blocked_email(email, user):
     msg.attach_alternative(html_email, "text/html")
     try:
         msg.send()
-        logger.info(f'Account blocked email sent successfully to: {email}')
+        logger.info(
+            'Account blocked email sent successfully to: {email}',
+            email=email,
+        )
     except Exception as exc:
-        logger.error(f'Error sending account blocked email to {email}: {exc}')
+        logger.error(
+            'Error sending account blocked email to {email}: {error}',
+            email=email,
+            error=str(exc),
+        )
+
+
+def username_prefix() -> str:
+    words = settings.BANK_NAME.split()
+    return "".join([word[0] for word in words]).upper()
 
 
 def generate_username() -> str:
-    bank_name = settings.BANK_NAME
-    words = bank_name.split()
-    prefix = "".join([word[0] for word in words]).upper()
+    prefix = username_prefix()
     remaining_length = 12 - len(prefix) - 1 # one for the dash
     random_chars = "".join(
         random.choices(string.ascii_uppercase + string.digits, k=remaining_length)
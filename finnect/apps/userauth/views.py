@@ -1,25 +1,55 @@
-from typing import Any, Optional
+import io
+import json
+import os
+from itertools import islice
+from typing import Any, Optional, Union
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.utils import timezone
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from djoser.views import TokenCreateView
 from djoser.views import User
 from loguru import logger
 from rest_framework import permissions, status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    ParseError,
+    Throttled,
+)
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from .utils import send_otp_email, generate_otp
+from finnect.apps.common.cookies import CookieAuthentication
+
+from .auth_state import get_auth_state_backend
+from .bulk import import_users, read_records
+from .tasks import queue_otp_email
+from .utils import generate_otp
 
 
 User = get_user_model()
 
 
 def set_auth_cookies(
-    response: Response, access_token: str, refresh_token: Optional[str] = None
+    response: HttpResponse,
+    access_token: str,
+    refresh_token: Optional[str] = None,
 ) -> None:
     access_token_lifetime = settings.SIMPLE_JWT[
         'ACCESS_TOKEN_LIFETIME'
@@ -47,6 +77,10 @@ def set_auth_cookies(
     response.set_cookie('logged_in', 'true', **logged_in_cookie_settings)
 
 
+def blocked_account_minutes() -> int:
+    return int(settings.BLOCKED_ACCOUNT_DURATION.total_seconds() // 60)
+
+
 class CustomTokenCreateView(TokenCreateView):
     def _action(self, serializer):
         user = serializer.user
@@ -54,7 +88,7 @@ class CustomTokenCreateView(TokenCreateView):
             return Response(
                 {
                     'error': 'Account is blocked due to multiple failed login attempts.'
-                    f'try again after {settings.BLOCKED_ACCOUNT_DURATION / 60} minutes.'
+                    f' Try again after {blocked_account_minutes()} minutes.'
                 },
                 status=status.HTTP_403_FORBIDDEN,
             )
@@ -62,15 +96,16 @@ class CustomTokenCreateView(TokenCreateView):
         user.reset_failed_login_attempts()
 
         otp = generate_otp()
-        user.set_otp(otp)
-        send_otp_email(user.email, otp)
+        challenge_id = user.set_otp(otp)
+        queue_otp_email(user.email, otp)
 
-        logger.info(f'OTP sent for login to user: {user.email}')
+        logger.info('OTP sent for login to user: {email}', email=user.email)
 
         return Response(
             {
                 'message': 'OTP sent to your email address.',
                 'email': user.email,
+                'challenge_id': challenge_id,
             },
             status=status.HTTP_200_OK,
         )
@@ -80,29 +115,38 @@ class CustomTokenCreateView(TokenCreateView):
         try:
             serializer.is_valid(raise_exception=True)
         except Exception as e:
-            logger.error(f'Error in login: {e}')
+            logger.error('Error in login: {error}', error=str(e))
             email = request.data.get('email')
-            user = User.objects.filter(email=email).first()
-            if not user:
+            try:
+                user = User.objects.get(email=email)
+            except User.DoesNotExist:
                 return Response(
                     {'error': 'Invalid credentials.'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            user.handle_failed_login_attempts()
+            if not user.is_account_blocked:
+                user.handle_failed_login_attempts()
             failed_attempts = user.failed_login_attempts
             logger.error(
-                f'Failed login attempts for user: {email} = {failed_attempts}'
+                'Failed login attempts for user: {email} = {failed_attempts}',
+                email=email,
+                failed_attempts=failed_attempts,
             )
-            if failed_attempts >= settings.MAX_LOGIN_ATTEMPTS:
+            if user.is_account_blocked:
                 return Response(
                     {
                         'error': 'Account is blocked due to multiple failed login attempts.'
-                        f'try again after {settings.BLOCKED_ACCOUNT_DURATION / 60} minutes.'
+                        f' Try again after {blocked_account_minutes()} minutes.'
                     },
                     status=status.HTTP_403_FORBIDDEN,
                 )
 
+            return Response(
+                {'error': 'Invalid credentials.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         return self._action(serializer)
 
 
@@ -139,16 +183,21 @@ class OTPVerifyView(APIView):
 
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         otp = request.data.get('otp')
+        challenge_id = request.data.get('challenge_id')
+        email = request.data.get('email')
 
         if not otp:
             return Response(
                 {'error': 'OTP is required.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        if not (challenge_id or email):
+            return Response(
+                {'error': 'challenge_id or email is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        user = User.objects.filter(
-            otp=otp, otp_expiration_time__gt=timezone.now()
-        ).first()
+        user = get_auth_state_backend().resolve_otp(otp, challenge_id, email)
         if not user:
             return Response(
                 {'error': 'Invalid or expired OTP.'},
@@ -159,12 +208,16 @@ class OTPVerifyView(APIView):
             return Response(
                 {
                     'error': 'Account is blocked due to multiple failed login attempts.'
-                    f'try again after {settings.BLOCKED_ACCOUNT_DURATION / 60} minutes.'
+                    f' Try again after {blocked_account_minutes()} minutes.'
                 },
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        user.verify_otp(otp)
+        if not user.verify_otp(otp):
+            return Response(
+                {'error': 'Invalid or expired OTP.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         refresh = RefreshToken.for_user(user)
         access_token = str(refresh.access_token)
@@ -176,9 +229,7 @@ class OTPVerifyView(APIView):
             status=status.HTTP_200_OK,
         )
         set_auth_cookies(response, access_token, refresh_token)
-        logger.info(
-            f'User logged in successfully: {user.email} with OTP {otp}'
-        )
+        logger.info('User logged in successfully: {email}', email=user.email)
         return response
 
 
@@ -190,4 +241,283 @@ class LogoutAPIView(APIView):
         response.delete_cookie('access')
         response.delete_cookie('refresh')
         response.delete_cookie('logged_in')
-        return response
\ No newline at end of file
+        return response
+
+
+class BulkUserImportView(APIView):
+    """
+    Bulk provisioning for staff. Takes a `file` upload (.csv with a header
+    line, or .jsonl) or a JSON list of records, up to
+    BULK_USER_IMPORT_MAX_RECORDS per request. Passwords are hashed through
+    PASSWORD_HASHING_EXECUTOR while the request waits, so the limit keeps
+    it within the worker timeout; large migrations should use the
+    import_users command.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        limit = settings.BULK_USER_IMPORT_MAX_RECORDS
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                format = os.path.splitext(upload.name)[1].lstrip('.').lower()
+                stream = io.TextIOWrapper(upload, encoding='utf-8')
+                records = list(islice(read_records(stream, format), limit + 1))
+            elif isinstance(request.data, list):
+                records = request.data
+            else:
+                raise ValueError(
+                    'Send a CSV or JSONL file or a list of records.'
+                )
+        except (UnicodeDecodeError, ValueError) as e:
+            return Response(
+                {'error': str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(records) > limit:
+            return Response(
+                {'error': f'At most {limit} records per request.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not all(isinstance(record, dict) for record in records):
+            return Response(
+                {'error': 'Each record must be an object.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = import_users(records, batch_size=limit, workers=1)
+        logger.info(
+            'Bulk import by {email}: {created} users created, '
+            '{skipped} skipped',
+            email=request.user.email,
+            created=result.created,
+            skipped=result.skipped,
+        )
+        return Response(
+            {
+                'created': result.created,
+                'skipped': result.skipped,
+                'errors': [
+                    {'record': number, 'error': message}
+                    for number, message in result.errors
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class AsyncAPIView(View):
+    """
+    Base for the ASGI-native views. DRF views always run synchronously, so
+    these are plain Django views that speak JSON, apply the default DRF
+    throttles and render DRF exceptions the same way the API does.
+    """
+
+    authentication_required = True
+
+    @classonlymethod
+    def as_view(cls, **initkwargs: Any):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(
+        self, request: HttpRequest, *args: Any, **kwargs: Any
+    ) -> HttpResponse:
+        try:
+            await self.perform_authentication(request)
+            await self.check_throttles(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(request, exc)
+
+    async def perform_authentication(self, request: HttpRequest) -> None:
+        result = await CookieAuthentication().aauthenticate(request)
+        if result is None:
+            if self.authentication_required:
+                raise NotAuthenticated()
+            request.user, request.auth = AnonymousUser(), None
+        else:
+            request.user, request.auth = result
+
+    async def check_throttles(self, request: HttpRequest) -> None:
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            allowed = await sync_to_async(
+                throttle.allow_request, thread_sensitive=False
+            )(request, self)
+            if not allowed:
+                raise Throttled(throttle.wait())
+
+    def handle_exception(
+        self, request: HttpRequest, exc: APIException
+    ) -> JsonResponse:
+        detail = exc.detail
+        if not isinstance(detail, (dict, list)):
+            detail = {'detail': detail}
+        response = JsonResponse(detail, status=exc.status_code, safe=False)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            response['WWW-Authenticate'] = (
+                CookieAuthentication().authenticate_header(request)
+            )
+        if isinstance(exc, Throttled) and exc.wait is not None:
+            response['Retry-After'] = str(int(exc.wait))
+        return response
+
+    def get_data(self, request: HttpRequest) -> Union[dict, Any]:
+        if request.content_type != 'application/json':
+            return request.POST
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as e:
+            raise ParseError(f'JSON parse error - {e}')
+        return data if isinstance(data, dict) else {}
+
+
+class AsyncOTPVerifyView(AsyncAPIView):
+    authentication_required = False
+
+    async def post(
+        self, request: HttpRequest, *args: Any, **kwargs: Any
+    ) -> JsonResponse:
+        data = self.get_data(request)
+        otp = data.get('otp')
+        challenge_id = data.get('challenge_id')
+        email = data.get('email')
+
+        if not otp:
+            return JsonResponse(
+                {'error': 'OTP is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not (challenge_id or email):
+            return JsonResponse(
+                {'error': 'challenge_id or email is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user = await get_auth_state_backend().aresolve_otp(
+            otp, challenge_id, email
+        )
+        if not user:
+            return JsonResponse(
+                {'error': 'Invalid or expired OTP.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if await user.ais_account_blocked():
+            return JsonResponse(
+                {
+                    'error': 'Account is blocked due to multiple failed login attempts.'
+                    f' Try again after {blocked_account_minutes()} minutes.'
+                },
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if not await user.averify_otp(otp):
+            return JsonResponse(
+                {'error': 'Invalid or expired OTP.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        refresh = RefreshToken.for_user(user)
+        response = JsonResponse(
+            {'success': 'OTP verified successfully.'},
+            status=status.HTTP_200_OK,
+        )
+        set_auth_cookies(response, str(refresh.access_token), str(refresh))
+        logger.info('User logged in successfully: {email}', email=user.email)
+        return response
+
+
+class AsyncTokenRefreshView(AsyncAPIView):
+    authentication_required = False
+
+    async def perform_authentication(self, request: HttpRequest) -> None:
+        # like TokenRefreshView, ignore the access cookie: it is usually the
+        # expired token this request is about to replace
+        request.user, request.auth = AnonymousUser(), None
+
+    async def post(
+        self, request: HttpRequest, *args: Any, **kwargs: Any
+    ) -> JsonResponse:
+        raw_token = request.COOKIES.get('refresh')
+        if not raw_token:
+            raw_token = self.get_data(request).get('refresh')
+        if not raw_token:
+            return JsonResponse(
+                {'refresh': ['This field is required.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+                # blacklist checks and outstanding tokens use the sync ORM
+                data = await sync_to_async(self.refresh_tokens)(raw_token)
+            else:
+                data = await self.arefresh_tokens(raw_token)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        access_token = data.get('access')
+        refresh_token = data.get('refresh')
+        if not (access_token and refresh_token):
+            error_message = (
+                'Access or refresh token not found in refresh response data'
+            )
+            logger.error(error_message)
+            return JsonResponse(
+                {'access': access_token, 'message': error_message},
+                status=status.HTTP_200_OK,
+            )
+
+        response = JsonResponse(
+            {'message': 'Token refreshed successfully.'},
+            status=status.HTTP_200_OK,
+        )
+        set_auth_cookies(response, access_token, refresh_token)
+        return response
+
+    def refresh_tokens(self, raw_token: str) -> dict[str, str]:
+        serializer = TokenRefreshSerializer(data={'refresh': raw_token})
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    async def arefresh_tokens(self, raw_token: str) -> dict[str, str]:
+        # same steps as TokenRefreshSerializer.validate, with the user lookup
+        # going through the async ORM
+        refresh = RefreshToken(raw_token)
+
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        if user_id:
+            try:
+                user = await User.objects.aget(
+                    **{jwt_settings.USER_ID_FIELD: user_id}
+                )
+            except User.DoesNotExist:
+                user = None
+            if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(
+                    'No active account found for the given token.',
+                    'no_active_account',
+                )
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class AsyncLogoutView(AsyncAPIView):
+    async def post(
+        self, request: HttpRequest, *args: Any, **kwargs: Any
+    ) -> HttpResponse:
+        response = HttpResponse(status=status.HTTP_204_NO_CONTENT)
+        response.delete_cookie('access')
+        response.delete_cookie('refresh')
+        response.delete_cookie('logged_in')
+        return response
@@ -5,6 +5,8 @@ from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
 
+from finnect.apps.common.admin_search import TrigramSearchMixin
+
 from .models import NextOfKin, Profile
 
 
@@ -39,7 +41,7 @@ class NextOfKinInline(admin.TabularInline):
 
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(TrigramSearchMixin, admin.ModelAdmin):
     form = ProfileAdminForm
     list_display = [
         'user',
@@ -61,6 +63,10 @@ class ProfileAdmin(admin.ModelAdmin):
         'phone_number',
     ]
     list_display_links = ['user']
+    # evita um COUNT(*) da tabela inteira a cada busca
+    show_full_result_count = False
+    # full_name, email e o próprio __str__ do perfil leem `obj.user`
+    list_select_related = ['user']
     readonly_fields = ['user']
 
     fieldsets = (
@@ -137,6 +143,8 @@ class NextOfKinAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'relationship', 'profile', 'is_primary']
     list_filter = ['is_primary', 'relationship']
     search_fields = ['first_name', 'last_name', 'profile__user__email']
+    # a coluna `profile` usa Profile.__str__, que lê profile.user
+    list_select_related = ['profile__user']
 
     def full_name(self, obj) -> str:
         return f'{obj.first_name} {obj.last_name}'
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:06
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+from finnect.apps.common.operations import PostgresAddIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userprofile', '0004_alter_profile_date_of_birth'),
+        ('userauth', '0003_user_search_trgm_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        PostgresAddIndex(
+            model_name='profile',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('phone_number'), name='gin_trgm_ops'), name='profile_phone_number_trgm_idx'),
+        ),
+    ]
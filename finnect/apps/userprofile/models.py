@@ -3,8 +3,10 @@ from typing import Any
 from cloudinary.models import CloudinaryField
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.translation import gettext_lazy as _
 from django_countries.fields import CountryField
 from phonenumber_field.modelfields import PhoneNumberField
@@ -195,6 +197,16 @@ class Profile(TimeStampedModel):
     def __str__(self) -> str:
         return f"{self.title} {self.user.first_name}'s Profile"
 
+    class Meta:
+        # busca do admin por telefone (icontains); só existe no Postgres,
+        # ver a migração 0005
+        indexes = [
+            GinIndex(
+                OpClass(Upper('phone_number'), name='gin_trgm_ops'),
+                name='profile_phone_number_trgm_idx',
+            ),
+        ]
+
 
 class NextOfKin(TimeStampedModel):
     class Salutation(models.TextChoices):
@@ -3,11 +3,18 @@ from typing import Any, Type
 from django.db.models.base import Model
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from loguru import logger
 from django.conf import settings
 from finnect.apps.userprofile.models import Profile
 
 
+# Campos do usuário exibidos junto com o perfil (admin e __str__). Alterações
+# em qualquer outro campo (tentativas de login, OTP, senha...) não afetam o
+# perfil.
+PROFILE_RELATED_USER_FIELDS = frozenset(['first_name', 'last_name', 'email'])
+
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_user_profile(sender: Type[Model], instance: Model, created: bool, **kwargs: Any) -> None:
     """
@@ -15,13 +22,43 @@ def create_user_profile(sender: Type[Model], instance: Model, created: bool, **k
     """
     if created:
         Profile.objects.create(user=instance)
-        logger.info(f"Profile created for user {instance.first_name} {instance.last_name}")
+        logger.info(
+            "Profile created for user {first_name} {last_name}",
+            first_name=instance.first_name,
+            last_name=instance.last_name,
+        )
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def save_user_profile(sender: Type[Model], instance: Model, **kwargs: Any) -> None:
+def save_user_profile(
+    sender: Type[Model],
+    instance: Model,
+    created: bool,
+    update_fields: Any = None,
+    raw: bool = False,
+    **kwargs: Any,
+) -> None:
     """
-    Salva o perfil de usuário quando o usuário é salvo.
+    Atualiza o perfil quando campos do usuário exibidos no perfil mudam.
+
+    O perfil não guarda cópia de nenhum campo do usuário, então basta marcar
+    `updated_at` com um único UPDATE, sem carregar o perfil nem rodar o
+    `full_clean` de todos os seus campos.
     """
-    instance.profile.save()
-    logger.info(f"Profile saved for user {instance.first_name} {instance.last_name}")
\ No newline at end of file
+    if created or raw:
+        return
+
+    if update_fields is not None:
+        changed = PROFILE_RELATED_USER_FIELDS.intersection(update_fields)
+    else:
+        changed = instance.get_changed_fields(PROFILE_RELATED_USER_FIELDS)
+
+    if not changed:
+        return
+
+    Profile.objects.filter(user=instance).update(updated_at=timezone.now())
+    logger.info(
+        "Profile saved for user {first_name} {last_name}",
+        first_name=instance.first_name,
+        last_name=instance.last_name,
+    )
@@ -1,3 +1,102 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from finnect.apps.common.testing import (
+    FAST_PASSWORD_HASHERS,
+    LOCAL_CACHES,
+    AdminQueryCountMixin,
+    create_user,
+)
+from finnect.apps.userprofile.models import NextOfKin, Profile
+
+User = get_user_model()
+
+
+def create_next_of_kin(profile, index: int):
+    return NextOfKin.objects.create(
+        profile=profile,
+        title=NextOfKin.Salutation.MRS,
+        first_name='Kin',
+        last_name=f'Number {index}',
+        date_of_birth=date(1970, 1, 1),
+        gender=NextOfKin.Gender.FEMALE,
+        relationship='Mother',
+        email_address=f'kin{index}@example.com',
+        phone_number='+14155552671',
+        address='1 Main Street',
+        city='Springfield',
+        country='US',
+    )
+
+
+@override_settings(CACHES=LOCAL_CACHES, PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class AdminChangelistQueryTests(AdminQueryCountMixin, TestCase):
+    def test_profile_changelist(self):
+        # every user gets a profile, starting with the admin's
+        self.assert_constant_queries(
+            reverse('admin:userprofile_profile_changelist'),
+            lambda: [create_user(index) for index in range(1, self.rows)],
+        )
+
+    def test_next_of_kin_changelist(self):
+        create_next_of_kin(self.admin.profile, 0)
+        self.assert_constant_queries(
+            reverse('admin:userprofile_nextofkin_changelist'),
+            lambda: [
+                create_next_of_kin(create_user(index).profile, index)
+                for index in range(1, self.rows)
+            ],
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHES, PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class SaveUserProfileSignalTests(TestCase):
+    """
+    Saving a user only touches the profile when a field shown with it
+    (first_name, last_name, email) changed.
+    """
+
+    def setUp(self):
+        # loaded from the database, so that changes are tracked
+        self.user = User.objects.get(pk=create_user(1).pk)
+
+    def profile_queries(self, **save_kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save(**save_kwargs)
+        table = Profile._meta.db_table
+        return [
+            query['sql']
+            for query in queries.captured_queries
+            if table in query['sql']
+        ]
+
+    def test_other_fields_leave_the_profile_alone(self):
+        assert self.profile_queries() == []
+        self.user.failed_login_attempts = 3
+        self.user.middle_name = 'Middle'
+        assert self.profile_queries() == []
+        assert self.profile_queries(update_fields=['last_login']) == []
+
+    def test_profile_fields_update_the_profile(self):
+        for field, value in [
+            ('first_name', 'Renamed'),
+            ('last_name', 'Renamed'),
+            ('email', 'renamed@example.com'),
+        ]:
+            with self.subTest(field=field):
+                setattr(self.user, field, value)
+                queries = self.profile_queries()
+                assert len(queries) == 1
+                assert queries[0].startswith('UPDATE')
+                # the saved value is the new baseline
+                assert self.profile_queries() == []
+
+    def test_update_fields_decide_without_comparing(self):
+        queries = self.profile_queries(update_fields=['email'])
+        assert len(queries) == 1
+        assert self.profile_queries(update_fields=['middle_name']) == []
@@ -11,6 +11,8 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from finnect.profiling import wrap_asgi
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "finnect.settings")
 
-application = get_asgi_application()
+application = wrap_asgi(get_asgi_application())
@@ -1,19 +1,140 @@
-from loguru import logger
+import json
 import logging
+import sys
+import traceback
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+TEXT_FORMAT = (
+    '{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | '
+    '{name}:{function}:{line} | {message}'
+)
 
 
 class InterceptHandler(logging.Handler):
-    def emit(self, record):
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
+    """
+    Repassa os registros do logging da biblioteca padrão para o loguru,
+    apontando para quem chamou o logger e não para o módulo logging.
+
+    A profundidade desse chamador na pilha é a mesma para cada ponto de
+    chamada, então ela é calculada na primeira vez e guardada por
+    (arquivo, linha) em vez de percorrer os frames a cada registro.
+    """
+
+    max_cached_depths = 4096
+
+    def __init__(self, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self._depths: dict[tuple[str, int], int] = {}
+        self._levels: dict[str, Any] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        level = self._levels.get(record.levelname)
+        if level is None:
+            try:
+                level = logger.level(record.levelname).name
+            except ValueError:
+                level = record.levelno
+            self._levels[record.levelname] = level
+
+        site = (record.pathname, record.lineno)
+        depth = self._depths.get(site)
+        if depth is None:
+            if len(self._depths) >= self.max_cached_depths:
+                self._depths.clear()
+            depth = self._depths[site] = self.find_depth()
+
+        logger.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
 
-        frame, depth = logging.currentframe(), 2
+    @staticmethod
+    def find_depth() -> int:
+        # a partir de quem chamou emit(), sobe pelos frames do módulo
+        # logging até quem chamou o logger
+        frame, depth = sys._getframe(2), 1
         while frame.f_code.co_filename == logging.__file__:
             frame = frame.f_back
             depth += 1
+        return depth
 
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level, record.getMessage()
-        )
\ No newline at end of file
+
+def serialize_record(record: dict[str, Any]) -> str:
+    """
+    Uma linha JSON com os campos do registro e os valores passados por
+    nome na mensagem (`logger.info('... {email}', email=email)`).
+    """
+    payload = {
+        'time': record['time'].isoformat(),
+        'level': record['level'].name,
+        'logger': record['name'],
+        'function': record['function'],
+        'line': record['line'],
+        'message': record['message'],
+        'process': record['process'].id,
+        **{
+            key: value
+            for key, value in record['extra'].items()
+            if key != 'serialized'
+        },
+    }
+    exception = record['exception']
+    if exception is not None:
+        payload['exception'] = ''.join(
+            traceback.format_exception(
+                exception.type, exception.value, exception.traceback
+            )
+        )
+    return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def json_format(record: dict[str, Any]) -> str:
+    record['extra']['serialized'] = serialize_record(record)
+    return '{extra[serialized]}\n'
+
+
+def loguru_handlers(
+    log_dir: Path,
+    level: str = 'DEBUG',
+    serialize: bool = False,
+    diagnose: bool = False,
+    **options: Any,
+) -> list[dict[str, Any]]:
+    """
+    Sinks de `debug.log` (até WARNING) e `error.log`; `options` sobrescreve
+    os parâmetros comuns aos dois (`enqueue`, `rotation`...).
+
+    Com `enqueue`, a escrita, a rotação e a compressão dos arquivos ficam
+    com uma thread do processo que configurou o loguru, inclusive para os
+    workers criados por fork a partir dele (preload_app do gunicorn), que
+    assim não giram os mesmos arquivos ao mesmo tempo. Em troca, cada
+    registro é serializado e passa por um pipe (ver bench_logging).
+    """
+    warning = logger.level('WARNING').no
+    common = {
+        'format': json_format if serialize else TEXT_FORMAT,
+        'rotation': '10MB',
+        'compression': 'zip',
+        'retention': '30 days',
+        'enqueue': False,
+        **options,
+    }
+    return [
+        {
+            **common,
+            'sink': Path(log_dir) / 'debug.log',
+            'level': level,
+            'filter': lambda record: record['level'].no <= warning,
+        },
+        {
+            **common,
+            'sink': Path(log_dir) / 'error.log',
+            'level': 'ERROR',
+            'backtrace': True,
+            # mostra os valores das variáveis no traceback, o que inclui
+            # senhas e tokens; só para depuração local
+            'diagnose': diagnose,
+        },
+    ]
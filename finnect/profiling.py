@@ -0,0 +1,369 @@
+import asyncio
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from loguru import logger
+
+TOKEN_HEADER = 'X-Profile-Token'
+TOKEN_SALT = 'finnect.profiling'
+WSGI_TOKEN_HEADER = 'HTTP_X_PROFILE_TOKEN'
+ASGI_TOKEN_HEADER = b'x-profile-token'
+
+
+def make_profiling_token(user: Any) -> str:
+    """
+    Token para o header X-Profile-Token, válido por PROFILING_TOKEN_MAX_AGE.
+    Só é emitido para usuários staff.
+    """
+    if not user.is_staff:
+        raise ValueError('Only staff users can profile requests.')
+    return signing.dumps(str(user.pk), salt=TOKEN_SALT)
+
+
+def check_profiling_token(token: str) -> Optional[str]:
+    """
+    Id do usuário que emitiu o token, ou None se ele for inválido ou
+    tiver expirado. Só verifica a assinatura, sem consultar o banco.
+    """
+    try:
+        return signing.loads(
+            token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+
+
+class CProfileRecorder:
+    """
+    A partir do Python 3.12 o cProfile usa sys.monitoring, que vale para
+    todas as threads do processo: o perfil inclui o que as outras threads
+    executaram no mesmo intervalo (ver RequestProfiler).
+    """
+
+    extension = 'pstats'
+
+    def __init__(self, async_mode: bool = False) -> None:
+        self.profiler = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profiler.enable()
+
+    def stop(self) -> None:
+        self.profiler.disable()
+
+    def save(self, path: Path) -> None:
+        self.profiler.dump_stats(path)
+
+
+class PyinstrumentRecorder:
+    """
+    Amostragem do pyinstrument, gravada em collapsed stacks (uma pilha por
+    linha, com o tempo próprio em microssegundos), o formato lido pelo
+    flamegraph.pl e pelo speedscope.
+    """
+
+    extension = 'collapsed'
+
+    def __init__(self, async_mode: bool = False) -> None:
+        from pyinstrument import Profiler
+
+        self.profiler = Profiler(
+            interval=settings.PROFILING_INTERVAL,
+            async_mode='enabled' if async_mode else 'disabled',
+        )
+
+    def start(self) -> None:
+        self.profiler.start()
+
+    def stop(self) -> None:
+        self.profiler.stop()
+
+    def save(self, path: Path) -> None:
+        lines: list[str] = []
+        root = self.profiler.last_session.root_frame()
+        if root is not None:
+            self._collapse(root, [], lines)
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    def _collapse(self, frame: Any, stack: list[str], lines: list) -> None:
+        name = frame.function
+        if frame.file_path_short:
+            name = f'{name} ({frame.file_path_short}:{frame.line_no})'
+        stack = [*stack, name.replace(';', ':')]
+        own = frame.time - sum(child.time for child in frame.children)
+        microseconds = round(own * 1_000_000)
+        if microseconds > 0:
+            lines.append(f'{";".join(stack)} {microseconds}')
+        for child in frame.children:
+            self._collapse(child, stack, lines)
+
+
+RECORDERS = {
+    'cprofile': CProfileRecorder,
+    'pyinstrument': PyinstrumentRecorder,
+}
+
+
+class ProfiledRequest:
+    def __init__(
+        self, recorder: Any, reason: str, method: str, path: str
+    ) -> None:
+        self.recorder = recorder
+        self.reason = reason
+        self.method = method
+        self.path = path
+        self.status = '-'
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+
+class RequestProfiler:
+    """
+    Escolhe as requisições perfiladas (token de staff no header
+    X-Profile-Token ou uma a cada PROFILING_SAMPLE_RATE) e grava os perfis
+    em PROFILING_DIR, mantendo só os PROFILING_MAX_FILES mais recentes.
+
+    Uma requisição por processo é perfilada de cada vez, porque a partir do
+    Python 3.12 o cProfile usa sys.monitoring, que vale para todas as
+    threads, e dois perfis ao mesmo tempo se misturariam. Isso não impede
+    que o perfil do cProfile inclua as requisições não perfiladas que as
+    outras threads atendiam no mesmo intervalo: num worker gthread com
+    várias threads (e no ASGI, com as threads do sync_to_async) o perfil
+    mistura requisições. Para um perfil só da requisição, use um worker com
+    GUNICORN_THREADS=1 ou o pyinstrument, que só acompanha a thread que o
+    iniciou.
+    """
+
+    def __init__(self) -> None:
+        try:
+            self.recorder_class = RECORDERS[settings.PROFILER]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f'PROFILER must be one of {sorted(RECORDERS)}, '
+                f'got {settings.PROFILER!r}.'
+            )
+        if settings.PROFILER == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ImproperlyConfigured(
+                    'PROFILER = "pyinstrument" requires the pyinstrument '
+                    'package.'
+                )
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.directory = Path(settings.PROFILING_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_files = settings.PROFILING_MAX_FILES
+        self._busy = threading.Lock()
+
+    def reason(self, token: Optional[str]) -> Optional[str]:
+        """
+        Por que a requisição deve ser perfilada, ou None. É o único custo
+        das requisições que não são perfiladas.
+        """
+        if token:
+            user_id = check_profiling_token(token)
+            if user_id is not None:
+                return f'token of user {user_id}'
+        if self.sample_rate and random.randrange(self.sample_rate) == 0:
+            return f'1 in {self.sample_rate} sample'
+        return None
+
+    def begin(
+        self, reason: str, method: str, path: str, async_mode: bool = False
+    ) -> Optional[ProfiledRequest]:
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            recorder = self.recorder_class(async_mode=async_mode)
+            recorder.start()
+        except Exception:
+            self._busy.release()
+            raise
+        return ProfiledRequest(recorder, reason, method, path)
+
+    def stop(self, profiled: ProfiledRequest) -> None:
+        # na thread que iniciou o perfil
+        try:
+            profiled.recorder.stop()
+        finally:
+            profiled.elapsed = time.perf_counter() - profiled.started
+            self._busy.release()
+
+    def finish(self, profiled: ProfiledRequest) -> None:
+        try:
+            saved = self.save(profiled)
+        except Exception as exc:
+            logger.error(
+                'Could not save the profile of {path}: {error}',
+                path=profiled.path,
+                error=str(exc),
+            )
+            return
+        logger.info(
+            'Profiled {method} {path} ({reason}): {profile}',
+            method=profiled.method,
+            path=profiled.path,
+            reason=profiled.reason,
+            profile=saved,
+        )
+
+    def save(self, profiled: ProfiledRequest) -> Path:
+        # o nome começa pelo horário, então a ordem alfabética é a
+        # cronológica na hora de descartar os mais antigos
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', profiled.path).strip('-')[:60]
+        filename = (
+            f'{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}-'
+            f'{profiled.method}-{slug or "root"}-{profiled.status}-'
+            f'{profiled.elapsed * 1000:.0f}ms.{profiled.recorder.extension}'
+        )
+        target = self.directory / filename
+        profiled.recorder.save(target)
+        self.rotate()
+        return target
+
+    def rotate(self) -> None:
+        profiles = sorted(
+            entry
+            for entry in self.directory.iterdir()
+            if entry.suffix.lstrip('.') in {'pstats', 'collapsed'}
+        )
+        for old in profiles[: max(0, len(profiles) - self.max_files)]:
+            # outro worker pode ter apagado o mesmo arquivo
+            old.unlink(missing_ok=True)
+
+
+class ProfiledResponse:
+    """
+    Corpo da resposta perfilada. O servidor percorre o corpo depois que a
+    aplicação retorna (StreamingHttpResponse, FileResponse), então o perfil
+    só termina no close(), que ele chama ao fim de toda resposta (PEP
+    3333), na mesma thread.
+    """
+
+    def __init__(
+        self,
+        response: Any,
+        middleware: 'ProfilingWSGIMiddleware',
+        profiled: ProfiledRequest,
+    ) -> None:
+        self.response = response
+        self.middleware = middleware
+        self.profiled = profiled
+
+    def __iter__(self):
+        return iter(self.response)
+
+    def close(self) -> None:
+        try:
+            if hasattr(self.response, 'close'):
+                self.response.close()
+        finally:
+            self.middleware.end(self.profiled)
+
+
+class ProfilingWSGIMiddleware:
+    def __init__(self, application: Any, profiler: RequestProfiler) -> None:
+        self.application = application
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        reason = self.profiler.reason(environ.get(WSGI_TOKEN_HEADER))
+        if reason is None:
+            return self.application(environ, start_response)
+        profiled = self.profiler.begin(
+            reason,
+            environ.get('REQUEST_METHOD', ''),
+            environ.get('PATH_INFO', ''),
+        )
+        if profiled is None:
+            return self.application(environ, start_response)
+
+        def capture_status(status_line, headers, exc_info=None):
+            profiled.status = status_line.split(' ', 1)[0]
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            response = self.application(environ, capture_status)
+        except BaseException:
+            self.end(profiled)
+            raise
+        return ProfiledResponse(response, self, profiled)
+
+    def end(self, profiled: ProfiledRequest) -> None:
+        self.profiler.stop(profiled)
+        self.profiler.finish(profiled)
+
+
+class ProfilingASGIMiddleware:
+    """
+    Com o pyinstrument, perfila a thread do event loop: o perfil separa a
+    requisição das outras que correm no mesmo loop, e o tempo dentro do
+    sync_to_async (views síncronas, ORM) aparece como espera; para abrir
+    esse tempo, perfile a mesma rota pelo WSGI. O cProfile inclui todas as
+    threads (ver RequestProfiler).
+    """
+
+    def __init__(self, application: Any, profiler: RequestProfiler) -> None:
+        self.application = application
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.application(scope, receive, send)
+        token = next(
+            (
+                value.decode('latin-1')
+                for name, value in scope['headers']
+                if name == ASGI_TOKEN_HEADER
+            ),
+            None,
+        )
+        reason = self.profiler.reason(token)
+        if reason is None:
+            return await self.application(scope, receive, send)
+        profiled = self.profiler.begin(
+            reason, scope['method'], scope['path'], async_mode=True
+        )
+        if profiled is None:
+            return await self.application(scope, receive, send)
+
+        async def capture_status(message):
+            if message['type'] == 'http.response.start':
+                profiled.status = str(message['status'])
+            await send(message)
+
+        try:
+            await self.application(scope, receive, capture_status)
+        finally:
+            self.profiler.stop(profiled)
+            # grava o arquivo fora do event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.profiler.finish, profiled
+            )
+
+
+def wrap_wsgi(application: Any) -> Any:
+    """
+    A aplicação com o profiler, ou ela mesma com PROFILING_ENABLED
+    desligado, sem custo nenhum por requisição.
+    """
+    if not settings.PROFILING_ENABLED:
+        return application
+    return ProfilingWSGIMiddleware(application, RequestProfiler())
+
+
+def wrap_asgi(application: Any) -> Any:
+    if not settings.PROFILING_ENABLED:
+        return application
+    return ProfilingASGIMiddleware(application, RequestProfiler())
@@ -17,6 +17,8 @@ from loguru import logger
 from datetime import timedelta
 import cloudinary
 
+from finnect.interceptor import loguru_handlers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 APPS_DIR = BASE_DIR / "finnect" / "apps"
@@ -47,6 +49,7 @@ DJANGO_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.sites',
     'django.contrib.humanize',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -71,6 +74,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = LOCAL_APPS + DJANGO_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    "finnect.apps.common.middlewares.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -116,14 +120,51 @@ DATABASES = {
     }
 }
 
+# banco local para benchmarks e testes de carga sem o container do postgres
+if getenv("USE_SQLITE") == "True":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {"timeout": 20},
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": getenv("REDIS_URL", "redis://redis:6379/0"),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    },
+    # primeiro nível, em memória do processo, na frente do Redis
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "finnect-local",
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+        },
+    },
+}
+
+# O cache "default" (Redis) é dependência do caminho de autenticação: os
+# throttles do DRF e o cache de usuários (finnect/apps/common/cache.py) o
+# usam. Em desenvolvimento sem Redis, USER_CACHE_ALIAS=local guarda versões e
+# snapshots só no processo; a invalidação não chega aos outros processos.
+USER_CACHE_ALIAS = getenv("USER_CACHE_ALIAS", "default")
+USER_CACHE_LOCAL_ALIAS = "local"
+USER_CACHE_TIMEOUT = 60 * 5
+USER_CACHE_LOCAL_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# o primeiro hasher é usado nas senhas novas; hashes dos demais são
+# convertidos para ele no próximo login, em segundo plano
 PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
-    "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
     "django.contrib.auth.hashers.ScryptPasswordHasher",
 ]
@@ -174,7 +215,9 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # keyset: custo constante em qualquer página, sem OFFSET nem COUNT(*);
+    # views que precisem do total podem usar PageNumberPagination
+    'DEFAULT_PAGINATION_CLASS': 'finnect.apps.common.pagination.KeysetPagination',
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
@@ -250,6 +293,9 @@ cloudinary.config(
 
 
 COOKIE_NAME = 'access'
+# quantidade de tokens de acesso já verificados mantidos em memória por
+# processo; 0 desativa o cache
+JWT_VERIFIED_TOKEN_CACHE_SIZE = 4096
 # Cookies Lax não são enviados em cross-site requests,
 # apenas por links externos.
 COOKIE_SAMESITE = 'Lax'
@@ -259,55 +305,122 @@ COOKIE_SECURE = (
     getenv('COOKIE_SECURE', 'True') == 'True'
 )  # cookie só é enviado em conexões HTTPS
 
+# troca refresh, logout e verify-otp pelas views assíncronas nativas; só
+# compensa quando a aplicação roda sob ASGI
+ASYNC_AUTH_VIEWS = getenv('ASYNC_AUTH_VIEWS', 'False') == 'True'
+
 ADMIN_URL = getenv("ADMIN_URL")
 SITE_NAME = getenv("SITE_NAME")
 SITE_ID = 1
 
-EMAIL_BACKEND = "djcelery_email.backends.CeleryEmailBackend"
+EMAIL_BACKEND = "finnect.apps.common.mail.BatchingEmailBackend"
+CELERY_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_BATCH_CACHE_ALIAS = "default"
+EMAIL_BATCH_QUEUE_KEY = "email:batch"
+EMAIL_BATCH_SIZE = 50
+EMAIL_BATCH_FLUSH_INTERVAL = timedelta(seconds=5)
+# lotes de uma descarga interrompida voltam para a fila depois disso
+EMAIL_BATCH_PROCESSING_TIMEOUT = timedelta(minutes=5)
 EMAIL_HOST = getenv("EMAIL_HOST")
 EMAIL_PORT = getenv("EMAIL_PORT")
 DEFAULT_FROM_EMAIL = getenv("DEFAULT_FROM_EMAIL")
 DOMAIN = getenv("DOMAIN")
 
-LOGGING_CONFIG = None
+# Visualizações de conteúdo (ContentView.record_view) ficam em um buffer e
+# são gravadas em lote a cada CONTENT_VIEW_FLUSH_INTERVAL.
+CONTENT_VIEW_BUFFER_BACKEND = getenv(
+    "CONTENT_VIEW_BUFFER_BACKEND",
+    "finnect.apps.common.view_buffer.RedisContentViewBuffer",
+)
+CONTENT_VIEW_BUFFER_CACHE_ALIAS = "default"
+CONTENT_VIEW_BUFFER_KEY = "content_views:buffer"
+CONTENT_VIEW_FLUSH_BATCH_SIZE = 1000
+CONTENT_VIEW_FLUSH_INTERVAL = timedelta(
+    seconds=int(getenv("CONTENT_VIEW_FLUSH_INTERVAL", "30"))
+)
+# validade do lock da descarga, renovado a cada lote gravado
+CONTENT_VIEW_FLUSH_LOCK_TIMEOUT = timedelta(minutes=1)
+# Rollups por hora/dia das visualizações; o atraso deixa de fora linhas de
+# transações que ainda podem estar abertas.
+CONTENT_VIEW_ROLLUP_INTERVAL = timedelta(minutes=5)
+CONTENT_VIEW_ROLLUP_LAG = timedelta(minutes=1)
+# Contagem aproximada (HyperLogLog) de visitantes únicos por objeto, total e
+# por dia; as contagens diárias expiram depois de UNIQUE_VIEWERS_DAILY_TTL.
+UNIQUE_VIEWERS_BACKEND = getenv(
+    "UNIQUE_VIEWERS_BACKEND",
+    "finnect.apps.common.unique_viewers.RedisUniqueViewerCounter",
+)
+UNIQUE_VIEWERS_CACHE_ALIAS = "default"
+UNIQUE_VIEWERS_KEY_PREFIX = "unique_viewers"
+UNIQUE_VIEWERS_DAILY_TTL = timedelta(days=90)
+# No Postgres a tabela de visualizações é particionada por mês; a task diária
+# cria as partições dos próximos meses e desanexa (ou apaga) as que saíram da
+# janela de retenção.
+CONTENT_VIEW_PARTITION_MONTHS_AHEAD = 3
+CONTENT_VIEW_RETENTION_MONTHS = int(
+    getenv("CONTENT_VIEW_RETENTION_MONTHS", "13")
+)
+CONTENT_VIEW_DROP_EXPIRED_PARTITIONS = (
+    getenv("CONTENT_VIEW_DROP_EXPIRED_PARTITIONS", "False") == "True"
+)
+
+CELERY_BEAT_SCHEDULE = {
+    "purge-expired-otp-challenges": {
+        "task": "userauth.purge_expired_otp_challenges",
+        "schedule": timedelta(minutes=5),
+    },
+    "flush-email-batch": {
+        "task": "common.flush_email_batch",
+        "schedule": EMAIL_BATCH_FLUSH_INTERVAL,
+    },
+    "flush-content-views": {
+        "task": "common.flush_content_views",
+        "schedule": CONTENT_VIEW_FLUSH_INTERVAL,
+    },
+    "rollup-content-views": {
+        "task": "common.rollup_content_views",
+        "schedule": CONTENT_VIEW_ROLLUP_INTERVAL,
+    },
+    "rotate-content-view-partitions": {
+        "task": "common.rotate_content_view_partitions",
+        "schedule": timedelta(days=1),
+    },
+}
+
+# LOG_FORMAT "json" grava uma linha JSON por registro, com os valores
+# passados por nome na mensagem como campos; LOG_ENQUEUE tira a escrita dos
+# arquivos da thread da requisição (ver finnect.interceptor). LOG_DIAGNOSE
+# mostra os valores das variáveis nos tracebacks do error.log (inclusive
+# senhas e tokens)
+LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = getenv("LOG_FORMAT", "text")
+LOG_ENQUEUE = getenv("LOG_ENQUEUE", "False") == "True"
+LOG_DIAGNOSE = getenv("LOG_DIAGNOSE", "False") == "True"
 LOGURU_LOGGING = {
-    "handlers": [
-        {
-            "sink": BASE_DIR / "logs/debug.log",
-            "level": "DEBUG",
-            "filter": lambda record: record["level"].no <= logger.level("WARNING").no,
-            "format": "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} | {message}",
-            "rotation": "10MB",
-            "compression": "zip",
-            "retention": "30 days",
-        },
-        {
-            "sink": BASE_DIR / "logs/error.log",
-            "level": "ERROR",
-            "format": "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} | {message}",
-            "rotation": "10MB",
-            "compression": "zip",
-            "retention": "30 days",
-            "backtrace": True,
-            "diagnose": True,
-         }
-
-    ]
+    "handlers": loguru_handlers(
+        BASE_DIR / "logs",
+        level=LOG_LEVEL,
+        serialize=LOG_FORMAT == "json",
+        diagnose=LOG_DIAGNOSE,
+        enqueue=LOG_ENQUEUE,
+    ),
 }
 
 logger.configure(**LOGURU_LOGGING)
 
+# o logging da biblioteca padrão (Django, DRF, celery) também vai para os
+# sinks do loguru
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "handlers": {
         "loguru": {
-            "class": "interceptor.InterceptHandler",
+            "class": "finnect.interceptor.InterceptHandler",
         }
     },
     "root": {
         "handlers": ["loguru"],
-        "level": "DEBUG",
+        "level": LOG_LEVEL,
     },
 }
 
@@ -320,5 +433,59 @@ CSRF_TRUSTED_ORIGINS = [
 
 BLOCKED_ACCOUNT_DURATION = timedelta(minutes=1)
 MAX_LOGIN_ATTEMPTS = 3
+FAILED_LOGIN_ATTEMPTS_WINDOW = timedelta(minutes=15)
 OTP_EXPIRATION = timedelta(minutes=1)
+# estado de login (OTPs pendentes, tentativas e bloqueios) fora da tabela de
+# usuários; use InMemoryAuthStateBackend nos testes
+AUTH_STATE_BACKEND = getenv(
+    "AUTH_STATE_BACKEND",
+    "finnect.apps.userauth.auth_state.RedisAuthStateBackend",
+)
+AUTH_STATE_CACHE_ALIAS = "default"
+AUTH_STATE_KEY_PREFIX = "auth"
+# limite de registros por requisição na importação em lote pela API; as
+# senhas são calculadas durante a requisição (PASSWORD_HASHING_EXECUTOR), a
+# cerca de 0,3 s cada com o argon2, então o limite mantém a requisição
+# dentro do GUNICORN_TIMEOUT. Migrações grandes devem usar o comando
+# import_users
+BULK_USER_IMPORT_MAX_RECORDS = int(
+    getenv("BULK_USER_IMPORT_MAX_RECORDS", "50")
+)
+# números da sequência de usernames reservados de uma vez por processo;
+# sobras de um bloco viram lacunas na numeração quando o processo termina
+USERNAME_BLOCK_SIZE = 1000
+# onde as senhas são calculadas: "thread" (os hashers acima liberam o GIL),
+# "process" (processos próprios, fora de workers daemon do celery) ou
+# "inline" (na thread da requisição, como no Django); WORKERS limita quantos
+# hashes cada processo calcula ao mesmo tempo
+PASSWORD_HASHING_EXECUTOR = getenv("PASSWORD_HASHING_EXECUTOR", "thread")
+PASSWORD_HASHING_WORKERS = int(getenv("PASSWORD_HASHING_WORKERS", "1"))
+# métricas por view (latência, consultas, tempo no banco) e acertos de cache,
+# somadas entre os workers no Redis a cada METRICS_FLUSH_INTERVAL e expostas
+# em METRICS_URL, rota que o nginx não encaminha; use
+# InMemoryMetricsBackend nos testes
+METRICS_BACKEND = getenv(
+    "METRICS_BACKEND",
+    "finnect.apps.common.metrics.RedisMetricsBackend",
+)
+METRICS_CACHE_ALIAS = "default"
+METRICS_KEY = "metrics:samples"
+METRICS_FLUSH_INTERVAL = timedelta(seconds=10)
+METRICS_URL = getenv("METRICS_URL", "metrics/")
+# token do Prometheus; sem ele, METRICS_URL só responde a staff logado
+METRICS_TOKEN = getenv("METRICS_TOKEN")
+# perfis por requisição (finnect/profiling.py), desligados por padrão. Com
+# PROFILING_ENABLED, são perfiladas as requisições com um token de staff no
+# header X-Profile-Token (comando profiling_token) e uma a cada
+# PROFILING_SAMPLE_RATE (0 desliga a amostragem). PROFILER é "cprofile"
+# (arquivos pstats) ou "pyinstrument" (collapsed stacks, pacote à parte).
+# No Python 3.12+ o cProfile registra todas as threads, então em workers
+# com várias threads o perfil mistura requisições (ver README)
+PROFILING_ENABLED = getenv("PROFILING_ENABLED", "False") == "True"
+PROFILER = getenv("PROFILER", "cprofile")
+PROFILING_SAMPLE_RATE = int(getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL = 0.001
+PROFILING_DIR = getenv("PROFILING_DIR", str(BASE_DIR / "logs/profiles"))
+PROFILING_MAX_FILES = 200
+PROFILING_TOKEN_MAX_AGE = timedelta(hours=1)
 BANK_NAME = getenv("BANK_NAME")
\ No newline at end of file
@@ -7,6 +7,8 @@ from drf_spectacular.views import (
     SpectacularRedocView,
 )
 
+from finnect.apps.common.views import metrics_view
+
 urlpatterns = [
     path(settings.ADMIN_URL, admin.site.urls),
     path('api/v1/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -22,6 +24,7 @@ urlpatterns = [
     ),
     path('api/v1/auth/', include('djoser.urls')),
     path('api/v1/auth/', include('finnect.apps.userauth.urls')),
+    path(settings.METRICS_URL, metrics_view, name='metrics'),
 ]
 
 admin.site.site_header = "Finnect Admin"
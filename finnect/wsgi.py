@@ -11,6 +11,8 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from finnect.profiling import wrap_wsgi
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "finnect.settings")
 
-application = get_wsgi_application()
+application = wrap_wsgi(get_wsgi_application())
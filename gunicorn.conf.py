@@ -0,0 +1,63 @@
+"""
+Configuração do gunicorn para o modo de produção (SERVER_MODE=production).
+
+Todos os valores podem ser ajustados por variáveis de ambiente GUNICORN_*.
+"""
+
+import os
+
+# CPUs realmente disponíveis para o container, não as do host.
+cpus = len(os.sched_getaffinity(0))
+
+bind = f'0.0.0.0:{os.getenv("PORT", "8081")}'
+
+# uvicorn_worker.UvicornWorker serve a aplicação ASGI (views assíncronas
+# nativas, ver ASYNC_AUTH_VIEWS); gthread serve a aplicação WSGI.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gthread':
+    wsgi_app = 'finnect.wsgi:application'
+    # Cada worker atende várias requisições que esperam banco/Redis; as
+    # threads cobrem essa espera sem multiplicar a memória por processo.
+    workers = int(os.getenv('GUNICORN_WORKERS', str(cpus + 1)))
+    threads = int(os.getenv('GUNICORN_THREADS', str(2 * cpus)))
+else:
+    wsgi_app = 'finnect.asgi:application'
+    # Sob ASGI as views síncronas (DRF) dividem uma única thread por
+    # processo, então a concorrência vem do número de workers.
+    workers = int(os.getenv('GUNICORN_WORKERS', str(2 * cpus + 1)))
+    threads = 1
+
+# Carrega o Django uma vez no master; os workers herdam a aplicação já
+# importada e compartilham essa memória via copy-on-write.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Recicla os workers depois de N requisições para conter vazamentos de
+# memória; o jitter evita que todos reiniciem ao mesmo tempo.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# O nginx é o único cliente direto, dentro da rede do compose.
+forwarded_allow_ips = os.getenv('GUNICORN_FORWARDED_ALLOW_IPS', '*')
+
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Conexões abertas durante o preload não podem ser compartilhadas
+    # entre processos.
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    # Uma consulta para todos os ContentTypes, em vez de uma por modelo nas
+    # primeiras requisições de cada worker (record_view, admin).
+    from finnect.apps.common.content_types import warm_content_type_cache
+
+    warm_content_type_cache()